@@ -0,0 +1,73 @@
+"""Measures how long it takes to order synthetic source packages by their build
+dependencies.
+
+Run from the repository root with:
+
+    python -m benchmarks.order_packages [--packages 10000]
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+from debutizer.commands.package_graph import PackageGraph
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packages", type=int, default=10000)
+    parser.add_argument("--binaries-per-package", type=int, default=3)
+    parser.add_argument("--depends-per-package", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for count in _sizes(args.packages):
+        elapsed = _order(
+            count, args.binaries_per_package, args.depends_per_package, args.seed
+        )
+        print(f"{count:>8} packages: {elapsed * 1000:8.1f} ms")
+
+
+def _order(
+    count: int, binaries_per_package: int, depends_per_package: int, seed: int
+) -> float:
+    rng = random.Random(seed)
+
+    packages = []
+    for i in range(count):
+        binaries = [f"pkg{i}-bin{b}" for b in range(binaries_per_package)]
+        # Only depend on earlier packages so that the graph is acyclic. Some
+        # dependencies are on packages that aren't managed, like system packages.
+        build_depends = [f"system-package{d}" for d in range(depends_per_package // 2)]
+        if i > 0:
+            for _ in range(depends_per_package - len(build_depends)):
+                other = rng.randrange(i)
+                build_depends.append(
+                    f"pkg{other}-bin{rng.randrange(binaries_per_package)}"
+                )
+        packages.append((f"pkg{i}", binaries, build_depends))
+
+    start = time.perf_counter()
+
+    graph: PackageGraph[str] = PackageGraph()
+    for name, binaries, build_depends in packages:
+        graph.add(name, name=name, binaries=binaries, build_depends=build_depends)
+    ordered = graph.order()
+
+    elapsed = time.perf_counter() - start
+    assert len(ordered) == count
+    return elapsed
+
+
+def _sizes(maximum: int) -> List[int]:
+    sizes = []
+    size = maximum
+    while size >= 1000 and len(sizes) < 4:
+        sizes.append(size)
+        size //= 2
+    return sorted(sizes) if len(sizes) > 0 else [maximum]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from .build import BuildCommand
 from .check import CheckCommand
+from .chroot import ChrootCommand
 from .command import Command
 from .root import RootCommand
 from .source import SourceCommand
@@ -12,6 +13,7 @@ __all__ = [
     "SourceCommand",
     "BuildCommand",
     "CheckCommand",
+    "ChrootCommand",
     "UploadCommand",
     "VersionCommand",
 ]
@@ -0,0 +1,199 @@
+import shlex
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Iterator, List, Optional, Tuple, Union
+
+from xdg.BaseDirectory import save_cache_path
+
+from ..print_utils import print_notify
+
+_MEBIBYTE = 1024 * 1024
+
+
+class AptCache:
+    """A cache of the binary packages that APT downloads while installing build
+    dependencies, shared between builds and between runs.
+
+    Each distribution/architecture pair has its own cache directory, which is
+    bind-mounted into the chroot. Before build dependencies are installed, a pbuilder
+    hook links every cached package into APT's archive directory, and afterwards
+    another hook copies newly downloaded packages into the cache. Packages are
+    moved into the cache with a rename, so concurrent builds never see a partially
+    written package.
+    """
+
+    def __init__(
+        self, cache_dir: Optional[Path] = None, max_size: int = 4096 * _MEBIBYTE
+    ):
+        """
+        :param cache_dir: The directory to keep packages in. Defaults to a directory in
+            the XDG cache.
+        :param max_size: If the cache is larger than this many bytes, the least
+            recently used packages are evicted until it fits
+        """
+        if cache_dir is None:
+            cache_dir = Path(save_cache_path("debutizer")) / "apt-cache"
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @contextmanager
+    def mount(
+        self, distribution: str, architecture: str, hook_dir: Path
+    ) -> Iterator[List[Union[str, Path]]]:
+        """Adds the hooks that use the cache to a build. Hits and misses are counted
+        when the context is exited.
+
+        :param distribution: The distribution codename of the chroot
+        :param architecture: The CPU architecture of the chroot
+        :param hook_dir: The pbuilder hook directory of the build
+        :return: Flags to add to the pbuilder build command
+        """
+        packages_dir = self._cache_dir / f"{distribution}-{architecture}"
+        stats_dir = packages_dir / _STATS_DIR_NAME
+        stats_dir.mkdir(parents=True, exist_ok=True)
+        stats_file = stats_dir / uuid.uuid4().hex
+
+        # D hooks run before build dependencies are installed, and A hooks run after
+        link_hook = hook_dir / "D80aptcache"
+        link_hook.write_text(_link_hook(packages_dir))
+        link_hook.chmod(0o755)
+        save_hook = hook_dir / "A10aptcache"
+        save_hook.write_text(_save_hook(packages_dir, stats_file))
+        save_hook.chmod(0o755)
+
+        try:
+            # pbuilder's own package cache is disabled, since it is not safe for
+            # concurrent builds and is never evicted
+            yield ["--bindmounts", packages_dir, "--aptcache", ""]
+        finally:
+            self._record(stats_file)
+
+    def evict(self) -> None:
+        """Removes the least recently used packages until the cache fits in its maximum
+        size. A package that is evicted while a build is using it is downloaded again
+        by that build.
+        """
+        if not self._cache_dir.is_dir():
+            return
+
+        packages: List[Tuple[float, int, Path]] = []
+        for package in self._cache_dir.glob("*/*.deb"):
+            try:
+                stat = package.stat()
+            except FileNotFoundError:
+                continue
+            packages.append((stat.st_mtime, stat.st_size, package))
+
+        # Least recently used first
+        packages.sort()
+        total_size = sum(size for _, size, _ in packages)
+
+        evicted = 0
+        for _, size, package in packages:
+            if total_size <= self._max_size:
+                break
+            package.unlink()
+            total_size -= size
+            evicted += 1
+
+        if evicted > 0:
+            print_notify(f"Evicted {evicted} package(s) from the APT cache")
+
+    def print_summary(self) -> None:
+        lookups = self._hits + self._misses
+        hit_rate = f", {self._hits / lookups:.0%} hit rate" if lookups > 0 else ""
+        print_notify(
+            f"APT cache: {self._hits} hit(s), {self._misses} miss(es){hit_rate}"
+        )
+
+    def _record(self, stats_file: Path) -> None:
+        """Counts the hits and misses written by a build's hook. The file is missing if
+        the build failed before its build dependencies were installed.
+        """
+        if not stats_file.is_file():
+            return
+
+        hits, misses = (int(count) for count in stats_file.read_text().split())
+        stats_file.unlink()
+
+        with self._lock:
+            self._hits += hits
+            self._misses += misses
+
+
+def _link_hook(packages_dir: Path) -> str:
+    """Creates a pbuilder hook that makes cached packages available to APT, and that
+    remembers which packages were installed before build dependencies
+
+    :param packages_dir: The cache directory, as seen from inside the chroot
+    :return: The contents of the hook script
+    """
+    packages_dir_arg = shlex.quote(str(packages_dir))
+
+    script = "#!/usr/bin/env bash\n"
+    script += "# Generated by Debutizer to use the shared APT package cache\n"
+    script += "set -o nounset\n"
+    script += _INSTALLED_PACKAGES_FUNCTION
+    script += f"installed_packages > {_INSTALLED_BEFORE_FILE}\n"
+    # Symbolic links are used because the cache is on a different mount than the
+    # archive directory
+    script += f"for package in {packages_dir_arg}/*.deb; do\n"
+    script += f'    target={_ARCHIVES_DIR}/"$(basename "$package")"\n'
+    script += '    if [[ -e "$package" && ! -e "$target" ]]; then\n'
+    script += '        ln --symbolic "$package" "$target"\n'
+    script += "    fi\n"
+    script += "done\n"
+    return script
+
+
+def _save_hook(packages_dir: Path, stats_file: Path) -> str:
+    """Creates a pbuilder hook that adds newly downloaded packages to the cache and
+    writes how many of the installed packages came from the cache
+
+    :param packages_dir: The cache directory, as seen from inside the chroot
+    :param stats_file: The file to write hits and misses to
+    :return: The contents of the hook script
+    """
+    packages_dir_arg = shlex.quote(str(packages_dir))
+
+    script = "#!/usr/bin/env bash\n"
+    script += "# Generated by Debutizer to update the shared APT package cache\n"
+    script += "set -o nounset\n"
+    script += _INSTALLED_PACKAGES_FUNCTION
+    script += "hits=0\n"
+    script += "misses=0\n"
+    script += "while read -r name; do\n"
+    script += f'    archive={_ARCHIVES_DIR}/"$name"\n'
+    script += '    if [[ -L "$archive" ]]; then\n'
+    script += "        hits=$((hits + 1))\n"
+    # The modification time marks when the package was last used
+    script += f'        touch --no-create {packages_dir_arg}/"$name"\n'
+    script += '    elif [[ -f "$archive" ]]; then\n'
+    script += "        misses=$((misses + 1))\n"
+    script += f'        temp_file={packages_dir_arg}/".$name.$$"\n'
+    script += '        cp "$archive" "$temp_file" && mv "$temp_file" '
+    script += f'{packages_dir_arg}/"$name"\n'
+    script += "    fi\n"
+    script += "done < <(installed_packages | "
+    script += f"comm -13 {_INSTALLED_BEFORE_FILE} -)\n"
+    script += f'echo "$hits $misses" > {shlex.quote(str(stats_file))}\n'
+    return script
+
+
+_STATS_DIR_NAME = ".stats"
+_ARCHIVES_DIR = Path("/var/cache/apt/archives")
+_INSTALLED_BEFORE_FILE = Path("/tmp/debutizer-installed-packages")
+
+_INSTALLED_PACKAGES_FUNCTION = """\
+installed_packages() {
+    # Prints the archive file name APT uses for each installed package
+    dpkg-query --show --showformat '${Package}_${Version}_${Architecture}.deb\\n' \\
+        | sed 's/:/%3a/g' \\
+        | sort
+}
+"""
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from xdg.BaseDirectory import save_cache_path
+
+from ..print_utils import print_notify
+
+_MEBIBYTE = 1024 * 1024
+
+
+class AptProxy:
+    """A caching HTTP proxy that chroots download package indexes and packages through,
+    so that repeated downloads from the same mirrors are served from the disk.
+
+    Downloads are stored once per unique content and looked up by URL. Files in the
+    pool and files fetched by hash never change, so they are cached permanently.
+    Other files, like the package indexes under dists/, are downloaded again once
+    they are older than a time-to-live, with a conditional request so that unchanged
+    files are not transferred again.
+
+    Unlike LocalRepository, this is not a Flask app, since proxy requests are made
+    for absolute URLs.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_size: int = 4096 * _MEBIBYTE,
+        index_ttl: float = 30 * 60,
+    ):
+        """
+        :param cache_dir: The directory to keep downloads in. Defaults to a directory
+            in the XDG cache.
+        :param max_size: If the cache is larger than this many bytes, the least
+            recently used downloads are evicted until it fits
+        :param index_ttl: The number of seconds a file that may change is served from
+            the cache before it is checked for changes
+        """
+        if cache_dir is None:
+            cache_dir = Path(save_cache_path("debutizer")) / "apt-proxy"
+        self._objects_dir = cache_dir / "objects"
+        self._urls_dir = cache_dir / "urls"
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
+        self._urls_dir.mkdir(parents=True, exist_ok=True)
+        self._max_size = max_size
+        self._index_ttl = index_ttl
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+        self._server = _ThreadingHTTPServer(
+            ("127.0.0.1", 0), partial(_ProxyRequestHandler, self)
+        )
+        self._thread = Thread(
+            name="APT Proxy",
+            target=self._server.serve_forever,
+            daemon=True,
+        )
+
+    @property
+    def url(self) -> str:
+        """The URL to configure as an HTTP proxy"""
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def fetch(self, url: str) -> Tuple[int, Optional[Path], Dict[str, str]]:
+        """Gets a file from the cache, downloading it if it's missing or out of date.
+        If the file can't be downloaded, an out of date copy is used if there is one.
+
+        :param url: The URL of the file
+        :return: The HTTP status code, the cached file if the status is 200, and the
+            headers to respond with
+        """
+        record = self._load_record(url)
+        object_path = None
+        if record is not None:
+            object_path = self._objects_dir / record["object"]
+            if not object_path.is_file():
+                # Evicted since it was downloaded
+                record, object_path = None, None
+
+        if record is not None and object_path is not None:
+            age = time.time() - record["fetched"]
+            if _is_immutable(url) or age < self._index_ttl:
+                return self._hit(object_path, record)
+
+        request_headers = {}
+        if record is not None:
+            if record["etag"] is not None:
+                request_headers["If-None-Match"] = record["etag"]
+            if record["last_modified"] is not None:
+                request_headers["If-Modified-Since"] = record["last_modified"]
+
+        try:
+            response = requests.get(
+                url, headers=request_headers, stream=True, timeout=_TIMEOUT
+            )
+        except requests.RequestException:
+            if record is not None and object_path is not None:
+                return self._hit(object_path, record)
+            return 502, None, {}
+
+        with response:
+            if (
+                response.status_code == 304
+                and record is not None
+                and object_path is not None
+            ):
+                record["fetched"] = time.time()
+                self._save_record(url, record)
+                return self._hit(object_path, record)
+            if response.status_code != 200:
+                return response.status_code, None, {}
+
+            object_path = self._store(response)
+
+        record = {
+            "object": object_path.name,
+            "fetched": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+        }
+        self._save_record(url, record)
+
+        with self._lock:
+            self._misses += 1
+        return 200, object_path, _response_headers(record)
+
+    def evict(self) -> None:
+        """Removes the least recently used downloads until the cache fits in its
+        maximum size
+        """
+        objects: List[Tuple[float, int, Path]] = []
+        for object_path in self._objects_dir.iterdir():
+            if object_path.name.startswith("."):
+                # Still being downloaded
+                continue
+            try:
+                stat = object_path.stat()
+            except FileNotFoundError:
+                continue
+            objects.append((stat.st_mtime, stat.st_size, object_path))
+
+        # Least recently used first
+        objects.sort()
+        total_size = sum(size for _, size, _ in objects)
+
+        evicted = 0
+        for _, size, object_path in objects:
+            if total_size <= self._max_size:
+                break
+            object_path.unlink()
+            total_size -= size
+            evicted += 1
+
+        if evicted > 0:
+            print_notify(f"Evicted {evicted} file(s) from the APT proxy cache")
+
+    def print_summary(self) -> None:
+        lookups = self._hits + self._misses
+        hit_rate = f", {self._hits / lookups:.0%} hit rate" if lookups > 0 else ""
+        print_notify(
+            f"APT proxy: {self._hits} hit(s), {self._misses} miss(es){hit_rate}"
+        )
+
+    def _hit(
+        self, object_path: Path, record: Dict[str, Any]
+    ) -> Tuple[int, Optional[Path], Dict[str, str]]:
+        # The modification time marks when the file was last used
+        object_path.touch()
+        with self._lock:
+            self._hits += 1
+        return 200, object_path, _response_headers(record)
+
+    def _store(self, response: requests.Response) -> Path:
+        """Saves a download under the hash of its contents. The file is moved into
+        place with a rename, so concurrent requests never see a partially written file.
+        """
+        hasher = hashlib.sha256()
+        fd, temp_name = tempfile.mkstemp(prefix=".", dir=self._objects_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+                    hasher.update(chunk)
+                    f.write(chunk)
+            object_path = self._objects_dir / hasher.hexdigest()
+            os.replace(temp_name, object_path)
+        except BaseException:
+            Path(temp_name).unlink()
+            raise
+        return object_path
+
+    def _record_path(self, url: str) -> Path:
+        return self._urls_dir / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+    def _load_record(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            record: Dict[str, Any] = json.loads(self._record_path(url).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        return record
+
+    def _save_record(self, url: str, record: Dict[str, Any]) -> None:
+        record_path = self._record_path(url)
+        fd, temp_name = tempfile.mkstemp(prefix=".", dir=self._urls_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(record, f)
+        os.replace(temp_name, record_path)
+
+
+def apt_proxy_hook(proxy_url: str) -> str:
+    """Creates a pbuilder hook that makes APT download through the proxy. The local
+    repository is on the same machine, so it's reached directly.
+
+    :param proxy_url: The URL of the proxy
+    :return: The contents of the hook script
+    """
+    script = "#!/usr/bin/env bash\n"
+    script += "# Generated by Debutizer to use the caching APT proxy\n"
+    script += "set -o errexit\n"
+    script += f"cat > {_PROXY_CONFIG_FILE} << 'DEBUTIZER_EOF'\n"
+    script += f'Acquire::http::Proxy "{proxy_url}";\n'
+    script += 'Acquire::http::Proxy::localhost "DIRECT";\n'
+    script += "DEBUTIZER_EOF\n"
+    return script
+
+
+def _is_immutable(url: str) -> bool:
+    """
+    :return: True if the file at the URL never changes once it's published
+    """
+    return "/pool/" in url or "/by-hash/" in url
+
+
+def _response_headers(record: Dict[str, Any]) -> Dict[str, str]:
+    headers = {}
+    if record["content_type"] is not None:
+        headers["Content-Type"] = record["content_type"]
+    if record["last_modified"] is not None:
+        headers["Last-Modified"] = record["last_modified"]
+    return headers
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _ProxyRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, proxy: AptProxy, *args: Any, **kwargs: Any):
+        self._proxy = proxy
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self) -> None:
+        if not self.path.startswith("http://"):
+            self.send_error(400, "Only proxy requests for http:// URLs are supported")
+            return
+
+        status, object_path, headers = self._proxy.fetch(self.path)
+        if object_path is None:
+            self.send_error(status)
+            return
+
+        with object_path.open("rb") as f:
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Requests are already logged by APT in the build output
+        pass
+
+
+_TIMEOUT = 60
+"""The number of seconds to wait for a mirror to respond"""
+_CHUNK_SIZE = 1024 * 1024
+_PROXY_CONFIG_FILE = Path("/etc/apt/apt.conf.d/99debutizer-proxy")
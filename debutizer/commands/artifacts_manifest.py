@@ -0,0 +1,263 @@
+import json
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ..environment import Environment
+
+
+class ArtifactsManifest:
+    """Records which files in the artifacts directory belong to which package, along
+    with a key describing the inputs the files were built from. This allows the
+    artifacts directory to be updated in place, replacing only the files of packages
+    that have changed.
+
+    The manifest is saved every time a package's artifacts are published, so it also
+    serves as a journal of the packages finished by a run that was interrupted.
+
+    The manifest is stored in the artifacts directory, but is not itself an artifact
+    and is never uploaded.
+    """
+
+    def __init__(self, artifacts_dir: Path):
+        self._artifacts_dir = artifacts_dir
+        self._lock = Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._definitions: Dict[str, Dict[str, Any]] = {}
+        self._run: Optional[Dict[str, Any]] = None
+
+        manifest_file = self._manifest_file()
+        if manifest_file.is_file():
+            try:
+                contents = json.loads(manifest_file.read_text())
+            except ValueError:
+                contents = {}
+            if contents.get("version") == _FORMAT_VERSION:
+                self._entries = contents["packages"]
+                self._definitions = contents.get("definitions", {})
+                self._run = contents.get("run")
+
+    def is_current(self, env: Environment, name: str, key: str) -> bool:
+        """
+        :param env: The environment the package is for
+        :param name: The source package name
+        :param key: A key describing the package's current inputs
+        :return: True if the package's artifacts were built from the same inputs and
+            are all still present
+        """
+        with self._lock:
+            entry = self._entries.get(_entry_name(env, name))
+            if entry is None or entry["key"] != key:
+                return False
+            return all((self._artifacts_dir / f).is_file() for f in entry["files"])
+
+    def has_artifacts(self, env: Environment, name: str) -> bool:
+        """
+        :param env: The environment the package is for
+        :param name: The source package name
+        :return: True if artifacts of the package have been published
+        """
+        with self._lock:
+            return _entry_name(env, name) in self._entries
+
+    def replace(
+        self, env: Environment, name: str, key: str, files: Iterable[Path]
+    ) -> List[Path]:
+        """Records the given files as the package's artifacts, deleting any previous
+        artifacts of the package that were not replaced.
+
+        :param env: The environment the package is for
+        :param name: The source package name
+        :param key: A key describing the inputs the files were built from
+        :param files: The package's artifacts
+        :return: The files that were deleted
+        """
+        relative_files = sorted(str(f.relative_to(self._artifacts_dir)) for f in files)
+
+        with self._lock:
+            entry_name = _entry_name(env, name)
+            old_entry = self._entries.pop(entry_name, None)
+            self._entries[entry_name] = {"key": key, "files": relative_files}
+
+            if old_entry is None:
+                return []
+            return self._delete_unreferenced(old_entry["files"])
+
+    def prune(self, env: Environment, keep: Iterable[str]) -> List[Path]:
+        """Deletes the artifacts of packages in this environment that are not in the
+        given list, like packages that have been removed from the package directory.
+
+        :param env: The environment to prune
+        :param keep: The names of source packages that should be kept
+        :return: The files that were deleted
+        """
+        keep_names = {_entry_name(env, name) for name in keep}
+        prefix = _entry_name(env, "")
+
+        with self._lock:
+            stale_names = [
+                n for n in self._entries if n.startswith(prefix) and n not in keep_names
+            ]
+
+            deleted = []
+            for entry_name in stale_names:
+                entry = self._entries.pop(entry_name)
+                deleted += self._delete_unreferenced(entry["files"])
+            return deleted
+
+    def record_definitions(
+        self,
+        env: Environment,
+        definitions: Iterable["PackageDefinition"],
+        existing: Iterable[str],
+    ) -> None:
+        """Records what is known about packages after processing their package.py
+        files. This allows the dependency graph to be known without processing every
+        package.py file again.
+
+        :param env: The environment the packages were processed in
+        :param definitions: The packages that were processed
+        :param existing: The names of all directories in the package directory.
+            Packages defined in other directories are forgotten.
+        """
+        prefix = _entry_name(env, "")
+        existing_dirs = set(existing)
+
+        with self._lock:
+            for entry_name, recorded in list(self._definitions.items()):
+                if (
+                    entry_name.startswith(prefix)
+                    and recorded["directory"] not in existing_dirs
+                ):
+                    del self._definitions[entry_name]
+            for definition in definitions:
+                entry_name = _entry_name(env, definition.name)
+                self._definitions[entry_name] = definition.to_dict()
+
+    def definitions(self, env: Environment) -> Dict[str, "PackageDefinition"]:
+        """
+        :param env: The environment to get definitions for
+        :return: The most recently recorded definitions of packages in this
+            environment, keyed by source package name
+        """
+        prefix = _entry_name(env, "")
+
+        with self._lock:
+            return {
+                entry_name[len(prefix) :]: PackageDefinition.from_dict(
+                    entry_name[len(prefix) :], definition
+                )
+                for entry_name, definition in self._definitions.items()
+                if entry_name.startswith(prefix)
+            }
+
+    def begin_run(self, inputs: str) -> None:
+        """Records that a run has started.
+
+        :param inputs: Describes the inputs of the run as a whole, like the
+            configuration file
+        """
+        with self._lock:
+            self._run = {"inputs": inputs, "finished": False}
+
+    def finish_run(self) -> None:
+        """Records that the current run finished successfully"""
+        with self._lock:
+            if self._run is not None:
+                self._run["finished"] = True
+
+    def interrupted_run(self) -> Optional[str]:
+        """
+        :return: The inputs of the last run, if it did not finish successfully
+        """
+        with self._lock:
+            if self._run is None or self._run["finished"]:
+                return None
+            inputs: str = self._run["inputs"]
+            return inputs
+
+    def save(self) -> None:
+        with self._lock:
+            manifest_file = self._manifest_file()
+            manifest_file.parent.mkdir(parents=True, exist_ok=True)
+
+            temp_file = manifest_file.with_suffix(".tmp")
+            contents = {
+                "version": _FORMAT_VERSION,
+                "packages": self._entries,
+                "definitions": self._definitions,
+                "run": self._run,
+            }
+            temp_file.write_text(json.dumps(contents, indent=2, sort_keys=True))
+            temp_file.replace(manifest_file)
+
+    def _delete_unreferenced(self, files: List[str]) -> List[Path]:
+        """Deletes the given files, unless another package still references them. Files
+        like source archives may be shared between architectures and versions.
+        """
+        referenced: Set[str] = set()
+        for entry in self._entries.values():
+            referenced.update(entry["files"])
+
+        deleted = []
+        for file_ in files:
+            path = self._artifacts_dir / file_
+            if file_ not in referenced and path.is_file():
+                path.unlink()
+                deleted.append(path)
+        return deleted
+
+    def _manifest_file(self) -> Path:
+        return self._artifacts_dir / ".debutizer" / "manifest.json"
+
+
+class PackageDefinition:
+    """The parts of a processed package.py file that determine where the package fits in
+    the dependency graph
+    """
+
+    def __init__(
+        self,
+        name: str,
+        directory: str,
+        version: str,
+        binaries: List[str],
+        build_depends: List[str],
+    ):
+        self.name = name
+        """The source package name"""
+        self.directory = directory
+        """The name of the directory in the package directory that defines the
+        package
+        """
+        self.version = version
+        """The source package version"""
+        self.binaries = binaries
+        """The names of the binary packages the source package provides"""
+        self.build_depends = build_depends
+        """The names of the packages needed to build the source package"""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "version": self.version,
+            "binaries": self.binaries,
+            "build_depends": self.build_depends,
+        }
+
+    @staticmethod
+    def from_dict(name: str, definition: Dict[str, Any]) -> "PackageDefinition":
+        return PackageDefinition(
+            name=name,
+            directory=definition["directory"],
+            version=definition["version"],
+            binaries=definition["binaries"],
+            build_depends=definition["build_depends"],
+        )
+
+
+def _entry_name(env: Environment, name: str) -> str:
+    return f"{env.codename}/{env.architecture}/{name}"
+
+
+_FORMAT_VERSION = 1
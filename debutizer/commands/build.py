@@ -1,33 +1,67 @@
 import argparse
+import hashlib
 import shutil
+import statistics
+import time
+from pathlib import Path
+from threading import Event, Lock
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
 import requests
 
 from ..environment import Environment
 from ..errors import CommandError
 from ..package_py import PackagePy
-from ..print_utils import print_color, print_done, print_header, print_notify
+from ..print_utils import (
+    print_color,
+    print_done,
+    print_error,
+    print_header,
+    print_notify,
+    print_warning,
+)
 from ..registry import Registry
+from .apt_cache import AptCache
+from .apt_proxy import AptProxy
+from .artifacts_manifest import ArtifactsManifest
+from .build_cache import BuildCache, package_key
+from .build_durations import BuildDurations, format_duration
+from .chroot_backends import ChrootBackend, make_chroot_backend
+from .chroot_refresh import BackgroundRefresher
 from .command import Command
+from .compiler_cache import CompilerCache
 from .config_file import (
     Configuration,
     PackageSourceConfiguration,
-    UpstreamConfiguration,
 )
 from .env_argparse import EnvArgumentParser
 from .local_repo import LocalRepository
-from .repo_metadata import add_packages_files, add_release_files, add_sources_files
+from .package_graph import PackageGraph
+from .parallelism import build_parallelism
+from .repo_metadata import update_metadata
+from .scheduler import (
+    BuildScheduler,
+    ScheduleResult,
+    critical_path,
+    longest_remaining_paths,
+)
+from .tmpfs import TmpfsBuildPlaces
 from .utils import (
     build_package,
+    chroot_package_sources,
     copy_binary_artifacts,
     copy_source_artifacts,
+    find_build_dependencies,
     find_package_dirs,
     make_build_dir,
     make_chroot,
     make_source_files,
+    package_definition,
+    package_sources_hook,
     process_package_pys,
-    set_chroot_package_sources,
+    unconditional_build_depends,
 )
+from .warm_layers import best_warm_layer, make_warm_layers, plan_warm_layers
 
 
 class BuildCommand(Command):
@@ -40,6 +74,8 @@ class BuildCommand(Command):
         self.add_artifacts_dir_flag()
         self.add_config_file_flag()
         self.add_package_dir_flag()
+        self.add_incremental_flag()
+        self.add_no_fetch_cache_flag()
 
         self.parser.add_argument(
             "--shell-on-failure",
@@ -47,22 +83,98 @@ class BuildCommand(Command):
             help="If provided, a shell will be started in the build chroot if the "
             "build fails",
         )
+        self.parser.add_env_flag(
+            "--jobs",
+            type=int,
+            default=1,
+            required=False,
+            help="The maximum number of packages to build at once. A package is "
+            "started as soon as all of the packages it depends on have been built.",
+        )
+        self.parser.add_env_flag(
+            "--matrix-jobs",
+            type=int,
+            default=1,
+            required=False,
+            help="The maximum number of distribution/architecture pairs to build for "
+            "at once. Each pair has its own build directory and chroot.",
+        )
+        self.parser.add_env_flag(
+            "--resume",
+            action="store_true",
+            help="If provided, a build that was interrupted is continued, skipping "
+            "packages that it already finished. If the configuration has changed "
+            "since, the build starts from scratch.",
+        )
+        self.parser.add_env_flag(
+            "--keep-going",
+            action="store_true",
+            help="If provided, a failed package only prevents the packages that depend "
+            "on it from being built. All other packages are still built, and a summary "
+            "is printed at the end.",
+        )
+        self.parser.add_env_flag(
+            "--only",
+            type=_comma_separated,
+            required=False,
+            help="A comma-separated list of packages to build. Packages that depend "
+            "on them are rebuilt too, while the artifacts of all other packages are "
+            "kept. Implies --incremental.",
+        )
+        self.parser.add_env_flag(
+            "--with-deps",
+            action="store_true",
+            help="If provided with --only, the packages that the selected packages "
+            "depend on are built as well",
+        )
+        self.parser.add_env_flag(
+            "--no-build-cache",
+            action="store_true",
+            help="If provided, packages will always be built, even if a package with "
+            "the same inputs is in the build cache",
+        )
 
     def behavior(self, args: argparse.Namespace) -> None:
         config = self.parse_config_file(args)
 
-        if args.artifacts_dir.is_dir():
+        if args.jobs < 1:
+            raise CommandError("The --jobs flag must be at least 1")
+        if args.matrix_jobs < 1:
+            raise CommandError("The --matrix-jobs flag must be at least 1")
+        if args.shell_on_failure and (args.jobs > 1 or args.matrix_jobs > 1):
+            raise CommandError(
+                "The --shell-on-failure flag cannot be used when building more than "
+                "one package at a time"
+            )
+
+        if args.with_deps and args.only is None:
+            raise CommandError("The --with-deps flag can only be used with --only")
+
+        run_inputs = _run_inputs(args, config)
+        keep_artifacts = args.incremental or args.only is not None
+        if args.resume:
+            keep_artifacts = keep_artifacts or _can_resume(
+                args.artifacts_dir, run_inputs
+            )
+
+        if not keep_artifacts and args.artifacts_dir.is_dir():
             shutil.rmtree(args.artifacts_dir)
-        args.artifacts_dir.mkdir()
+        args.artifacts_dir.mkdir(exist_ok=True)
+        manifest = ArtifactsManifest(args.artifacts_dir)
+        manifest.begin_run(run_inputs)
+        manifest.save()
+        fetch_cache = self.make_fetch_cache(args)
 
-        registry = Registry()
         local_repo = LocalRepository(port=8080, artifacts_dir=args.artifacts_dir)
         local_repo.start()
         self.cleanup_hooks.append(local_repo.close)
 
+        # Every distribution/architecture pair gets its own build directory and
+        # chroot, so that pairs can be built concurrently
+        envs: Dict[Environment, Set[Environment]] = {}
         for arch in config.architectures:
             for distro in config.distributions:
-                build_dir = make_build_dir()
+                build_dir = make_build_dir(f"{distro}-{arch}")
 
                 env = Environment(
                     codename=distro,
@@ -70,22 +182,130 @@ class BuildCommand(Command):
                     package_root=args.package_dir,
                     build_root=build_dir,
                     artifacts_root=args.artifacts_dir,
+                    fetch_cache=fetch_cache,
                 )
+                envs[env] = set()
+
+        # The artifacts directory is shared, so only one pair may publish to it at once
+        publish_lock = Lock()
+        build_cache = None
+        if not args.no_build_cache:
+            build_cache = BuildCache()
+            self.cleanup_hooks.append(build_cache.evict)
+        build_durations = BuildDurations()
+        self.cleanup_hooks.append(build_durations.save)
+
+        apt_cache = None
+        if config.chroot.apt_cache_size > 0:
+            apt_cache = AptCache(max_size=config.chroot.apt_cache_size * 1024 * 1024)
+            self.cleanup_hooks.append(apt_cache.evict)
+
+        apt_proxy = None
+        if config.chroot.apt_proxy_size > 0:
+            apt_proxy = AptProxy(
+                max_size=config.chroot.apt_proxy_size * 1024 * 1024,
+                index_ttl=config.chroot.apt_proxy_ttl * 60,
+            )
+            apt_proxy.start()
+            self.cleanup_hooks.append(apt_proxy.close)
+            self.cleanup_hooks.append(apt_proxy.evict)
+
+        compiler_cache = None
+        if config.chroot.ccache_size > 0:
+            compiler_cache = CompilerCache(
+                max_size=config.chroot.ccache_size * 1024 * 1024
+            )
 
-                _build_packages(
-                    env=env,
-                    config=config,
-                    registry=registry,
-                    shell_on_failure=args.shell_on_failure,
-                )
+        tmpfs = None
+        if config.chroot.io_light:
+            tmpfs = TmpfsBuildPlaces(size=config.chroot.tmpfs_size * 1024 * 1024)
+
+        refresher = None
+        if config.chroot.max_age > 0:
+            refresher = BackgroundRefresher(
+                max_age=config.chroot.max_age * 24 * 60 * 60
+            )
+            # Refreshed chroots are only swapped in once the run has succeeded
+            self.cleanup_hooks.append(refresher.abandon)
+
+        def build_matrix_cell(env: Environment) -> ScheduleResult[PackagePy]:
+            return _build_packages(
+                env=env,
+                config=config,
+                registry=Registry(),
+                shell_on_failure=args.shell_on_failure,
+                jobs=args.jobs,
+                concurrent_envs=min(args.matrix_jobs, len(envs)),
+                publish_lock=publish_lock,
+                build_cache=build_cache,
+                build_durations=build_durations,
+                apt_cache=apt_cache,
+                apt_proxy=apt_proxy,
+                compiler_cache=compiler_cache,
+                tmpfs=tmpfs,
+                refresher=refresher,
+                manifest=manifest,
+                only=args.only,
+                with_dependencies=args.with_deps,
+                keep_going=args.keep_going,
+            )
+
+        cell_results: Dict[Environment, ScheduleResult[PackagePy]] = {}
+        scheduler = BuildScheduler(envs, jobs=args.matrix_jobs)
+        matrix_result = scheduler.run(
+            build_matrix_cell,
+            cell_results.__setitem__,
+            keep_going=args.keep_going,
+        )
+        if refresher is not None:
+            refresher.finish()
+
+        summaries = [build_cache, apt_cache, apt_proxy, compiler_cache, tmpfs]
+        if any(c is not None for c in summaries):
+            print_color("")
+        if build_cache is not None:
+            build_cache.print_summary()
+        if apt_cache is not None:
+            apt_cache.print_summary()
+        if apt_proxy is not None:
+            apt_proxy.print_summary()
+        if compiler_cache is not None:
+            compiler_cache.print_summary()
+        if tmpfs is not None:
+            tmpfs.print_summary()
+
+        if args.keep_going:
+            failure_count = _print_summary(envs, cell_results, matrix_result)
+            if failure_count > 0:
+                raise CommandError(f"{failure_count} build(s) failed")
+
+        manifest.finish_run()
+        manifest.save()
 
         print_color("")
         print_done("Build complete!")
 
 
 def _build_packages(
-    env: Environment, config: Configuration, registry: Registry, shell_on_failure: bool
-) -> None:
+    env: Environment,
+    config: Configuration,
+    registry: Registry,
+    shell_on_failure: bool,
+    jobs: int,
+    concurrent_envs: int,
+    publish_lock: Lock,
+    build_cache: Optional[BuildCache],
+    build_durations: BuildDurations,
+    apt_cache: Optional[AptCache],
+    apt_proxy: Optional[AptProxy],
+    compiler_cache: Optional[CompilerCache],
+    tmpfs: Optional[TmpfsBuildPlaces],
+    refresher: Optional[BackgroundRefresher],
+    manifest: ArtifactsManifest,
+    only: Optional[List[str]],
+    with_dependencies: bool,
+    keep_going: bool,
+) -> ScheduleResult[PackagePy]:
     """Builds packages for the given distribution/architecture pair"""
 
     print_header(
@@ -94,8 +314,32 @@ def _build_packages(
     )
 
     package_dirs = find_package_dirs(env.package_root)
-    chroot_archive_path = make_chroot(env.codename)
-    package_pys = process_package_pys(env, package_dirs, registry)
+    chroot = make_chroot_backend(config.chroot, env.codename, env.architecture)
+    package_sources = chroot_package_sources(config, env.codename)
+    make_chroot(chroot, package_sources)
+    base_chroot_digest = chroot.digest()
+    if tmpfs is not None and not chroot.SUPPORTS_BUILD_PLACE:
+        print_warning(
+            f"The {config.chroot.backend} chroot backend can't build on a tmpfs, so "
+            f"builds will be done on disk"
+        )
+        tmpfs = None
+    if refresher is not None:
+        refresher.start(chroot)
+    package_pys = process_package_pys(
+        env,
+        package_dirs,
+        registry,
+        only=only,
+        with_dependencies=with_dependencies,
+        definitions=manifest.definitions(env),
+    )
+    manifest.record_definitions(
+        env,
+        [package_definition(p) for p in package_pys],
+        existing=[d.name for d in package_dirs],
+    )
+    processed_names = {p.source_package.name for p in package_pys}
 
     if config.upstream is not None:
         new_package_pys = []
@@ -109,83 +353,411 @@ def _build_packages(
                 new_package_pys.append(package_py)
         package_pys = new_package_pys
 
+    # Packages that were not processed keep their artifacts from previous runs
+    unprocessed_names = [
+        n for n in manifest.definitions(env) if n not in processed_names
+    ]
+
+    with publish_lock:
+        # Remove artifacts left by packages that are no longer being built here
+        stale_files = manifest.prune(
+            env, [p.source_package.name for p in package_pys] + unprocessed_names
+        )
+        if len(stale_files) > 0:
+            print_notify("Removing artifacts for packages that are no longer built...")
+            update_metadata(env.artifacts_root, stale_files)
+        manifest.save()
+
+    # Packages that exist upstream are not built, so dependents get them through the
+    # upstream package source instead
+    dependencies = find_build_dependencies(package_pys)
+    dependency_versions = _find_dependency_versions(
+        env, manifest, {p.source_package.name for p in package_pys}, processed_names
+    )
+
+    # Local packages can't be pre-installed, since they haven't been published yet
+    local_binaries = {
+        b.package for p in package_pys for b in p.source_package.control.binaries
+    }
+    for definition in manifest.definitions(env).values():
+        local_binaries.update(definition.binaries)
+    build_depends = {
+        p: unconditional_build_depends(p.source_package) - local_binaries
+        for p in package_pys
+    }
+
+    layer_chroots: Dict[FrozenSet[str], ChrootBackend] = {}
+    if config.chroot.warm_layers > 0 and len(package_pys) > 0:
+        layer_chroots = _make_warm_layers(env, config, chroot, build_depends)
+
+    # The host's CPUs are shared by every build that may run at once
+    concurrent_builds = concurrent_envs * min(jobs, max(len(package_pys), 1))
+
+    # Start the packages with the longest chain of builds left behind them first
+    durations, unknown = _estimate_durations(env, package_pys, build_durations)
+    remaining_paths = longest_remaining_paths(dependencies, durations)
+    scheduler = BuildScheduler(dependencies, jobs=jobs, priorities=remaining_paths)
+
     print_color("")
     if len(package_pys) > 0:
         print_notify("Building the following packages in this order:")
-        for package_py in package_pys:
+        for package_py in scheduler.planned_order():
             print_color(f" * {package_py.source_package.name}")
+
+        _print_prediction(dependencies, durations, unknown, remaining_paths, jobs)
     else:
         print_notify("No packages will be built")
 
-    for i, package_py in enumerate(package_pys):
+    # Set once the local repository has packages for this environment
+    published = Event()
+    packages_files = env.artifacts_root.glob(
+        f"dists/{env.codename}/*/binary-{env.architecture}/Packages"
+    )
+    if any(True for _ in packages_files):
+        published.set()
+
+    def build(package_py: PackagePy) -> _BuildResult:
         print_color("")
         print_notify(f"Building {package_py.source_package.name}")
 
-        package_sources = []
-        if config.upstream is not None:
-            entry = _make_upstream_source_entry(config.upstream, env.codename)
-            package_sources.append(entry)
-        if i > 0:
-            # We can't add the local repo if this is the first package being built
+        local_package_source = None
+        if published.is_set():
+            # We can't add the local repo before anything has been published to it
             # because APT does not like empty repositories
-            package_source = PackageSourceConfiguration(
+            local_package_source = PackageSourceConfiguration(
                 entry=f"deb [trusted=yes] http://localhost:8080 {env.codename} main"
             )
-            package_sources.append(package_source)
-        package_sources += config.package_sources
-        set_chroot_package_sources(env.codename, package_sources)
 
+        key = package_key(
+            env=env,
+            package_py=package_py,
+            dependencies=dependency_versions[package_py.source_package.name],
+            chroot_digest=base_chroot_digest,
+            package_sources=config.package_sources,
+        )
+        if manifest.is_current(env, package_py.source_package.name, key):
+            print_color(
+                f"Package {package_py.source_package.name} is unchanged and its "
+                f"artifacts are already present, so it will not be built"
+            )
+            return _BuildResult(key, None, None)
+
+        if build_cache is not None:
+            cached_dir = build_cache.restore(key)
+            if cached_dir is not None:
+                print_color(
+                    f"Package {package_py.source_package.name} is unchanged, so it "
+                    f"will be restored from the build cache"
+                )
+                return _BuildResult(key, cached_dir, cached_dir)
+
+        # Layers are only used by packages that need everything in them, so the
+        # results are the same as building in the base chroot
+        layer = best_warm_layer(layer_chroots, build_depends[package_py])
+        if layer is not None:
+            print_color(
+                f"Using a warm chroot layer with {len(layer)} of its build "
+                f"dependencies pre-installed"
+            )
+
+        parallel = build_parallelism(
+            concurrent_builds, package_py.parallel, package_py.max_parallel
+        )
+        print_color(f"Building with up to {parallel} parallel job(s)")
+
+        start_time = time.monotonic()
         source_results_dir = make_source_files(
             env.build_root, package_py.source_package
         )
         binary_results_dir = build_package(
             source_package=package_py.source_package,
             build_dir=env.build_root,
-            chroot_archive_path=chroot_archive_path,
+            chroot=chroot if layer is None else layer_chroots[layer],
             network_access=env.network_access,
             shell_on_failure=shell_on_failure,
+            log_file=_log_file(env, package_py),
+            package_sources=package_sources,
+            local_package_source=local_package_source,
+            apt_cache=apt_cache,
+            apt_proxy=apt_proxy,
+            compiler_cache=compiler_cache,
+            parallel=parallel,
+            tmpfs=tmpfs,
+            unsafe_io=config.chroot.io_light,
         )
+        duration = time.monotonic() - start_time
+        build_durations.record(env, package_py.source_package.name, duration)
+        print_color(
+            f"Built {package_py.source_package.name} in {format_duration(duration)}"
+        )
+
+        if build_cache is not None:
+            build_cache.store(key, [source_results_dir, binary_results_dir])
+
+        return _BuildResult(key, source_results_dir, binary_results_dir)
+
+    def publish(package_py: PackagePy, result: _BuildResult) -> None:
+        if result.source_results_dir is None or result.binary_results_dir is None:
+            # The package's artifacts are already in place
+            return
+
+        with publish_lock:
+            new_files = copy_source_artifacts(
+                results_dir=result.source_results_dir,
+                artifacts_dir=env.artifacts_root,
+                distribution=env.codename,
+                component=package_py.component,
+            )
+            new_files += copy_binary_artifacts(
+                results_dir=result.binary_results_dir,
+                artifacts_dir=env.artifacts_root,
+                distribution=env.codename,
+                component=package_py.component,
+                architecture=env.architecture,
+            )
+            old_files = manifest.replace(
+                env, package_py.source_package.name, result.key, new_files
+            )
+
+            print_notify(
+                f"Updating metadata files for {package_py.source_package.name}..."
+            )
+            update_metadata(env.artifacts_root, new_files + old_files)
+            manifest.save()
+        published.set()
+
+    return scheduler.run(build, publish, keep_going=keep_going)
+
+
+class _BuildResult:
+    def __init__(
+        self,
+        key: str,
+        source_results_dir: Optional[Path],
+        binary_results_dir: Optional[Path],
+    ):
+        self.key = key
+        """Describes the inputs the package was built from"""
+        self.source_results_dir = source_results_dir
+        """Where the source package files are, or None if they are already published"""
+        self.binary_results_dir = binary_results_dir
+        """Where the binary package files are, or None if they are already published"""
+
+
+def _run_inputs(args: argparse.Namespace, config: Configuration) -> str:
+    """Creates a digest of the inputs to a build that are not covered by the keys of
+    individual packages
+    """
+    hasher = hashlib.sha256()
+
+    def add(label: str, value: object) -> None:
+        hasher.update(f"{label}={value}\0".encode())
 
-        copy_source_artifacts(
-            results_dir=source_results_dir,
-            artifacts_dir=env.artifacts_root,
-            distribution=env.codename,
-            component=package_py.component,
+    add("package_dir", args.package_dir.resolve())
+    add("distributions", config.distributions)
+    add("architectures", config.architectures)
+    for package_source in config.package_sources:
+        add("package_source", f"{package_source.entry} {package_source.gpg_key_url}")
+    if config.upstream is not None:
+        upstream = config.upstream
+        add(
+            "upstream",
+            f"{upstream.url} {upstream.components} {upstream.is_trusted} "
+            f"{upstream.gpg_key_url}",
+        )
+
+    return hasher.hexdigest()
+
+
+def _can_resume(artifacts_dir: Path, run_inputs: str) -> bool:
+    """Checks if the artifacts directory holds an interrupted build with the same
+    inputs as this one
+    """
+    interrupted_inputs = None
+    if artifacts_dir.is_dir():
+        interrupted_inputs = ArtifactsManifest(artifacts_dir).interrupted_run()
+
+    if interrupted_inputs is None:
+        print_warning("No interrupted build was found, so building from scratch")
+        return False
+    elif interrupted_inputs != run_inputs:
+        print_warning(
+            "The configuration has changed since the interrupted build, so building "
+            "from scratch"
+        )
+        return False
+    else:
+        print_notify(
+            "Resuming the interrupted build. Packages it finished will be skipped if "
+            "their inputs have not changed."
         )
-        copy_binary_artifacts(
-            results_dir=binary_results_dir,
-            artifacts_dir=env.artifacts_root,
-            distribution=env.codename,
-            component=package_py.component,
-            architecture=env.architecture,
+        return True
+
+
+def _log_file(env: Environment, package_py: PackagePy) -> Path:
+    return env.build_root / "logs" / f"{package_py.source_package.name}.log"
+
+
+def _print_summary(
+    envs: Iterable[Environment],
+    cell_results: Dict[Environment, ScheduleResult[PackagePy]],
+    matrix_result: ScheduleResult[Environment],
+) -> int:
+    """Prints which packages succeeded, failed, or were skipped in each
+    distribution/architecture pair
+
+    :return: The number of failures
+    """
+    failure_count = 0
+
+    for env in envs:
+        print_color("")
+        print_notify(
+            f"Summary for distribution '{env.codename}' on architecture "
+            f"'{env.architecture}':"
         )
 
-        print_notify("Updating metadata files...")
-        add_packages_files(env.artifacts_root)
-        add_sources_files(env.artifacts_root)
-        add_release_files(
-            env.artifacts_root,
-            sign=False,
-            gpg_key_id=None,
-            gpg_signing_key=None,
-            gpg_signing_password=None,
+        if env in matrix_result.failed:
+            failure_count += 1
+            print_error(f"  Failed before building: {matrix_result.failed[env]}")
+            continue
+
+        result = cell_results[env]
+        failure_count += len(result.failed)
+
+        succeeded = [p.source_package.name for p in result.succeeded]
+        print_color(f"  Succeeded ({len(succeeded)}): {', '.join(succeeded)}")
+
+        if len(result.failed) > 0:
+            print_error(f"  Failed ({len(result.failed)}):")
+            for package_py, ex in result.failed.items():
+                print_error(f"   * {package_py.source_package.name}: {ex}")
+                log_file = _log_file(env, package_py)
+                if log_file.is_file():
+                    print_color(f"     Log: {log_file}")
+
+        if len(result.skipped) > 0:
+            print_warning(f"  Skipped ({len(result.skipped)}):")
+            for package_py, failed in result.skipped.items():
+                print_warning(
+                    f"   * {package_py.source_package.name} (depends on "
+                    f"{failed.source_package.name})"
+                )
+
+    return failure_count
+
+
+def _find_dependency_versions(
+    env: Environment,
+    manifest: ArtifactsManifest,
+    built_names: Set[str],
+    processed_names: Set[str],
+) -> Dict[str, Dict[str, str]]:
+    """Finds the versions of the locally built source packages that each package
+    depends on, including packages that were not processed in this run but whose
+    artifacts are still published.
+
+    :return: Maps each source package name to the names and versions of the source
+        packages it depends on
+    """
+    definitions = manifest.definitions(env)
+
+    graph: PackageGraph[str] = PackageGraph()
+    for name, definition in definitions.items():
+        graph.add(
+            name,
+            name=name,
+            binaries=definition.binaries,
+            build_depends=definition.build_depends,
         )
 
+    versions = {}
+    for name, dependencies in graph.dependencies().items():
+        versions[name] = {
+            d: definitions[d].version
+            for d in dependencies
+            if d in built_names
+            or (d not in processed_names and manifest.has_artifacts(env, d))
+        }
+    return versions
 
-def _make_upstream_source_entry(
-    upstream: UpstreamConfiguration, distribution: str
-) -> PackageSourceConfiguration:
-    """Creates an APT source list entry based on the provided configuration"""
-    parameters = ""
-    if upstream.is_trusted:
-        parameters = "[trusted=yes]"
 
-    components_str = " ".join(upstream.components)
+def _comma_separated(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip() != ""]
 
-    return PackageSourceConfiguration(
-        entry=f"deb {parameters} {upstream.url} {distribution} {components_str}",
-        gpg_key_url=upstream.gpg_key_url,
-    )
+
+def _estimate_durations(
+    env: Environment, package_pys: List[PackagePy], build_durations: BuildDurations
+) -> Tuple[Dict[PackagePy, float], List[PackagePy]]:
+    """Estimates how long each package will take to build based on previous builds.
+    Packages that have never been built are assumed to take as long as a typical
+    package.
+
+    :return: The estimated durations, and the packages that have never been built
+    """
+    estimates = {
+        p: build_durations.estimate(env, p.source_package.name) for p in package_pys
+    }
+    known = [e for e in estimates.values() if e is not None]
+    typical = statistics.median(known) if len(known) > 0 else 1.0
+
+    durations = {p: e if e is not None else typical for p, e in estimates.items()}
+    unknown = [p for p, e in estimates.items() if e is None]
+    return durations, unknown
+
+
+def _print_prediction(
+    dependencies: Dict[PackagePy, Set[PackagePy]],
+    durations: Dict[PackagePy, float],
+    unknown: List[PackagePy],
+    remaining_paths: Dict[PackagePy, float],
+    jobs: int,
+) -> None:
+    """Prints the chain of packages that limits how quickly the build can finish, and
+    an estimate of how long the build will take
+    """
+    path = critical_path(dependencies, remaining_paths)
+    print_color("")
+    print_notify("Predicted critical path:")
+    print_color("   " + " -> ".join(p.source_package.name for p in path))
+
+    if len(unknown) == len(durations):
+        print_color("No packages have been built before, so no estimate is available")
+        return
+
+    # The build can't finish faster than its critical path, or faster than the total
+    # work divided between the jobs
+    eta = max(remaining_paths[path[0]], sum(durations.values()) / jobs)
+    message = f"Estimated build time: {format_duration(eta)}"
+    if len(unknown) > 0:
+        message += (
+            f" ({len(unknown)} package(s) have not been built before and are assumed "
+            f"to take a typical amount of time)"
+        )
+    print_color(message)
+
+
+def _make_warm_layers(
+    env: Environment,
+    config: Configuration,
+    chroot: ChrootBackend,
+    build_depends: Dict[PackagePy, Set[str]],
+) -> Dict[FrozenSet[str], ChrootBackend]:
+    """Creates chroot layers with the build dependencies most packages share
+    pre-installed
+
+    :param env: The environment packages are built in
+    :param config: The configuration file
+    :param chroot: The base chroot
+    :param build_depends: The packages each package needs that could be pre-installed
+    :return: The chroot for each layer's set of pre-installed packages
+    """
+    layers = plan_warm_layers(build_depends, config.chroot.warm_layers)
+    if len(layers) == 0:
+        print_color("No build dependencies are shared widely enough to pre-install")
+
+    package_sources = chroot_package_sources(config, env.codename)
+    return make_warm_layers(chroot, layers, package_sources_hook(package_sources))
 
 
 def _exists_upstream(
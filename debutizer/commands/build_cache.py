@@ -0,0 +1,202 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from xdg.BaseDirectory import save_cache_path
+
+from ..digest import digest_file, update_with_tree
+from ..environment import Environment
+from ..package_py import PackagePy
+from ..print_utils import print_notify
+from ..upstreams.base import read_upstream_identity
+from .artifacts import find_artifacts, find_changes_files, find_source_archives
+from .config_file import PackageSourceConfiguration
+
+_DAY = 24 * 60 * 60
+_GIBIBYTE = 1024 * 1024 * 1024
+
+
+class BuildCache:
+    """A content-addressed cache of build outputs. Outputs are stored under a key that
+    covers everything that goes into building a package, so packages whose inputs have
+    not changed can be restored from the cache instead of being built again.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_age: float = 30 * _DAY,
+        max_size: int = 20 * _GIBIBYTE,
+    ):
+        """
+        :param cache_dir: The directory to store outputs in. Defaults to a directory
+            in the XDG cache.
+        :param max_age: Entries that have not been used for this many seconds are
+            evicted
+        :param max_size: If the cache is larger than this many bytes, the least
+            recently used entries are evicted until it fits
+        """
+        if cache_dir is None:
+            cache_dir = Path(save_cache_path("debutizer")) / "build-cache"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._cache_dir = cache_dir
+        self._max_age = max_age
+        self._max_size = max_size
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def restore(self, key: str) -> Optional[Path]:
+        """Looks for cached outputs under the given key, counting the lookup as a hit or
+        miss.
+
+        :param key: The cache key
+        :return: The directory with the cached outputs, or None if there are none
+        """
+        entry_dir = self._entry_dir(key)
+
+        with self._lock:
+            if entry_dir.is_dir():
+                # The modification time marks when the entry was last used
+                os.utime(entry_dir)
+                self._hits += 1
+                return entry_dir
+            else:
+                self._misses += 1
+                return None
+
+    def store(self, key: str, results_dirs: List[Path]) -> None:
+        """Saves the outputs in the given directories under the key.
+
+        :param key: The cache key
+        :param results_dirs: Directories containing build outputs
+        """
+        entry_dir = self._entry_dir(key)
+        if entry_dir.is_dir():
+            return
+        entry_dir.parent.mkdir(parents=True, exist_ok=True)
+
+        # Assemble the entry somewhere else first, so that a partially written entry is
+        # never used
+        temp_dir = Path(tempfile.mkdtemp(prefix=".", dir=entry_dir.parent))
+        try:
+            for results_dir in set(results_dirs):
+                outputs = find_artifacts(results_dir) + find_changes_files(results_dir)
+                for output in outputs:
+                    shutil.copy2(output, temp_dir)
+
+            try:
+                temp_dir.rename(entry_dir)
+            except OSError:
+                if not entry_dir.is_dir():
+                    raise
+                # Another build stored the same outputs first
+        finally:
+            if temp_dir.is_dir():
+                shutil.rmtree(temp_dir)
+
+    def evict(self) -> None:
+        """Removes entries that are too old, then the least recently used entries until
+        the cache fits in its maximum size
+        """
+        entries: List[Tuple[float, int, Path]] = []
+        for entry_dir in self._cache_dir.glob("*/*"):
+            if entry_dir.name.startswith("."):
+                # Still being stored
+                continue
+            try:
+                last_used = entry_dir.stat().st_mtime
+                size = sum(output.stat().st_size for output in entry_dir.iterdir())
+            except FileNotFoundError:
+                continue
+            entries.append((last_used, size, entry_dir))
+
+        # Least recently used first
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        now = time.time()
+
+        evicted = 0
+        for last_used, size, entry_dir in entries:
+            if now - last_used <= self._max_age and total_size <= self._max_size:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+            evicted += 1
+
+        if evicted > 0:
+            print_notify(f"Evicted {evicted} package(s) from the build cache")
+
+    def print_summary(self) -> None:
+        print_notify(f"Build cache: {self._hits} hit(s), {self._misses} miss(es)")
+
+    def _entry_dir(self, key: str) -> Path:
+        return self._cache_dir / key[:2] / key
+
+
+def package_key(
+    env: Environment,
+    package_py: PackagePy,
+    dependencies: Dict[str, str],
+    chroot_digest: str,
+    package_sources: List[PackageSourceConfiguration],
+) -> str:
+    """Creates a key describing all inputs that go into building the given package. If
+    the key has not changed, neither have the package's build outputs. This must be
+    called after the package's pre-build hook has been run.
+
+    :param env: The environment the package is being built in
+    :param package_py: The package to create a key for
+    :param dependencies: The names and versions of the source packages that provide
+        this package's build dependencies
+    :param chroot_digest: A digest of the chroot the package is built in
+    :param package_sources: Extra package sources available during the build
+    :return: The key
+    """
+    source_package = package_py.source_package
+    hasher = hashlib.sha256()
+
+    def add(label: str, value: object) -> None:
+        hasher.update(f"{label}={value}\0".encode())
+
+    add("format", _FORMAT_VERSION)
+    add("codename", env.codename)
+    add("architecture", env.architecture)
+    add("network_access", env.network_access)
+    add("name", source_package.name)
+    add("version", source_package.version)
+    add("component", package_py.component)
+
+    # The package definition, including the package.py and any files next to it
+    hasher.update(b"definition\0")
+    update_with_tree(hasher, package_py.path.parent)
+
+    # The debian/ directory, as left by the package.py and pre-build hook
+    hasher.update(b"debian\0")
+    update_with_tree(hasher, source_package.directory / "debian")
+
+    identity = read_upstream_identity(source_package.directory)
+    if identity is None:
+        # This upstream doesn't identify its source, so use the source archive
+        archives = sorted(find_source_archives(source_package.directory.parent))
+        identity = ",".join(digest_file(a) for a in archives)
+    add("upstream", identity)
+
+    add("chroot", chroot_digest)
+    for package_source in package_sources:
+        add("package_source", f"{package_source.entry} {package_source.gpg_key_url}")
+
+    for name, version in sorted(dependencies.items()):
+        add("dependency", f"{name} {version}")
+
+    return hasher.hexdigest()
+
+
+_FORMAT_VERSION = 1
+"""Changing this invalidates all existing package keys"""
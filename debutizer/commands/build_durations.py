@@ -0,0 +1,93 @@
+import json
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
+
+from xdg.BaseDirectory import save_cache_path
+
+from ..environment import Environment
+
+
+class BuildDurations:
+    """Remembers how long packages took to build in each distribution/architecture
+    pair, so that later runs can predict how long a build will take.
+    """
+
+    def __init__(self, history_file: Optional[Path] = None):
+        """
+        :param history_file: The file to keep durations in. Defaults to a file in the
+            XDG cache.
+        """
+        if history_file is None:
+            history_file = Path(save_cache_path("debutizer")) / "build-durations.json"
+        self._history_file = history_file
+        self._lock = Lock()
+        self._durations: Dict[str, float] = {}
+
+        if history_file.is_file():
+            try:
+                contents = json.loads(history_file.read_text())
+            except ValueError:
+                contents = {}
+            if contents.get("version") == _FORMAT_VERSION:
+                self._durations = contents["durations"]
+
+    def estimate(self, env: Environment, name: str) -> Optional[float]:
+        """
+        :param env: The environment the package is built in
+        :param name: The source package name
+        :return: The expected build duration in seconds, or None if the package has
+            never been built in this environment
+        """
+        with self._lock:
+            return self._durations.get(_entry_name(env, name))
+
+    def record(self, env: Environment, name: str, seconds: float) -> None:
+        """Records how long a build took. Durations are smoothed over past builds, so
+        that one unusually slow or fast build doesn't throw off estimates.
+
+        :param env: The environment the package was built in
+        :param name: The source package name
+        :param seconds: How long the build took
+        """
+        with self._lock:
+            entry_name = _entry_name(env, name)
+            previous = self._durations.get(entry_name)
+            if previous is not None:
+                seconds = _SMOOTHING * seconds + (1 - _SMOOTHING) * previous
+            self._durations[entry_name] = seconds
+
+    def save(self) -> None:
+        with self._lock:
+            self._history_file.parent.mkdir(parents=True, exist_ok=True)
+
+            temp_file = self._history_file.with_suffix(".tmp")
+            contents = {"version": _FORMAT_VERSION, "durations": self._durations}
+            temp_file.write_text(json.dumps(contents, indent=2, sort_keys=True))
+            temp_file.replace(self._history_file)
+
+
+def format_duration(seconds: float) -> str:
+    """
+    :param seconds: A duration in seconds
+    :return: The duration in a human-readable form, like "1h 5m" or "42s"
+    """
+    seconds = round(seconds)
+    hours, remainder = divmod(seconds, 60 * 60)
+    minutes, seconds = divmod(remainder, 60)
+
+    if hours > 0:
+        return f"{hours}h {minutes}m"
+    elif minutes > 0:
+        return f"{minutes}m {seconds}s"
+    else:
+        return f"{seconds}s"
+
+
+def _entry_name(env: Environment, name: str) -> str:
+    return f"{env.codename}/{env.architecture}/{name}"
+
+
+_FORMAT_VERSION = 1
+_SMOOTHING = 0.5
+"""How much weight a new duration has over previous durations"""
@@ -59,7 +59,6 @@ class CheckCommand(Command):
 _DEPENDENCIES = {
     "dpkg-dev": ["dpkg-scanpackages", "dpkg-scansources", "dpkg-genchanges"],
     "gpg": ["gpg"],
-    "apt-utils": ["apt-ftparchive"],
     "quilt": ["quilt"],
     "pbuilder": ["pbuilder"],
     "s3fs": ["s3fs"],
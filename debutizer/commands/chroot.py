@@ -0,0 +1,82 @@
+import argparse
+import sys
+
+from ..errors import CommandError
+from ..print_utils import print_color, print_done, print_header
+from .chroot_backends import make_chroot_backend
+from .chroot_refresh import refresh_chroot
+from .command import Command
+from .env_argparse import EnvArgumentParser
+from .utils import chroot_package_sources, make_chroot
+
+
+class ChrootCommand(Command):
+    """Manages the chroots that packages are built in"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.parser = EnvArgumentParser(
+            prog="debutizer chroot",
+            description="Manages build chroots",
+            usage=_USAGE,
+        )
+
+        self.parser.add_argument("command", nargs="?", help="The command to run")
+
+        self.add_subcommand("refresh", ChrootRefreshCommand())
+
+    def parse_args(self) -> argparse.Namespace:
+        return self.parser.parse_args(sys.argv[2:3])
+
+    def behavior(self, args: argparse.Namespace) -> None:
+        if args.command is None:
+            self.parser.print_usage()
+        elif args.command in self.subcommands:
+            command = self.subcommands[args.command]
+            command.run()
+        else:
+            raise CommandError(f"Unknown chroot command: {args.command}")
+
+
+class ChrootRefreshCommand(Command):
+    """Brings chroots up to date with the latest packages"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.parser = EnvArgumentParser(
+            prog="debutizer chroot refresh",
+            description="Brings the chroots for every distribution and architecture "
+            "up to date. Each chroot is refreshed alongside the old one, which builds "
+            "that are already running keep using.",
+        )
+
+        self.add_config_file_flag()
+
+    def parse_args(self) -> argparse.Namespace:
+        return self.parser.parse_args(sys.argv[3:])
+
+    def behavior(self, args: argparse.Namespace) -> None:
+        config = self.parse_config_file(args)
+
+        for arch in config.architectures:
+            for distro in config.distributions:
+                print_header(
+                    f"Refreshing the chroot for distribution '{distro}' on "
+                    f"architecture '{arch}'"
+                )
+                chroot = make_chroot_backend(config.chroot, distro, arch)
+                # A new chroot is already up to date
+                existed = chroot.exists()
+                make_chroot(chroot, chroot_package_sources(config, distro))
+                if existed:
+                    refresh_chroot(chroot)
+
+        print_color("")
+        print_done("Chroots refreshed!")
+
+
+_USAGE = """debutizer chroot <command> [<args>]
+
+Commands:
+  refresh   Brings chroots up to date with the latest packages
+"""
@@ -0,0 +1,33 @@
+from ...errors import UnexpectedError
+from ..config_file import ChrootConfiguration
+from .abstract import ChrootBackend
+from .cowbuilder import CowbuilderChrootBackend
+from .overlayfs import OverlayfsChrootBackend
+from .tgz import TgzChrootBackend
+
+__all__ = [
+    "ChrootBackend",
+    "CowbuilderChrootBackend",
+    "OverlayfsChrootBackend",
+    "TgzChrootBackend",
+    "make_chroot_backend",
+]
+
+
+def make_chroot_backend(
+    config: ChrootConfiguration, distribution: str, architecture: str
+) -> ChrootBackend:
+    """Creates the chroot backend selected in the configuration file
+
+    :param config: The chroot configuration
+    :param distribution: The distribution codename of the chroot
+    :param architecture: The CPU architecture of the chroot
+    """
+    if config.backend == TgzChrootBackend.TYPE:
+        return TgzChrootBackend(distribution, architecture)
+    elif config.backend == CowbuilderChrootBackend.TYPE:
+        return CowbuilderChrootBackend(distribution, architecture)
+    elif config.backend == OverlayfsChrootBackend.TYPE:
+        return OverlayfsChrootBackend(distribution, architecture)
+    else:
+        raise UnexpectedError(f"Unknown chroot backend '{config.backend}'")
@@ -0,0 +1,234 @@
+import os
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+from ...subprocess_utils import run
+from ..chroot_metadata import chroot_digest
+
+
+class ChrootBackend(ABC):
+    """A way of storing the chroot that packages are built in, and of giving each build
+    its own copy of it
+    """
+
+    SUFFIX: str
+    """The file extension of the base chroot"""
+    SUPPORTS_BUILD_PLACE = True
+    """If True, builds can make their copy of the chroot in any directory"""
+
+    def __init__(
+        self, distribution: str, architecture: str, layer: Optional[str] = None
+    ):
+        """
+        :param distribution: The distribution codename of the chroot
+        :param architecture: The CPU architecture of the chroot
+        :param layer: If provided, this is a chroot derived from the chroot for the
+            distribution/architecture pair, identified by this name
+        """
+        self.distribution = distribution
+        self.architecture = architecture
+        self.layer = layer
+
+    @property
+    def base_path(self) -> Path:
+        """The path to the base chroot"""
+        name = f"debutizer-{self.distribution}-{self.architecture}"
+        if self.layer is not None:
+            name += f"-{self.layer}"
+        return pbuilder_cache_dir() / f"{name}{self.SUFFIX}"
+
+    @abstractmethod
+    def create(self) -> None:
+        """Creates the base chroot. Called only if the base chroot doesn't exist."""
+
+    def create_flags(self) -> List[Union[str, Path]]:
+        """
+        :return: Flags for "pbuilder create" that make the chroot for its architecture.
+            Chroots for other architectures than the host's are bootstrapped with
+            qemu-debootstrap and run under QEMU user mode emulation.
+        """
+        flags: List[Union[str, Path]] = ["--architecture", self.architecture]
+        if self.architecture != host_architecture():
+            flags += ["--debootstrap", "qemu-debootstrap"]
+        return flags
+
+    @abstractmethod
+    def execute(self, script: Path, bind_mounts: Optional[List[Path]] = None) -> None:
+        """Runs a script in the base chroot, keeping any changes it makes. This must not
+        be done while the chroot is being used by builds.
+
+        :param script: The script to run
+        :param bind_mounts: Host directories to make available at the same path in the
+            chroot
+        """
+
+    @abstractmethod
+    @contextmanager
+    def build_command(
+        self, build_place: Optional[Path] = None
+    ) -> Iterator[List[Union[str, Path]]]:
+        """Prepares a copy of the chroot for a single build.
+
+        :param build_place: If provided, the directory to make the copy in. Only
+            supported if SUPPORTS_BUILD_PLACE is True.
+        :return: The start of a pbuilder command that builds a package in the copy. Any
+            other pbuilder build flags may be appended to it. The copy is discarded
+            when the context is exited.
+        """
+
+    def make_layer(self, layer: str) -> "ChrootBackend":
+        """
+        :param layer: The name of the layer
+        :return: A chroot of the same kind, derived from this chroot
+        """
+        return type(self)(self.distribution, self.architecture, layer)
+
+    def existing_layers(self) -> List["ChrootBackend"]:
+        """
+        :return: The layers derived from this chroot that currently exist
+        """
+        prefix = f"debutizer-{self.distribution}-{self.architecture}-"
+        layers = []
+        for path in pbuilder_cache_dir().glob(f"{prefix}*{self.SUFFIX}"):
+            layers.append(self.make_layer(path.name[len(prefix) : -len(self.SUFFIX)]))
+        return layers
+
+    def create_from(self, chroot: "ChrootBackend") -> None:
+        """Creates the base chroot as a copy of another chroot of the same kind
+
+        :param chroot: The chroot to copy
+        """
+        run(
+            ["cp", "--archive", chroot.current_path(), self.base_path],
+            on_failure="Failed to copy the chroot",
+            root=True,
+        )
+
+    def current_path(self) -> Path:
+        """
+        :return: The path to the current generation of the base chroot. Directory
+            chroots that have been refreshed are symbolic links to their current
+            generation.
+        """
+        return self.base_path.resolve()
+
+    def replace_with(self, chroot: "ChrootBackend") -> None:
+        """Atomically makes another chroot of the same kind the base chroot. Builds that
+        have already started keep using the old base chroot.
+
+        :param chroot: The chroot to move into place
+        """
+        if not chroot.base_path.is_dir():
+            # Renaming a file over another is atomic, and builds that are extracting
+            # the old archive keep reading it until they're done
+            run(
+                ["mv", "--no-target-directory", chroot.base_path, self.base_path],
+                on_failure="Failed to replace the chroot",
+                root=True,
+            )
+            return
+
+        # A directory can't be renamed over another one, so directory chroots are
+        # symbolic links to a generation instead, and the link is replaced
+        generation = self._generation_path(str(time.time_ns()))
+        run(
+            ["mv", "--no-target-directory", chroot.base_path, generation],
+            on_failure="Failed to replace the chroot",
+            root=True,
+        )
+        if self.base_path.is_dir() and not self.base_path.is_symlink():
+            # Chroots from before their first refresh become the first generation
+            run(
+                ["mv", self.base_path, self._generation_path("0")],
+                on_failure="Failed to replace the chroot",
+                root=True,
+            )
+        link = self._generation_path("link")
+        run(
+            ["ln", "--symbolic", "--force", "--no-target-directory", generation, link],
+            on_failure="Failed to replace the chroot",
+            root=True,
+        )
+        run(
+            ["mv", "--no-target-directory", link, self.base_path],
+            on_failure="Failed to replace the chroot",
+            root=True,
+        )
+
+    def remove_old_generations(self) -> None:
+        """Removes generations of a directory chroot that were replaced by a refresh.
+        This must not be done while builds that started before the refresh are still
+        running.
+        """
+        current = self.current_path()
+        for generation in self.base_path.parent.glob(f"{self.base_path.name}.*"):
+            if generation != current and generation.name.split(".")[-1].isdigit():
+                run(
+                    ["rm", "--recursive", "--force", generation],
+                    on_failure="Failed to remove an old generation of the chroot",
+                    root=True,
+                )
+
+    def exists(self) -> bool:
+        return self.base_path.exists()
+
+    def remove(self) -> None:
+        """Removes the base chroot, like after it failed to be created"""
+        if self.base_path.is_symlink():
+            run(
+                ["rm", "--recursive", "--force", self.current_path(), self.base_path],
+                on_failure="Failed to remove the chroot",
+                root=True,
+            )
+        elif self.base_path.is_dir():
+            run(
+                ["rm", "--recursive", "--force", self.base_path],
+                on_failure="Failed to remove the chroot",
+                root=True,
+            )
+        elif self.base_path.exists():
+            self.base_path.unlink()
+
+    def digest(self) -> str:
+        """
+        :return: A digest identifying the base system of the chroot
+        """
+        return chroot_digest(self.base_path)
+
+    def _generation_path(self, name: str) -> Path:
+        return self.base_path.with_name(f"{self.base_path.name}.{name}")
+
+
+def bind_mount_flags(bind_mounts: Optional[List[Path]]) -> List[Union[str, Path]]:
+    """
+    :param bind_mounts: Host directories to make available in the chroot
+    :return: pbuilder flags that bind-mount the directories
+    """
+    flags: List[Union[str, Path]] = []
+    for bind_mount in bind_mounts or []:
+        flags += ["--bindmounts", bind_mount]
+    return flags
+
+
+def host_architecture() -> str:
+    """
+    :return: Debian's name for the host CPU architecture
+    """
+    result = run(
+        ["dpkg", "--print-architecture"],
+        on_failure="Failed to get the host architecture",
+        stdout=subprocess.PIPE,
+        encoding="utf-8",
+    )
+    return result.stdout.strip()
+
+
+def pbuilder_cache_dir() -> Path:
+    """
+    :return: The directory where chroots are stored
+    """
+    return Path(os.environ.get("DEBUTIZER_PBUILDER_CACHE_DIR", "/var/cache/pbuilder"))
@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+from ...errors import UnexpectedError
+from ...subprocess_utils import run
+from .abstract import ChrootBackend, bind_mount_flags
+
+
+class CowbuilderChrootBackend(ChrootBackend):
+    """Stores the chroot as an unpacked directory. Each build gets a copy made of hard
+    links, with copy-on-write handled by cowdancer. Requires cowbuilder to be
+    installed.
+    """
+
+    TYPE = "cowbuilder"
+    SUFFIX = ".cow"
+    # The copy is made of hard links, so it must be on the same filesystem
+    SUPPORTS_BUILD_PLACE = False
+
+    def create(self) -> None:
+        run(
+            [
+                "cowbuilder",
+                "--create",
+                "--basepath",
+                self.base_path,
+                "--distribution",
+                self.distribution,
+                *self.create_flags(),
+            ],
+            on_failure="Failed to create cowbuilder chroot environment",
+            root=True,
+        )
+
+    def execute(self, script: Path, bind_mounts: Optional[List[Path]] = None) -> None:
+        run(
+            [
+                "cowbuilder",
+                "--execute",
+                "--basepath",
+                self.current_path(),
+                "--save-after-exec",
+                *bind_mount_flags(bind_mounts),
+                "--",
+                script,
+            ],
+            on_failure="Failed to run a script in the chroot",
+            root=True,
+        )
+
+    @contextmanager
+    def build_command(
+        self, build_place: Optional[Path] = None
+    ) -> Iterator[List[Union[str, Path]]]:
+        if build_place is not None:
+            raise UnexpectedError("Builds with cowbuilder can't use a build place")
+        yield ["cowbuilder", "--build", "--basepath", self.current_path()]
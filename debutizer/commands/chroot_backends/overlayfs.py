@@ -0,0 +1,99 @@
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+from ...subprocess_utils import run
+from .abstract import ChrootBackend, bind_mount_flags
+
+
+class OverlayfsChrootBackend(ChrootBackend):
+    """Stores the chroot as an unpacked directory. Each build gets an overlay
+    filesystem with an empty writable layer on top of the read-only base, which takes
+    no time to set up regardless of the size of the chroot. Requires a kernel with
+    overlayfs support.
+    """
+
+    TYPE = "overlayfs"
+    SUFFIX = ".base"
+
+    def create(self) -> None:
+        run(
+            [
+                "pbuilder",
+                "create",
+                "--no-targz",
+                "--buildplace",
+                self.base_path,
+                "--distribution",
+                self.distribution,
+                *self.create_flags(),
+            ],
+            on_failure="Failed to create pbuilder chroot environment",
+            root=True,
+        )
+
+    def execute(self, script: Path, bind_mounts: Optional[List[Path]] = None) -> None:
+        # The base is used in place, so changes are kept without saving them
+        run(
+            [
+                "pbuilder",
+                "execute",
+                "--no-targz",
+                "--buildplace",
+                self.current_path(),
+                *bind_mount_flags(bind_mounts),
+                "--",
+                script,
+            ],
+            on_failure="Failed to run a script in the chroot",
+            root=True,
+        )
+
+    @contextmanager
+    def build_command(
+        self, build_place: Optional[Path] = None
+    ) -> Iterator[List[Union[str, Path]]]:
+        # Only the writable layer is kept in the build place
+        overlays_dir = build_place
+        if overlays_dir is None:
+            overlays_dir = self.base_path.parent / "debutizer-overlays"
+            overlays_dir.mkdir(exist_ok=True)
+        overlay_dir = Path(tempfile.mkdtemp(dir=overlays_dir))
+
+        upper_dir = overlay_dir / "upper"
+        work_dir = overlay_dir / "work"
+        merged_dir = overlay_dir / "merged"
+        for directory in [upper_dir, work_dir, merged_dir]:
+            directory.mkdir()
+
+        try:
+            run(
+                [
+                    "mount",
+                    "--types",
+                    "overlay",
+                    "overlay",
+                    "--options",
+                    f"lowerdir={self.current_path()},upperdir={upper_dir},"
+                    f"workdir={work_dir}",
+                    merged_dir,
+                ],
+                on_failure="Failed to mount the overlay filesystem for the chroot",
+                root=True,
+            )
+            try:
+                yield ["pbuilder", "build", "--no-targz", "--buildplace", merged_dir]
+            finally:
+                run(
+                    ["umount", merged_dir],
+                    on_failure="Failed to unmount the overlay filesystem",
+                    root=True,
+                )
+        finally:
+            # Files in the writable layer are owned by root
+            run(
+                ["rm", "--recursive", "--force", overlay_dir],
+                on_failure="Failed to remove the overlay filesystem",
+                root=True,
+            )
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+from ...subprocess_utils import run
+from .abstract import ChrootBackend, bind_mount_flags
+
+
+class TgzChrootBackend(ChrootBackend):
+    """Stores the chroot as a compressed archive, which is extracted for every build.
+    This is pbuilder's default behavior and requires no extra tools, but extracting the
+    archive can take tens of seconds per build.
+    """
+
+    TYPE = "tgz"
+    SUFFIX = ".tgz"
+
+    def create(self) -> None:
+        run(
+            [
+                "pbuilder",
+                "create",
+                "--basetgz",
+                self.base_path,
+                "--distribution",
+                self.distribution,
+                *self.create_flags(),
+            ],
+            on_failure="Failed to create pbuilder chroot environment",
+            root=True,
+        )
+
+    def execute(self, script: Path, bind_mounts: Optional[List[Path]] = None) -> None:
+        run(
+            [
+                "pbuilder",
+                "execute",
+                "--basetgz",
+                self.base_path,
+                "--save-after-exec",
+                *bind_mount_flags(bind_mounts),
+                "--",
+                script,
+            ],
+            on_failure="Failed to run a script in the chroot",
+            root=True,
+        )
+
+    @contextmanager
+    def build_command(
+        self, build_place: Optional[Path] = None
+    ) -> Iterator[List[Union[str, Path]]]:
+        command: List[Union[str, Path]] = [
+            "pbuilder",
+            "build",
+            "--basetgz",
+            self.base_path,
+        ]
+        if build_place is not None:
+            command += ["--buildplace", build_place]
+        yield command
@@ -0,0 +1,198 @@
+import json
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from xdg.BaseDirectory import save_cache_path
+
+from ..digest import digest_file
+
+
+def chroot_digest(archive_path: Path) -> str:
+    """Gets a digest identifying the base system in a chroot archive or directory. For
+    directories, only the list of installed packages is hashed, since hashing the whole
+    directory would be slow.
+
+    Debutizer modifies chroot archives itself, for instance to install tools needed by
+    builds. These modifications are recorded with record_chroot_setup and do not
+    change the digest. The archive is only hashed again if it was changed by something
+    else, like if it was deleted and created again.
+
+    :param archive_path: The path to the chroot archive or directory
+    :return: The SHA256 hex digest of the archive's base system
+    """
+    with _lock:
+        records = _load_records()
+        record = records.get(str(archive_path))
+        stat = _identity_file(archive_path).stat()
+
+        if (
+            record is not None
+            and record["size"] == stat.st_size
+            and record["mtime"] == stat.st_mtime_ns
+        ):
+            return str(record["digest"])
+
+        record = _new_record(archive_path)
+        records[str(archive_path)] = record
+        _save_records(records)
+
+    return str(record["digest"])
+
+
+def chroot_setup(archive_path: Path) -> Optional[str]:
+    """
+    :param archive_path: The path to the chroot archive
+    :return: A hash of the setup last applied to the chroot's base system with
+        record_chroot_setup, or None if no setup has been applied since the base
+        system was created
+    """
+    chroot_digest(archive_path)
+
+    with _lock:
+        record = _load_records()[str(archive_path)]
+        setup: Optional[str] = record.get("setup")
+        return setup
+
+
+def record_chroot_setup(archive_path: Path, setup: str) -> None:
+    """Records that Debutizer has modified the chroot archive without changing its base
+    system, so that the archive's digest is kept.
+
+    :param archive_path: The path to the chroot archive
+    :param setup: A hash of the setup that was applied
+    """
+    with _lock:
+        records = _load_records()
+        record = records.get(str(archive_path))
+        if record is None:
+            return
+
+        stat = _identity_file(archive_path).stat()
+        record["size"] = stat.st_size
+        record["mtime"] = stat.st_mtime_ns
+        record["setup"] = setup
+        _save_records(records)
+
+
+def chroot_freshness(archive_path: Path) -> Optional["ChrootFreshness"]:
+    """
+    :param archive_path: The path to the chroot archive or directory
+    :return: When the chroot's base system was created or last refreshed, or None if
+        this is not known
+    """
+    chroot_digest(archive_path)
+
+    with _lock:
+        record = _load_records()[str(archive_path)]
+        if "created" not in record:
+            return None
+        return ChrootFreshness(
+            created=float(record["created"]),
+            index_snapshot=str(record["index_snapshot"]),
+        )
+
+
+def record_chroot_created(archive_path: Path, index_snapshot: str) -> None:
+    """Records that the chroot's base system was just created. Like with
+    record_chroot_setup, the archive's digest is kept.
+
+    :param archive_path: The path to the chroot archive or directory
+    :param index_snapshot: A hash of the package indexes in the chroot
+    """
+    with _lock:
+        records = _load_records()
+        record = records.get(str(archive_path))
+        if record is None:
+            return
+
+        stat = _identity_file(archive_path).stat()
+        record["size"] = stat.st_size
+        record["mtime"] = stat.st_mtime_ns
+        record["created"] = time.time()
+        record["index_snapshot"] = index_snapshot
+        _save_records(records)
+
+
+def record_chroot_refreshed(
+    archive_path: Path, setup: Optional[str], index_snapshot: str
+) -> None:
+    """Records that the chroot was replaced by a refreshed copy of itself. The base
+    system has changed, so the archive is hashed again, but the setup of the copy is
+    kept.
+
+    :param archive_path: The path to the chroot archive or directory
+    :param setup: A hash of the setup applied to the chroot that was copied
+    :param index_snapshot: A hash of the package indexes in the refreshed chroot
+    """
+    with _lock:
+        records = _load_records()
+        record = _new_record(archive_path)
+        if setup is not None:
+            record["setup"] = setup
+        record["created"] = time.time()
+        record["index_snapshot"] = index_snapshot
+        records[str(archive_path)] = record
+        _save_records(records)
+
+
+class ChrootFreshness:
+    def __init__(self, created: float, index_snapshot: str):
+        self.created = created
+        """When the base system was created or last refreshed, as a Unix timestamp"""
+        self.index_snapshot = index_snapshot
+        """A hash of the package indexes the base system was installed from"""
+
+    def age(self) -> float:
+        """
+        :return: The time since the base system was created or refreshed, in seconds
+        """
+        return time.time() - self.created
+
+
+def _new_record(archive_path: Path) -> Dict[str, Any]:
+    """Hashes the chroot's base system, starting a new record for it"""
+    identity_file = _identity_file(archive_path)
+    stat = identity_file.stat()
+    return {
+        "digest": digest_file(identity_file),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+    }
+
+
+def _identity_file(archive_path: Path) -> Path:
+    """
+    :return: The file that identifies the chroot's base system
+    """
+    if archive_path.is_dir():
+        return archive_path / "var" / "lib" / "dpkg" / "status"
+    return archive_path
+
+
+def _load_records() -> Dict[str, Dict[str, Any]]:
+    records_file = _records_file()
+    if not records_file.is_file():
+        return {}
+
+    try:
+        records: Dict[str, Dict[str, Any]] = json.loads(records_file.read_text())
+    except ValueError:
+        # A corrupted file only means that archives need to be hashed again
+        return {}
+    return records
+
+
+def _save_records(records: Dict[str, Dict[str, Any]]) -> None:
+    records_file = _records_file()
+    temp_file = records_file.with_suffix(".tmp")
+    temp_file.write_text(json.dumps(records, indent=2))
+    temp_file.replace(records_file)
+
+
+def _records_file() -> Path:
+    return Path(save_cache_path("debutizer")) / "chroots.json"
+
+
+_lock = Lock()
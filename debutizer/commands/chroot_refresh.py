@@ -0,0 +1,177 @@
+from threading import Lock, Thread
+from typing import List, Optional, Tuple
+
+from ..errors import CommandError
+from ..print_utils import print_color, print_notify, print_warning
+from .build_durations import format_duration
+from .chroot_backends import ChrootBackend
+from .chroot_metadata import chroot_freshness, chroot_setup, record_chroot_refreshed
+from .utils import PREFETCH_LISTS_SCRIPT, run_chroot_script
+
+
+def refresh_chroot(chroot: ChrootBackend) -> None:
+    """Brings the chroot's base system up to date with the latest packages. The
+    refreshed chroot is prepared alongside the old one and then swapped in atomically.
+
+    :param chroot: The chroot to refresh
+    """
+    refreshed, index_snapshot = prepare_refresh(chroot)
+    finish_refresh(chroot, refreshed, index_snapshot)
+
+
+def prepare_refresh(chroot: ChrootBackend) -> Tuple[ChrootBackend, str]:
+    """Makes an up-to-date copy of the chroot. Builds can keep using the chroot while
+    this is happening, but it must not be modified.
+
+    :param chroot: The chroot to refresh
+    :return: The refreshed copy, and a hash of the package indexes in it
+    """
+    print_notify(f"Refreshing the chroot at {chroot.base_path}")
+
+    # Builds that used generations replaced by the last refresh are long finished
+    chroot.remove_old_generations()
+
+    refreshed = chroot.make_layer("refresh")
+    if refreshed.exists():
+        # Left behind by an interrupted refresh
+        refreshed.remove()
+
+    refreshed.create_from(chroot)
+    try:
+        index_snapshot = run_chroot_script(refreshed, _REFRESH_SCRIPT)
+    except Exception:
+        refreshed.remove()
+        raise
+
+    return refreshed, index_snapshot
+
+
+def finish_refresh(
+    chroot: ChrootBackend, refreshed: ChrootBackend, index_snapshot: str
+) -> None:
+    """Swaps a refreshed copy in for the chroot. Builds that have already started keep
+    using the old chroot.
+
+    :param chroot: The chroot to replace
+    :param refreshed: The refreshed copy made by prepare_refresh
+    :param index_snapshot: The hash of the package indexes in the copy
+    """
+    # The copy was made from the chroot, so the same setup has been applied to it
+    setup = chroot_setup(chroot.base_path)
+    chroot.replace_with(refreshed)
+    record_chroot_refreshed(chroot.base_path, setup, index_snapshot)
+    print_color(f"Refreshed the chroot at {chroot.base_path}")
+
+
+class BackgroundRefresher:
+    """Refreshes chroots that are older than a maximum age while builds keep using the
+    old ones. Refreshed chroots are swapped in once the builds are finished, so that
+    every package in a run is built in the same chroot.
+    """
+
+    def __init__(self, max_age: float):
+        """
+        :param max_age: Chroots older than this many seconds are refreshed
+        """
+        self._max_age = max_age
+        self._refreshes: List[_Refresh] = []
+
+    def start(self, chroot: ChrootBackend) -> None:
+        """Starts refreshing the chroot if it is too old. The chroot must have already
+        been created and set up.
+
+        :param chroot: The chroot to check
+        """
+        freshness = chroot_freshness(chroot.base_path)
+        if freshness is not None:
+            if freshness.age() <= self._max_age:
+                return
+            print_notify(
+                f"The chroot at {chroot.base_path} was last refreshed "
+                f"{format_duration(freshness.age())} ago, so it will be refreshed in "
+                f"the background"
+            )
+        else:
+            print_notify(
+                f"The chroot at {chroot.base_path} has never been refreshed, so it "
+                f"will be refreshed in the background"
+            )
+
+        refresh = _Refresh(chroot)
+        refresh.start()
+        self._refreshes.append(refresh)
+
+    def finish(self) -> None:
+        """Waits for refreshes to finish, then swaps the refreshed chroots in. This
+        should only be done once the run has succeeded.
+        """
+        while len(self._refreshes) > 0:
+            refresh = self._refreshes.pop(0)
+            if refresh.is_alive():
+                print_notify(
+                    f"Waiting for the chroot at {refresh.chroot.base_path} to be "
+                    f"refreshed"
+                )
+            refresh.join()
+
+            if isinstance(refresh.error, CommandError):
+                # The old chroot can still be used
+                print_warning(
+                    f"Failed to refresh the chroot at {refresh.chroot.base_path}: "
+                    f"{refresh.error.message}"
+                )
+            elif refresh.error is not None:
+                raise refresh.error
+            elif refresh.result is not None:
+                finish_refresh(refresh.chroot, *refresh.result)
+
+    def abandon(self) -> None:
+        """Gives up on refreshes without waiting for them, like when the run fails or
+        is interrupted. Refreshed copies that are already done are removed, and
+        refreshes that are still running remove their copy once they're done. A copy
+        left behind because Debutizer exited first is removed by the next refresh.
+        """
+        for refresh in self._refreshes:
+            refresh.abandon()
+        self._refreshes = []
+
+
+class _Refresh(Thread):
+    def __init__(self, chroot: ChrootBackend):
+        super().__init__(daemon=True)
+        self.chroot = chroot
+        self.result: Optional[Tuple[ChrootBackend, str]] = None
+        self.error: Optional[Exception] = None
+        self._lock = Lock()
+        self._abandoned = False
+
+    def run(self) -> None:
+        try:
+            result = prepare_refresh(self.chroot)
+        except Exception as ex:
+            self.error = ex
+            return
+
+        with self._lock:
+            if not self._abandoned:
+                self.result = result
+                return
+        result[0].remove()
+
+    def abandon(self) -> None:
+        with self._lock:
+            self._abandoned = True
+            result, self.result = self.result, None
+        if result is not None:
+            result[0].remove()
+
+
+_REFRESH_SCRIPT = """#!/bin/bash
+set -o errexit
+set -o pipefail
+"""
+_REFRESH_SCRIPT += PREFETCH_LISTS_SCRIPT
+_REFRESH_SCRIPT += """DEBIAN_FRONTEND=noninteractive apt-get dist-upgrade --yes
+apt-get autoremove --yes
+apt-get clean
+"""
@@ -2,11 +2,12 @@ import argparse
 import sys
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional
 
 from debutizer.print_utils import print_warning
 
 from ..errors import CommandError
+from ..fetch_cache import FetchCache
 from .config_file import Configuration
 from .env_argparse import EnvArgumentParser
 
@@ -36,12 +37,12 @@ class Command(ABC):
         """Behavior for when the command is run"""
 
     def clean_up(self) -> None:
-        """Runs any clean-up hooks"""
-        try:
-            for hook in self.cleanup_hooks:
+        """Runs any clean-up hooks. A hook that fails doesn't stop the others."""
+        for hook in self.cleanup_hooks:
+            try:
                 hook()
-        except Exception as ex:
-            print_warning(f"WARNING: Ignoring exception while cleaning up: {ex}")
+            except Exception as ex:
+                print_warning(f"WARNING: Ignoring exception while cleaning up: {ex}")
 
     def parse_args(self) -> argparse.Namespace:
         return self.parser.parse_args(sys.argv[2:])
@@ -79,6 +80,33 @@ class Command(ABC):
             help="The configuration file to reference",
         )
 
+    def add_incremental_flag(self) -> None:
+        self.parser.add_env_flag(
+            "--incremental",
+            action="store_true",
+            help="If provided, the artifacts directory is updated in place instead of "
+            "being cleared first. Only packages whose inputs have changed are replaced.",
+        )
+
+    def add_no_fetch_cache_flag(self) -> None:
+        self.parser.add_env_flag(
+            "--no-fetch-cache",
+            action="store_true",
+            help="If provided, upstream source is always fetched again instead of being "
+            "reused from previous builds",
+        )
+
+    def make_fetch_cache(self, args: argparse.Namespace) -> Optional[FetchCache]:
+        """Creates the fetch cache requested by the user, if any. Old entries are
+        evicted when the command finishes.
+        """
+        if args.no_fetch_cache:
+            return None
+
+        fetch_cache = FetchCache()
+        self.cleanup_hooks.append(fetch_cache.evict)
+        return fetch_cache
+
     def add_package_dir_flag(self) -> None:
         self.parser.add_env_flag(
             "--package-dir",
@@ -0,0 +1,136 @@
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Iterator, List, Optional, Tuple, Union
+
+from xdg.BaseDirectory import save_cache_path
+
+from ..print_utils import print_color, print_notify
+
+_MEBIBYTE = 1024 * 1024
+
+
+class CompilerCache:
+    """A ccache directory shared between builds and between runs, so that C and C++
+    code that has not changed since a previous build is not compiled again.
+
+    Each distribution/architecture pair has its own cache directory. pbuilder's own
+    ccache support is used to install ccache in the chroot, bind-mount the directory
+    and put ccache in front of the compilers. ccache keeps the directory within its
+    maximum size itself.
+    """
+
+    def __init__(
+        self, cache_dir: Optional[Path] = None, max_size: int = 4096 * _MEBIBYTE
+    ):
+        """
+        :param cache_dir: The directory to keep ccache directories in. Defaults to a
+            directory in the XDG cache.
+        :param max_size: The maximum size of each ccache directory in bytes
+        """
+        if cache_dir is None:
+            cache_dir = Path(save_cache_path("debutizer")) / "ccache"
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @contextmanager
+    def mount(
+        self, distribution: str, architecture: str, hook_dir: Path, package_name: str
+    ) -> Iterator[List[Union[str, Path]]]:
+        """Enables ccache for a build. The build's hit rate is printed when the context
+        is exited.
+
+        :param distribution: The distribution codename of the chroot
+        :param architecture: The CPU architecture of the chroot
+        :param hook_dir: The pbuilder hook directory of the build
+        :param package_name: The name of the package being built
+        :return: Flags to add to the pbuilder build command
+        """
+        ccache_dir = self._cache_dir / f"{distribution}-{architecture}"
+        ccache_dir.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            config_file = Path(work_dir) / "pbuilderrc"
+            config_file.write_text(_config(ccache_dir, self._max_size))
+
+            # The stats directory is bind-mounted separately, since pbuilder gives the
+            # build user ownership of the ccache directory
+            stats_file = Path(work_dir) / "stats"
+            stats_hook = hook_dir / "B10ccache"
+            stats_hook.write_text(_stats_hook(stats_file))
+            stats_hook.chmod(0o755)
+
+            try:
+                yield ["--configfile", config_file, "--bindmounts", work_dir]
+            finally:
+                stats = _read_stats(stats_file)
+
+        if stats is not None:
+            hits, misses = stats
+            with self._lock:
+                self._hits += hits
+                self._misses += misses
+            print_color(f"ccache for {package_name}: {_format_stats(hits, misses)}")
+
+    def print_summary(self) -> None:
+        print_notify(f"ccache: {_format_stats(self._hits, self._misses)}")
+
+
+def _config(ccache_dir: Path, max_size: int) -> str:
+    """Creates a pbuilder configuration file that enables ccache
+
+    :param ccache_dir: The ccache directory
+    :param max_size: The maximum size of the ccache directory in bytes
+    :return: The contents of the configuration file
+    """
+    config = "# Generated by Debutizer to enable ccache\n"
+    config += f"CCACHEDIR={ccache_dir}\n"
+    config += f"export CCACHE_MAXSIZE={max_size // _MEBIBYTE}M\n"
+    # Each build logs its own statistics, since the ones in the cache directory are
+    # shared with concurrent builds
+    config += f"export CCACHE_STATSLOG={_STATS_LOG}\n"
+    return config
+
+
+def _stats_hook(stats_file: Path) -> str:
+    """Creates a pbuilder hook that counts the hits and misses of the build
+
+    :param stats_file: The file to write hits and misses to
+    :return: The contents of the hook script
+    """
+    script = "#!/usr/bin/env bash\n"
+    script += "# Generated by Debutizer to report ccache statistics\n"
+    script += "set -o nounset\n"
+    # Versions of ccache before 4.4 don't write a statistics log
+    script += f"if [[ -f {_STATS_LOG} ]]; then\n"
+    script += f"    hits=$(grep --count '_cache_hit$' {_STATS_LOG} || true)\n"
+    script += (
+        f"    misses=$(grep --count --line-regexp 'cache_miss' {_STATS_LOG} || true)\n"
+    )
+    script += f'    echo "$hits $misses" > {stats_file}\n'
+    script += "fi\n"
+    return script
+
+
+def _read_stats(stats_file: Path) -> Optional[Tuple[int, int]]:
+    """
+    :return: The hits and misses written by the hook, or None if the build failed or
+        ccache didn't log statistics
+    """
+    if not stats_file.is_file():
+        return None
+    hits, misses = (int(count) for count in stats_file.read_text().split())
+    return hits, misses
+
+
+def _format_stats(hits: int, misses: int) -> str:
+    compilations = hits + misses
+    hit_rate = f", {hits / compilations:.0%} hit rate" if compilations > 0 else ""
+    return f"{hits} hit(s), {misses} miss(es){hit_rate}"
+
+
+_STATS_LOG = Path("/tmp/debutizer-ccache-stats.log")
@@ -211,6 +211,87 @@ class UpstreamConfiguration(_ConfigurationSection):
         )
 
 
+class ChrootConfiguration(_ConfigurationSection):
+    BACKENDS = ["tgz", "cowbuilder", "overlayfs"]
+
+    def __init__(
+        self,
+        backend: str = "tgz",
+        apt_cache_size: int = 4096,
+        warm_layers: int = 0,
+        max_age: int = 0,
+        ccache_size: int = 0,
+        io_light: bool = False,
+        tmpfs_size: int = 8192,
+        apt_proxy_size: int = 0,
+        apt_proxy_ttl: int = 30,
+    ):
+        self.backend = backend
+        self.apt_cache_size = apt_cache_size
+        """The maximum size of the APT package cache in MiB, or 0 to disable it"""
+        self.warm_layers = warm_layers
+        """The maximum number of chroot layers with common build dependencies
+        pre-installed
+        """
+        self.max_age = max_age
+        """The age in days after which the chroot is refreshed in the background, or 0
+        to never refresh it automatically
+        """
+        self.ccache_size = ccache_size
+        """The maximum size of the ccache directory in MiB, or 0 to not use ccache"""
+        self.io_light = io_light
+        """If True, builds are done on a tmpfs when there is enough free memory, and
+        dpkg doesn't sync files to the disk
+        """
+        self.tmpfs_size = tmpfs_size
+        """The size of each build's tmpfs in MiB"""
+        self.apt_proxy_size = apt_proxy_size
+        """The maximum size of the caching APT proxy's cache in MiB, or 0 to not use
+        the proxy
+        """
+        self.apt_proxy_ttl = apt_proxy_ttl
+        """The number of minutes the proxy serves package indexes from its cache
+        before checking them for changes
+        """
+
+    @staticmethod
+    def from_dict(config: Dict[str, Any]) -> "ChrootConfiguration":
+        chroot = ChrootConfiguration(
+            backend=_optional(config, "backend", str, "tgz"),
+            apt_cache_size=_optional(config, "apt_cache_size", int, 4096),
+            warm_layers=_optional(config, "warm_layers", int, 0),
+            max_age=_optional(config, "max_age", int, 0),
+            ccache_size=_optional(config, "ccache_size", int, 0),
+            io_light=_optional(config, "io_light", bool, False),
+            tmpfs_size=_optional(config, "tmpfs_size", int, 8192),
+            apt_proxy_size=_optional(config, "apt_proxy_size", int, 0),
+            apt_proxy_ttl=_optional(config, "apt_proxy_ttl", int, 30),
+        )
+        chroot.check_validity()
+        return chroot
+
+    def check_validity(self) -> None:
+        if self.backend not in self.BACKENDS:
+            raise DebutizerYAMLError(
+                f"Unknown chroot backend '{self.backend}'. Must be one of: "
+                f"{', '.join(self.BACKENDS)}"
+            )
+        if self.apt_cache_size < 0:
+            raise DebutizerYAMLError("The APT cache size must not be negative")
+        if self.warm_layers < 0:
+            raise DebutizerYAMLError("The number of warm layers must not be negative")
+        if self.max_age < 0:
+            raise DebutizerYAMLError("The maximum chroot age must not be negative")
+        if self.ccache_size < 0:
+            raise DebutizerYAMLError("The ccache size must not be negative")
+        if self.tmpfs_size <= 0:
+            raise DebutizerYAMLError("The tmpfs size must be positive")
+        if self.apt_proxy_size < 0:
+            raise DebutizerYAMLError("The APT proxy cache size must not be negative")
+        if self.apt_proxy_ttl < 0:
+            raise DebutizerYAMLError("The APT proxy TTL must not be negative")
+
+
 class Configuration:
     def __init__(
         self,
@@ -219,12 +300,14 @@ class Configuration:
         package_sources: List[PackageSourceConfiguration],
         upstream: Optional[UpstreamConfiguration] = None,
         upload_target: Optional[UploadTargetConfiguration] = None,
+        chroot: Optional[ChrootConfiguration] = None,
     ):
         self.distributions = distributions
         self.architectures = architectures
         self.package_sources = package_sources
         self.upstream = upstream
         self.upload_target = upload_target
+        self.chroot = chroot if chroot is not None else ChrootConfiguration()
 
     @staticmethod
     def from_file(config_file: Path) -> "Configuration":
@@ -249,6 +332,10 @@ class Configuration:
                     PackageSourceConfiguration.from_dict(package_source_dict)
                 )
 
+            chroot = ChrootConfiguration.from_dict(
+                _optional(config, "chroot", dict, {})
+            )
+
             upload_target_config = _optional(config, "upload_target", dict, None)
             if upload_target_config is not None and "type" not in upload_target_config:
                 raise DebutizerYAMLError(
@@ -275,6 +362,7 @@ class Configuration:
             package_sources=package_sources,
             upstream=upstream,
             upload_target=upload_target,
+            chroot=chroot,
         )
 
     def check_validity(self) -> None:
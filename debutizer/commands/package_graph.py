@@ -0,0 +1,258 @@
+from collections import deque
+from typing import (
+    Deque,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from ..errors import CommandError, UnexpectedError
+
+T = TypeVar("T", bound=Hashable)
+
+
+class PackageGraph(Generic[T]):
+    """The build dependency graph between source packages.
+
+    An index from binary package names to the source packages that provide them is
+    built as packages are added, so that resolving a package's build dependencies
+    takes time proportional to the number of dependencies, not the number of packages.
+    """
+
+    def __init__(self) -> None:
+        self._names: Dict[T, str] = {}
+        self._build_depends: Dict[T, List[str]] = {}
+        self._providers: Dict[str, List[T]] = {}
+
+        # Edges are kept in lists, in the order packages were added, so that ordering
+        # is deterministic
+        self._dependencies: Optional[Dict[T, List[T]]] = None
+        self._dependents: Optional[Dict[T, List[T]]] = None
+
+    def add(
+        self,
+        node: T,
+        name: str,
+        binaries: Iterable[str],
+        build_depends: Iterable[str],
+    ) -> None:
+        """Adds a source package to the graph.
+
+        :param node: The object representing the source package
+        :param name: The name of the source package, used when reporting problems
+        :param binaries: The names of the binary packages it provides
+        :param build_depends: The names of the packages it needs to be built
+        """
+        if node in self._names:
+            raise UnexpectedError(f"Package {name} was added to the graph twice")
+
+        self._names[node] = name
+        self._build_depends[node] = list(build_depends)
+        for binary in dict.fromkeys(binaries):
+            self._providers.setdefault(binary, []).append(node)
+
+        self._dependencies = None
+        self._dependents = None
+
+    def dependencies(self) -> Dict[T, Set[T]]:
+        """
+        :return: Maps each package to the packages that provide one of its build
+            dependencies
+        """
+        return {node: set(deps) for node, deps in self._link()[0].items()}
+
+    def dependents(self) -> Dict[T, Set[T]]:
+        """
+        :return: Maps each package to the packages that have it as a build dependency
+        """
+        return {node: set(deps) for node, deps in self._link()[1].items()}
+
+    def order(self) -> List[T]:
+        """Orders packages so that each package comes after all of its dependencies.
+        Packages that are ready to be built at the same time keep the order they were
+        added in.
+
+        :return: The packages in build order
+        """
+        dependencies, dependents = self._link()
+
+        remaining = {node: len(deps) for node, deps in dependencies.items()}
+        ready: Deque[T] = deque(n for n, count in remaining.items() if count == 0)
+
+        ordered: List[T] = []
+        while len(ready) > 0:
+            node = ready.popleft()
+            ordered.append(node)
+
+            for dependent in dependents[node]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(ordered) != len(dependencies):
+            cycles = "\n".join(
+                "  " + " -> ".join(self._names[n] for n in cycle + [cycle[0]])
+                for cycle in self.cycles()
+            )
+            raise CommandError(
+                f"Could not solve dependency graph. The following packages have "
+                f"circular build dependencies:\n{cycles}"
+            )
+
+        return ordered
+
+    def closure(self, nodes: Iterable[T], with_dependencies: bool = False) -> Set[T]:
+        """Finds the packages affected by a change to the given packages.
+
+        :param nodes: The packages that have changed
+        :param with_dependencies: If True, the packages that the affected packages
+            depend on are included as well
+        :return: The given packages and every package that depends on them, directly
+            or indirectly
+        """
+        dependencies, dependents = self._link()
+
+        affected = set(nodes)
+        queue: Deque[T] = deque(affected)
+        while len(queue) > 0:
+            node = queue.popleft()
+            for dependent in dependents[node]:
+                if dependent not in affected:
+                    affected.add(dependent)
+                    queue.append(dependent)
+
+        if not with_dependencies:
+            return affected
+
+        closure = set(affected)
+        queue = deque(affected)
+        while len(queue) > 0:
+            node = queue.popleft()
+            for dependency in dependencies[node]:
+                if dependency not in closure:
+                    closure.add(dependency)
+                    queue.append(dependency)
+
+        return closure
+
+    def cycles(self) -> List[List[T]]:
+        """Finds groups of packages that depend on each other, directly or indirectly.
+
+        :return: A cycle from each group, as a list of packages where each package
+            depends on the next one, and the last one depends on the first
+        """
+        cycles = []
+        for component in self._strongly_connected_components():
+            start = component[0]
+            if len(component) > 1 or start in self._link()[0][start]:
+                cycles.append(self._shortest_cycle(start, set(component)))
+        return cycles
+
+    def _link(self) -> Tuple[Dict[T, List[T]], Dict[T, List[T]]]:
+        """Resolves build dependencies to packages in the graph, if this hasn't already
+        been done since the last package was added.
+
+        :return: The dependencies and dependents of each package
+        """
+        if self._dependencies is not None and self._dependents is not None:
+            return self._dependencies, self._dependents
+
+        dependencies: Dict[T, List[T]] = {}
+        dependents: Dict[T, List[T]] = {node: [] for node in self._names}
+
+        for node, build_depends in self._build_depends.items():
+            # A dict is used as an ordered set
+            node_dependencies: Dict[T, None] = {}
+            for dependency_name in build_depends:
+                for provider in self._providers.get(dependency_name, []):
+                    node_dependencies[provider] = None
+            for dependency in node_dependencies:
+                dependents[dependency].append(node)
+            dependencies[node] = list(node_dependencies)
+
+        self._dependencies = dependencies
+        self._dependents = dependents
+        return dependencies, dependents
+
+    def _strongly_connected_components(self) -> List[List[T]]:
+        """Finds strongly connected components using Tarjan's algorithm. The algorithm
+        is implemented iteratively so that long dependency chains can't exceed the
+        recursion limit.
+        """
+        dependencies = self._link()[0]
+
+        indexes: Dict[T, int] = {}
+        low_links: Dict[T, int] = {}
+        stack: List[T] = []
+        on_stack: Set[T] = set()
+        components: List[List[T]] = []
+
+        for root in dependencies:
+            if root in indexes:
+                continue
+
+            # Each frame holds a node and an iterator over the nodes it depends on
+            frames = [(root, iter(dependencies[root]))]
+            indexes[root] = low_links[root] = len(indexes)
+            stack.append(root)
+            on_stack.add(root)
+
+            while len(frames) > 0:
+                node, children = frames[-1]
+
+                child = next(children, None)
+                if child is not None:
+                    if child not in indexes:
+                        indexes[child] = low_links[child] = len(indexes)
+                        stack.append(child)
+                        on_stack.add(child)
+                        frames.append((child, iter(dependencies[child])))
+                    elif child in on_stack:
+                        low_links[node] = min(low_links[node], indexes[child])
+                    continue
+
+                frames.pop()
+                if len(frames) > 0:
+                    parent = frames[-1][0]
+                    low_links[parent] = min(low_links[parent], low_links[node])
+
+                if low_links[node] == indexes[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+        return components
+
+    def _shortest_cycle(self, start: T, component: Set[T]) -> List[T]:
+        """Finds the shortest cycle through the start node, using only the nodes in its
+        strongly connected component.
+        """
+        dependencies = self._link()[0]
+        previous: Dict[T, T] = {}
+        queue: Deque[T] = deque([start])
+
+        while len(queue) > 0:
+            node = queue.popleft()
+            for dependency in dependencies[node]:
+                if dependency == start:
+                    cycle = [node]
+                    while cycle[-1] != start:
+                        cycle.append(previous[cycle[-1]])
+                    cycle.reverse()
+                    return cycle
+                if dependency in component and dependency not in previous:
+                    previous[dependency] = node
+                    queue.append(dependency)
+
+        raise UnexpectedError(f"No cycle found through {self._names[start]}")
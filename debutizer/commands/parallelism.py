@@ -0,0 +1,38 @@
+import os
+from typing import Optional
+
+
+def host_cpu_count() -> int:
+    """
+    :return: The number of CPUs this process is allowed to run on
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def build_parallelism(
+    concurrent_builds: int,
+    parallel: Optional[int] = None,
+    max_parallel: Optional[int] = None,
+    cpu_count: Optional[int] = None,
+) -> int:
+    """Decides how many parallel jobs a package is built with. The host's CPUs are
+    divided evenly between the builds that may run at the same time.
+
+    :param concurrent_builds: The maximum number of builds that run at once
+    :param parallel: If provided, the package's own job count, which is used as-is
+    :param max_parallel: If provided, the most jobs the package may be built with
+    :param cpu_count: The number of CPUs to divide. Defaults to the host's CPU count.
+    :return: The number of parallel jobs
+    """
+    if parallel is not None:
+        return parallel
+
+    if cpu_count is None:
+        cpu_count = host_cpu_count()
+    jobs = max(cpu_count // max(concurrent_builds, 1), 1)
+
+    if max_parallel is not None:
+        jobs = min(jobs, max_parallel)
+    return jobs
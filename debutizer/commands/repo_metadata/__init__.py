@@ -1,9 +1,13 @@
+from .incremental import update_metadata
 from .packages import add_packages_files
+from .pool import add_metadata_files
 from .release import add_release_files
 from .sources import add_sources_files
 
 __all__ = [
+    "add_metadata_files",
     "add_packages_files",
     "add_release_files",
     "add_sources_files",
+    "update_metadata",
 ]
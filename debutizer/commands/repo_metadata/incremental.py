@@ -0,0 +1,27 @@
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+from .pool import IndexTask, generate_metadata
+
+
+def update_metadata(artifacts_dir: Path, changed_files: List[Path]) -> List[Path]:
+    """Updates the metadata files that list the given artifacts, which may have been
+    added, replaced, or removed. Only the indexes of the directories the artifacts are
+    in are updated, along with the Release files of their distributions. The new
+    Release files are not signed.
+
+    :param artifacts_dir: The root of the APT package file tree
+    :param changed_files: The artifacts that have changed
+    :return: The newly created metadata files
+    """
+    dirs: Dict[Path, List[Path]] = defaultdict(list)
+    for changed_file in changed_files:
+        dirs[changed_file.parent.relative_to(artifacts_dir)].append(changed_file)
+
+    tasks = [IndexTask(dir_, files) for dir_, files in sorted(dirs.items())]
+    # A build only changes a few directories, which isn't worth starting a pool of
+    # processes for
+    return generate_metadata(
+        artifacts_dir, tasks, distributions={t.distribution for t in tasks}, jobs=1
+    )
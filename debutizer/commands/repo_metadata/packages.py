@@ -1,43 +1,224 @@
+import io
+import os
 import subprocess
+import tarfile
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional, Tuple, cast
 
-from debutizer.print_utils import print_notify
+from debian.deb822 import Deb822
+from debian.debian_support import Version
+
+from debutizer.digest import multi_digest_file
+from debutizer.errors import CommandError
 from debutizer.subprocess_utils import run
 
-from .utils import save_metadata_files
+from .utils import (
+    StanzaCache,
+    insert_sorted,
+    save_metadata_files,
+    split_stanzas,
+    stanza_field,
+)
 
 
-def add_packages_files(artifacts_dir: Path) -> List[Path]:
+def add_packages_files(
+    artifacts_dir: Path,
+    dirs: Optional[Iterable[Path]] = None,
+    stanza_cache: bool = True,
+) -> List[Path]:
     """Adds Packages files to the given APT package file tree. Packages files provide
     listings for binary packages. One Packages file is made per binary package
     directory, and they are placed in
     "dists/{distro}/{component/binary-{arch}/Packages".
 
     :param artifacts_dir: The root of the APT package file tree
+    :param dirs: If provided, only the Packages files for these binary package
+        directories are updated
+    :param stanza_cache: If False, stanzas aren't cached between runs. See
+        StanzaCache.
     :return: The newly created Packages files
     """
 
     packages_files = []
 
-    # Find all binary package directories for all distributions, components, and
-    # architectures. These are paths like: dists/bionic/main/binary-amd64
-    dirs = artifacts_dir.glob("dists/*/*/binary-*")
+    if dirs is None:
+        # Find all binary package directories for all distributions, components, and
+        # architectures. These are paths like: dists/bionic/main/binary-amd64
+        dirs = artifacts_dir.glob("dists/*/*/binary-*")
     dirs = (d.relative_to(artifacts_dir) for d in dirs)
 
     for dir_ in dirs:
+        packages_file = artifacts_dir / dir_ / "Packages"
+        contents = packages_index(artifacts_dir, dir_, stanza_cache)
+        packages_files += save_metadata_files(packages_file, contents)
+
+    return packages_files
+
+
+def packages_index(artifacts_dir: Path, dir_: Path, stanza_cache: bool = True) -> str:
+    """Makes a Packages index listing every binary package in a directory, like
+    "dpkg-scanpackages --multiversion" does. Stanzas are cached, so only packages that
+    are new or have changed since the last time are read.
+
+    :param artifacts_dir: The root of the APT package file tree
+    :param dir_: The binary package directory, relative to the root
+    :param stanza_cache: If False, stanzas aren't cached between runs
+    :return: The contents of the Packages file
+    """
+    cache = StanzaCache(artifacts_dir / dir_, "Packages", persistent=stanza_cache)
+
+    entries = []
+    for package_file in sorted((artifacts_dir / dir_).rglob("*.deb")):
+        relative = package_file.relative_to(artifacts_dir / dir_)
+        stat = package_file.stat()
+
+        entry = cache.get(relative, stat)
+        if entry is None:
+            entry = _packages_entry(package_file, dir_ / relative)
+            cache.put(relative, stat, entry)
+        entries.append(entry)
+
+    cache.save()
+
+    entries.sort(key=lambda e: (e["package"], Version(e["version"]), e["architecture"]))
+    return "".join(e["stanza"] + "\n" for e in entries)
+
+
+def merge_packages_file(
+    artifacts_dir: Path, dir_: Path, changed_files: Iterable[Path]
+) -> List[Path]:
+    """Updates a directory's Packages file for binary packages that have been added,
+    replaced, or removed, by merging their stanzas into the existing file. Other
+    packages in the directory aren't looked at. If there's no Packages file yet, one
+    is made from scratch.
+
+    :param artifacts_dir: The root of the APT package file tree
+    :param dir_: The binary package directory, relative to the root
+    :param changed_files: The binary packages that have changed, under the directory
+    :return: The newly created Packages files
+    """
+    packages_file = artifacts_dir / dir_ / "Packages"
+    if not packages_file.is_file():
+        return save_metadata_files(packages_file, packages_index(artifacts_dir, dir_))
+
+    changed = [
+        f.relative_to(artifacts_dir / dir_) for f in changed_files if f.suffix == ".deb"
+    ]
+    changed_filenames = {str(dir_ / f) for f in changed}
+    stanzas = [
+        s
+        for s in split_stanzas(packages_file.read_text())
+        if stanza_field(s, "Filename") not in changed_filenames
+    ]
+
+    cache = StanzaCache(artifacts_dir / dir_, "Packages")
+    for relative in changed:
+        package_file = artifacts_dir / dir_ / relative
+        if not package_file.is_file():
+            cache.forget(relative)
+            continue
+
+        stat = package_file.stat()
+        entry = cache.get(relative, stat)
+        if entry is None:
+            entry = _packages_entry(package_file, dir_ / relative)
+            cache.put(relative, stat, entry)
+        insert_sorted(stanzas, entry["stanza"], _sort_key)
+
+    cache.save(prune=False)
+
+    return save_metadata_files(packages_file, "".join(s + "\n" for s in stanzas))
+
+
+def _sort_key(stanza: str) -> Tuple[str, Version, str]:
+    return (
+        stanza_field(stanza, "Package") or "",
+        Version(stanza_field(stanza, "Version") or "0"),
+        stanza_field(stanza, "Architecture") or "",
+    )
+
+
+def _packages_entry(package_file: Path, filename: Path) -> Dict[str, Any]:
+    """Makes the stanza for a binary package
+
+    :param package_file: The binary package
+    :param filename: The path of the package relative to the root of the file tree
+    :return: The stanza, along with the fields it's sorted by
+    """
+    control = Deb822(_read_control(package_file))
+    for field in ["Package", "Version", "Architecture"]:
+        if field not in control:
+            raise CommandError(f"{package_file} is missing the {field} field")
+
+    digests = multi_digest_file(package_file, ["md5", "sha1", "sha256"])
+
+    stanza = Deb822()
+    for key, value in control.items():
+        if key != "Description":
+            stanza[key] = value
+    stanza["Filename"] = str(filename)
+    stanza["Size"] = str(package_file.stat().st_size)
+    stanza["MD5sum"] = digests["md5"]
+    stanza["SHA1"] = digests["sha1"]
+    stanza["SHA256"] = digests["sha256"]
+    # The description is conventionally the last field
+    if "Description" in control:
+        stanza["Description"] = control["Description"]
+
+    return {
+        "stanza": stanza.dump(),
+        "package": control["Package"],
+        "version": control["Version"],
+        "architecture": control["Architecture"],
+    }
+
+
+def _read_control(package_file: Path) -> str:
+    """Reads the control file of a binary package, which is in the control archive
+    near the start of the package's ar archive
+
+    :param package_file: The binary package
+    :return: The contents of the control file
+    """
+    with package_file.open("rb") as f:
+        if f.read(len(_AR_MAGIC)) != _AR_MAGIC:
+            raise CommandError(f"{package_file} is not a Debian binary package")
+
+        while True:
+            header = f.read(_AR_HEADER_SIZE)
+            if len(header) < _AR_HEADER_SIZE:
+                raise CommandError(f"{package_file} has no control archive")
+            name = header[0:16].decode().strip().rstrip("/")
+            size = int(header[48:58].decode())
+
+            if name.startswith(_CONTROL_ARCHIVE):
+                control_archive = f.read(size)
+                break
+            # Members are aligned to two bytes
+            f.seek(size + size % 2, os.SEEK_CUR)
+
+    compression = name[len(_CONTROL_ARCHIVE) :]
+    if compression not in ["", ".gz", ".xz", ".bz2"]:
+        # Other compression formats like zstd aren't supported by the standard
+        # library, so dpkg-deb decompresses the archive instead
         result = run(
-            [
-                "dpkg-scanpackages",
-                "--multiversion",
-                dir_,
-            ],
-            on_failure="Failed to update the Packages file",
-            cwd=artifacts_dir,
+            ["dpkg-deb", "--ctrl-tarfile", package_file],
+            on_failure=f"Failed to read the control archive of {package_file}",
             stdout=subprocess.PIPE,
-            encoding="utf-8",
         )
-        packages_file = artifacts_dir / dir_ / "Packages"
-        packages_files += save_metadata_files(packages_file, result.stdout)
+        # Output is captured as bytes, since no encoding is given
+        control_archive = cast(bytes, result.stdout)
 
-    return packages_files
+    with tarfile.open(fileobj=io.BytesIO(control_archive), mode="r:*") as tar:
+        for member in tar:
+            if member.name.lstrip("./") == "control" and member.isfile():
+                control_file = tar.extractfile(member)
+                if control_file is not None:
+                    return control_file.read().decode()
+
+    raise CommandError(f"{package_file} has no control file")
+
+
+_AR_MAGIC = b"!<arch>\n"
+_AR_HEADER_SIZE = 60
+_CONTROL_ARCHIVE = "control.tar"
@@ -0,0 +1,269 @@
+import multiprocessing
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+from queue import Queue
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from debutizer.commands.parallelism import host_cpu_count
+from debutizer.commands.utils import import_gpg_key
+
+from .packages import add_packages_files, merge_packages_file
+from .release import add_release_files
+from .sources import add_sources_files, merge_sources_file
+from .utils import export_digests, import_digests
+
+
+class IndexTask:
+    """The work of updating the index files of one binary or source package directory"""
+
+    def __init__(self, dir_: Path, changed_files: Optional[List[Path]] = None):
+        """
+        :param dir_: The package directory, relative to the root of the file tree
+        :param changed_files: If provided, only the stanzas of these files are
+            updated. Otherwise, the index is made from scratch.
+        """
+        self.dir_ = dir_
+        self.changed_files = changed_files
+
+    @property
+    def distribution(self) -> str:
+        # Paths are like dists/{distro}/{component}/binary-{arch}
+        return self.dir_.parts[1]
+
+
+def add_metadata_files(
+    artifacts_dir: Path,
+    sign: bool,
+    gpg_key_id: Optional[str],
+    gpg_signing_key: Optional[str],
+    gpg_signing_password: Optional[str],
+    stanza_cache: bool = True,
+) -> List[Path]:
+    """Adds Packages, Sources, and Release files to the given APT package file tree,
+    made from scratch. See add_packages_files, add_sources_files, and
+    add_release_files.
+
+    :param artifacts_dir: The root of the APT package file tree
+    :param sign: If true, Release files will be signed as InRelease files
+    :param gpg_key_id: If provided, the GPG key with this ID will be used to sign
+    :param gpg_signing_key: If provided the GPG key in this string will be imported and
+        used
+    :param gpg_signing_password: The password for the GPG signing key, if one is
+        necessary
+    :param stanza_cache: If False, index stanzas aren't cached between runs, like
+        for file trees that aren't on a local filesystem
+    :return: The newly created metadata files
+    """
+    dirs = sorted(artifacts_dir.glob("dists/*/*/binary-*"))
+    dirs += sorted(artifacts_dir.glob("dists/*/*/source"))
+    tasks = [IndexTask(d.relative_to(artifacts_dir)) for d in dirs]
+    distributions = {d.name for d in artifacts_dir.glob("dists/*")}
+
+    return generate_metadata(
+        artifacts_dir,
+        tasks,
+        distributions,
+        sign=sign,
+        gpg_key_id=gpg_key_id,
+        gpg_signing_key=gpg_signing_key,
+        gpg_signing_password=gpg_signing_password,
+        stanza_cache=stanza_cache,
+    )
+
+
+def generate_metadata(
+    artifacts_dir: Path,
+    tasks: List[IndexTask],
+    distributions: Set[str],
+    sign: bool = False,
+    gpg_key_id: Optional[str] = None,
+    gpg_signing_key: Optional[str] = None,
+    gpg_signing_password: Optional[str] = None,
+    jobs: Optional[int] = None,
+    stanza_cache: bool = True,
+) -> List[Path]:
+    """Updates index files and Release files on a pool of processes. Each index
+    directory is updated by its own task, and a distribution's Release file is made as
+    soon as all of its index files are done, while other distributions may still be
+    in progress.
+
+    Worker processes are started by a fork server instead of being forked from this
+    process, since this process may have other threads that hold locks.
+
+    :param artifacts_dir: The root of the APT package file tree
+    :param tasks: The index directories to update
+    :param distributions: The distributions to make Release files for
+    :param sign: If true, Release files will be signed as InRelease files
+    :param gpg_key_id: If provided, the GPG key with this ID will be used to sign
+    :param gpg_signing_key: If provided the GPG key in this string will be imported and
+        used
+    :param gpg_signing_password: The password for the GPG signing key, if one is
+        necessary
+    :param jobs: The number of processes to use. Defaults to the host's CPU count. If
+        1, everything is done in this process instead.
+    :param stanza_cache: If False, index stanzas aren't cached between runs
+    :return: The newly created index files, followed by the newly created Release
+        files
+    """
+    if jobs is None:
+        jobs = host_cpu_count()
+    jobs = max(min(jobs, len(tasks) + len(distributions)), 1)
+
+    if sign and gpg_signing_key is not None:
+        # Imported once here instead of by every Release task
+        import_gpg_key(gpg_signing_key)
+
+    index_files: List[Path] = []
+    release_files: Dict[str, List[Path]] = {}
+
+    if jobs == 1:
+        for task in tasks:
+            new_files, _ = _index_task(
+                artifacts_dir, task.dir_, task.changed_files, stanza_cache
+            )
+            index_files += new_files
+        # The digests of the new index files are already remembered in this process
+        for distribution in sorted(distributions):
+            release_files[distribution] = _release_task(
+                artifacts_dir, distribution, {}, sign, gpg_key_id, gpg_signing_password
+            )
+        return _metadata_files(index_files, release_files)
+
+    remaining: Dict[str, int] = defaultdict(int)
+    for task in tasks:
+        remaining[task.distribution] += 1
+    digests: Dict[str, Dict[str, Any]] = defaultdict(dict)
+
+    # Results are put in a queue by the pool's callbacks, which run on another thread
+    completed: "Queue[Tuple[str, str, Any]]" = Queue()
+    in_flight = 0
+
+    context = multiprocessing.get_context(_START_METHOD)
+    with context.Pool(processes=jobs) as pool:
+
+        def submit_release(distribution: str) -> None:
+            nonlocal in_flight
+            pool.apply_async(
+                _release_task,
+                (
+                    artifacts_dir,
+                    distribution,
+                    digests.pop(distribution, {}),
+                    sign,
+                    gpg_key_id,
+                    gpg_signing_password,
+                ),
+                callback=partial(_put, completed, "Release", distribution),
+                error_callback=partial(_put, completed, "error", distribution),
+            )
+            in_flight += 1
+
+        for task in tasks:
+            pool.apply_async(
+                _index_task,
+                (artifacts_dir, task.dir_, task.changed_files, stanza_cache),
+                callback=partial(_put, completed, "index", task.distribution),
+                error_callback=partial(_put, completed, "error", task.distribution),
+            )
+            in_flight += 1
+        for distribution in sorted(distributions):
+            if remaining[distribution] == 0:
+                submit_release(distribution)
+
+        while in_flight > 0:
+            kind, distribution, result = completed.get()
+            in_flight -= 1
+
+            if kind == "error":
+                # Exiting the context terminates the tasks that are still running
+                raise result
+            elif kind == "Release":
+                release_files[distribution] = result
+            else:
+                new_files, new_digests = result
+                index_files += new_files
+                digests[distribution].update(new_digests)
+                remaining[distribution] -= 1
+                if remaining[distribution] == 0 and distribution in distributions:
+                    submit_release(distribution)
+
+    return _metadata_files(index_files, release_files)
+
+
+def _metadata_files(
+    index_files: List[Path], release_files: Dict[str, List[Path]]
+) -> List[Path]:
+    # Sorted so that the result doesn't depend on which tasks finished first
+    metadata_files = sorted(index_files)
+    for distribution in sorted(release_files):
+        metadata_files += release_files[distribution]
+    return metadata_files
+
+
+def _put(
+    completed: "Queue[Tuple[str, str, Any]]", kind: str, distribution: str, result: Any
+) -> None:
+    """Reports a finished task, from the thread the pool runs callbacks on"""
+    completed.put((kind, distribution, result))
+
+
+def _index_task(
+    artifacts_dir: Path,
+    dir_: Path,
+    changed_files: Optional[List[Path]],
+    stanza_cache: bool,
+) -> "_IndexResult":
+    """Updates the index files of a package directory in a worker process
+
+    :return: The newly created index files, and their digests for the Release task
+    """
+    new_files: List[Path]
+    if dir_.name == "source":
+        if changed_files is None:
+            new_files = add_sources_files(
+                artifacts_dir, [artifacts_dir / dir_], stanza_cache
+            )
+        else:
+            new_files = merge_sources_file(artifacts_dir, dir_, changed_files)
+    else:
+        if changed_files is None:
+            new_files = add_packages_files(
+                artifacts_dir, [artifacts_dir / dir_], stanza_cache
+            )
+        else:
+            new_files = merge_packages_file(artifacts_dir, dir_, changed_files)
+
+    return new_files, export_digests(new_files)
+
+
+def _release_task(
+    artifacts_dir: Path,
+    distribution: str,
+    digests: Dict[str, Any],
+    sign: bool,
+    gpg_key_id: Optional[str],
+    gpg_signing_password: Optional[str],
+) -> List[Path]:
+    """Makes the Release file of a distribution in a worker process
+
+    :param digests: The digests of index files that were just made by other workers
+    :return: The newly created Release (and potentially InRelease) files
+    """
+    import_digests(digests)
+    return add_release_files(
+        artifacts_dir,
+        sign=sign,
+        gpg_key_id=gpg_key_id,
+        gpg_signing_key=None,
+        gpg_signing_password=gpg_signing_password,
+        distributions=[distribution],
+    )
+
+
+_IndexResult = Tuple[List[Path], Dict[str, Any]]
+"""The index files made by an index task, and their digests"""
+_START_METHOD = "forkserver"
+"""How worker processes are started. Forking this process directly isn't safe, since
+it may have other threads.
+"""
@@ -1,11 +1,16 @@
-import subprocess
+import re
+from email.utils import formatdate
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterable, List, Optional, Union
+
+from debian.deb822 import Deb822
 
 from debutizer.commands.utils import configure_gpg, import_gpg_key
 from debutizer.print_utils import print_notify
 from debutizer.subprocess_utils import run
 
+from .utils import file_digests
+
 
 def add_release_files(
     artifacts_dir: Path,
@@ -13,8 +18,9 @@ def add_release_files(
     gpg_key_id: Optional[str],
     gpg_signing_key: Optional[str],
     gpg_signing_password: Optional[str],
+    distributions: Optional[Iterable[str]] = None,
 ) -> List[Path]:
-    """Adds Release files to the given APT package file tree. Release files provide MD5
+    """Adds Release files to the given APT package file tree. Release files provide
     hashes for Packages and Sources files, verifying their integrity. They also contain
     metadata related to the repository.
 
@@ -32,6 +38,8 @@ def add_release_files(
         used
     :param gpg_signing_password: The password for the GPG signing key, if one is
         necessary
+    :param distributions: If provided, only the Release files for these distributions
+        are updated
     :return: The newly created Release (and potentially InRelease) files
     """
     release_files = []
@@ -39,29 +47,15 @@ def add_release_files(
     if sign and gpg_signing_key is not None:
         import_gpg_key(gpg_signing_key)
 
-    dirs = artifacts_dir.glob("dists/*")
+    if distributions is None:
+        dirs = artifacts_dir.glob("dists/*")
+    else:
+        dirs = (artifacts_dir / "dists" / d for d in distributions)
     dirs = (d.relative_to(artifacts_dir) for d in dirs)
 
     for dir_ in dirs:
-        metadata = _repo_metadata(artifacts_dir / dir_)
-        metadata_flags = []
-        for key, value in metadata.items():
-            metadata_flags += ["-o", f"APT::FTPArchive::Release::{key}={value}"]
-
-        result = run(
-            [
-                "apt-ftparchive",
-                "release",
-                *metadata_flags,
-                dir_,
-            ],
-            on_failure="Failed to update the Release file",
-            cwd=artifacts_dir,
-            stdout=subprocess.PIPE,
-            encoding="utf-8",
-        )
         release_file = artifacts_dir / dir_ / "Release"
-        release_content = result.stdout.encode()
+        release_content = release_contents(artifacts_dir / dir_).encode()
         release_file.write_bytes(release_content)
         release_files.append(release_file)
 
@@ -77,6 +71,42 @@ def add_release_files(
     return release_files
 
 
+def release_contents(path: Path) -> str:
+    """Makes a Release file for a distribution, like "apt-ftparchive release" does.
+    Every index file is hashed with all algorithms in a single read, and index files
+    that were just generated aren't read at all.
+
+    :param path: The distribution directory, like dists/{distro}
+    :return: The contents of the Release file
+    """
+    stanza = Deb822()
+    for key, value in _repo_metadata(path).items():
+        stanza[key] = value
+
+    # The distribution's own Release file is replaced, so it isn't listed
+    index_files = sorted(
+        f
+        for f in path.rglob("*")
+        if f.is_file() and f != path / "Release" and _INDEX_FILE.match(f.name)
+    )
+    entries = []
+    for index_file in index_files:
+        size = index_file.stat().st_size
+        digests = file_digests(index_file)
+        entries.append((index_file.relative_to(path), size, digests))
+
+    for field, algorithm in _DIGEST_FIELDS.items():
+        if len(entries) == 0:
+            break
+        lines = [
+            f" {digests[algorithm]} {size:>16} {relative}"
+            for relative, size, digests in entries
+        ]
+        stanza[field] = "\n" + "\n".join(lines)
+
+    return str(stanza.dump())
+
+
 def _sign_file(
     input_: Path,
     output: Path,
@@ -112,11 +142,25 @@ def _repo_metadata(path: Path) -> Dict[str, str]:
         component_architectures = [p.name.replace("binary-", "") for p in binary_paths]
         architectures += component_architectures
 
+    # TODO: Make this configurable
+    metadata["Label"] = "Made with Debutizer"
     metadata["Suite"] = distribution
     metadata["Codename"] = distribution
-    metadata["Components"] = " ".join(components)
+    metadata["Date"] = formatdate(usegmt=True)
     metadata["Architectures"] = " ".join(architectures)
-    # TODO: Make this configurable
-    metadata["Label"] = "Made with Debutizer"
+    metadata["Components"] = " ".join(components)
 
     return metadata
+
+
+_INDEX_FILE = re.compile(
+    r"^(Packages|Sources|Release|Contents-.+|Translation-.+)(\.(gz|xz|bz2|lzma))?$"
+)
+"""The names of the index files that are listed in a Release file"""
+_DIGEST_FIELDS = {
+    "MD5Sum": "md5",
+    "SHA1": "sha1",
+    "SHA256": "sha256",
+    "SHA512": "sha512",
+}
+"""The Release file fields that list index files, and the algorithm each uses"""
@@ -1,41 +1,200 @@
-import subprocess
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from debutizer.print_utils import print_notify
-from debutizer.subprocess_utils import run
+from debian.deb822 import Deb822
+from debian.debian_support import Version
 
-from .utils import save_metadata_files
+from debutizer.digest import multi_digest_file
+from debutizer.errors import CommandError
 
+from .utils import (
+    StanzaCache,
+    insert_sorted,
+    save_metadata_files,
+    split_stanzas,
+    stanza_field,
+)
 
-def add_sources_files(artifacts_dir: Path) -> List[Path]:
+
+def add_sources_files(
+    artifacts_dir: Path,
+    dirs: Optional[Iterable[Path]] = None,
+    stanza_cache: bool = True,
+) -> List[Path]:
     """Adds Sources files to the given APT package file tree. Sources files provide
     listings for source packages. One Sources file is made per source directory, and
     they are placed in "dists/{distro}/{component}/Sources".
 
     :param artifacts_dir: The root of the APT package file tree
+    :param dirs: If provided, only the Sources files for these source directories are
+        updated
+    :param stanza_cache: If False, stanzas aren't cached between runs. See
+        StanzaCache.
     :return: The newly created Sources files
     """
 
     sources_files = []
 
-    # Find all source package directories for all distributions and components. These
-    # are paths like: dists/bionic/main/source
-    dirs = artifacts_dir.glob("dists/*/*/source")
+    if dirs is None:
+        # Find all source package directories for all distributions and components.
+        # These are paths like: dists/bionic/main/source
+        dirs = artifacts_dir.glob("dists/*/*/source")
     dirs = (d.relative_to(artifacts_dir) for d in dirs)
 
     for dir_ in dirs:
-        result = run(
-            [
-                "dpkg-scansources",
-                dir_,
-            ],
-            on_failure="Failed to update the Sources file",
-            cwd=artifacts_dir,
-            stdout=subprocess.PIPE,
-            encoding="utf-8",
-        )
         sources_file = artifacts_dir / dir_ / "Sources"
-        sources_files += save_metadata_files(sources_file, result.stdout)
+        contents = sources_index(artifacts_dir, dir_, stanza_cache)
+        sources_files += save_metadata_files(sources_file, contents)
 
     return sources_files
+
+
+def sources_index(artifacts_dir: Path, dir_: Path, stanza_cache: bool = True) -> str:
+    """Makes a Sources index listing every source package in a directory, like
+    dpkg-scansources does. Only the .dsc files are read, since they already have the
+    checksums of the files they reference. Stanzas are cached, so only .dsc files that
+    are new or have changed since the last time are read.
+
+    :param artifacts_dir: The root of the APT package file tree
+    :param dir_: The source package directory, relative to the root
+    :param stanza_cache: If False, stanzas aren't cached between runs
+    :return: The contents of the Sources file
+    """
+    cache = StanzaCache(artifacts_dir / dir_, "Sources", persistent=stanza_cache)
+
+    entries = []
+    for dsc_file in sorted((artifacts_dir / dir_).rglob("*.dsc")):
+        relative = dsc_file.relative_to(artifacts_dir / dir_)
+        stat = dsc_file.stat()
+
+        entry = cache.get(relative, stat)
+        if entry is None:
+            entry = _sources_entry(dsc_file, dir_ / relative.parent)
+            cache.put(relative, stat, entry)
+        entries.append(entry)
+
+    cache.save()
+
+    entries.sort(key=lambda e: (e["package"], Version(e["version"])))
+    return "".join(e["stanza"] + "\n" for e in entries)
+
+
+def merge_sources_file(
+    artifacts_dir: Path, dir_: Path, changed_files: Iterable[Path]
+) -> List[Path]:
+    """Updates a directory's Sources file for source packages that have been added,
+    replaced, or removed, by merging their stanzas into the existing file. Other
+    packages in the directory aren't looked at. If there's no Sources file yet, one is
+    made from scratch.
+
+    :param artifacts_dir: The root of the APT package file tree
+    :param dir_: The source package directory, relative to the root
+    :param changed_files: The source package files that have changed, under the
+        directory
+    :return: The newly created Sources files
+    """
+    sources_file = artifacts_dir / dir_ / "Sources"
+    if not sources_file.is_file():
+        return save_metadata_files(sources_file, sources_index(artifacts_dir, dir_))
+
+    # A source package's other files can only change along with its .dsc file, which
+    # lists their checksums
+    changed = [
+        f.relative_to(artifacts_dir / dir_) for f in changed_files if f.suffix == ".dsc"
+    ]
+    changed_dsc_files = {str(dir_ / f) for f in changed}
+    stanzas = [
+        s
+        for s in split_stanzas(sources_file.read_text())
+        if _dsc_path(s) not in changed_dsc_files
+    ]
+
+    cache = StanzaCache(artifacts_dir / dir_, "Sources")
+    for relative in changed:
+        dsc_file = artifacts_dir / dir_ / relative
+        if not dsc_file.is_file():
+            cache.forget(relative)
+            continue
+
+        stat = dsc_file.stat()
+        entry = cache.get(relative, stat)
+        if entry is None:
+            entry = _sources_entry(dsc_file, dir_ / relative.parent)
+            cache.put(relative, stat, entry)
+        insert_sorted(stanzas, entry["stanza"], _sort_key)
+
+    cache.save(prune=False)
+
+    return save_metadata_files(sources_file, "".join(s + "\n" for s in stanzas))
+
+
+def _sources_entry(dsc_file: Path, directory: Path) -> Dict[str, Any]:
+    """Makes the stanza for a source package
+
+    :param dsc_file: The source package's .dsc file
+    :param directory: The directory of the .dsc file relative to the root of the
+        file tree
+    :return: The stanza, along with the fields it's sorted by
+    """
+    with dsc_file.open("r") as f:
+        dsc = Deb822(f)
+    for field in ["Source", "Version", "Files"]:
+        if field not in dsc:
+            raise CommandError(f"{dsc_file} is missing the {field} field")
+
+    checksum_fields = [f for f in _CHECKSUM_FIELDS if f in dsc]
+    # The .dsc file is small, so it's the only file that's hashed
+    digests = multi_digest_file(
+        dsc_file, [_CHECKSUM_FIELDS[f] for f in checksum_fields]
+    )
+    size = dsc_file.stat().st_size
+
+    stanza = Deb822()
+    for key, value in dsc.items():
+        if key == "Source":
+            stanza["Package"] = value
+        elif key not in checksum_fields:
+            stanza[key] = value
+    stanza["Directory"] = str(directory)
+    for field in checksum_fields:
+        digest = digests[_CHECKSUM_FIELDS[field]]
+        stanza[field] = f"\n {digest} {size} {dsc_file.name}" + dsc[field]
+
+    return {
+        "stanza": stanza.dump(),
+        "package": dsc["Source"],
+        "version": dsc["Version"],
+    }
+
+
+def _sort_key(stanza: str) -> Tuple[str, Version]:
+    return (
+        stanza_field(stanza, "Package") or "",
+        Version(stanza_field(stanza, "Version") or "0"),
+    )
+
+
+def _dsc_path(stanza: str) -> Optional[str]:
+    """
+    :return: The path of the .dsc file a stanza was made from, relative to the root of
+        the file tree, which is the first file listed in the stanza
+    """
+    directory = stanza_field(stanza, "Directory")
+    lines = stanza.splitlines()
+    if directory is None or "Files:" not in lines:
+        return None
+    files_index = lines.index("Files:")
+    if files_index + 1 >= len(lines):
+        return None
+    return str(Path(directory) / lines[files_index + 1].split()[-1])
+
+
+_CHECKSUM_FIELDS = {
+    "Checksums-Sha1": "sha1",
+    "Checksums-Sha256": "sha256",
+    "Checksums-Sha512": "sha512",
+    "Files": "md5",
+}
+"""The fields listing the checksums of a source package's files, and the algorithm
+each uses
+"""
@@ -1,6 +1,16 @@
 import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
 from pathlib import Path
-from typing import List
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from xdg.BaseDirectory import save_cache_path
+
+from debutizer.digest import multi_digest_file
 
 
 def save_metadata_files(path: Path, contents: str) -> List[Path]:
@@ -15,11 +25,220 @@ def save_metadata_files(path: Path, contents: str) -> List[Path]:
 
     contents_bytes = contents.encode()
     path.write_bytes(contents_bytes)
+    remember_digests(path, contents_bytes)
     new_files.append(path)
 
-    compressed_file = path.with_suffix(".gz")
-    with gzip.open(compressed_file, "wb") as f:
+    # Compressed in memory, so that the digests can be taken without reading the
+    # file back
+    compressed = io.BytesIO()
+    with gzip.GzipFile(fileobj=compressed, mode="wb") as f:
         f.write(contents_bytes)
+    compressed_file = path.with_suffix(".gz")
+    compressed_file.write_bytes(compressed.getvalue())
+    remember_digests(compressed_file, compressed.getvalue())
     new_files.append(compressed_file)
 
     return new_files
+
+
+def remember_digests(path: Path, contents: bytes) -> None:
+    """Saves the digests of a file that was just written, so that file_digests doesn't
+    need to read it again
+
+    :param path: The file
+    :param contents: The contents that were written to the file
+    """
+    digests = {a: hashlib.new(a, contents).hexdigest() for a in DIGEST_ALGORITHMS}
+    identity = _identity(path.stat())
+    with _digests_lock:
+        _digests[str(path)] = (identity, digests)
+
+
+def file_digests(path: Path) -> Dict[str, str]:
+    """Gets the digests of a file with every algorithm in DIGEST_ALGORITHMS. Digests
+    are remembered as long as the file doesn't change, and files that haven't been
+    seen before are hashed with every algorithm in a single read.
+
+    :param path: The file to hash
+    :return: The hex digest of the file for each algorithm
+    """
+    identity = _identity(path.stat())
+    with _digests_lock:
+        cached = _digests.get(str(path))
+    if cached is not None and cached[0] == identity:
+        return cached[1]
+
+    digests = multi_digest_file(path, DIGEST_ALGORITHMS)
+    with _digests_lock:
+        _digests[str(path)] = (identity, digests)
+    return digests
+
+
+def export_digests(paths: List[Path]) -> Dict[str, Any]:
+    """Gets the remembered digests of some files, so that they can be passed to
+    another process
+
+    :param paths: The files to get digests for
+    :return: The digests, in a form that can be given to import_digests
+    """
+    with _digests_lock:
+        return {str(p): _digests[str(p)] for p in paths if str(p) in _digests}
+
+
+def import_digests(digests: Dict[str, Any]) -> None:
+    """Remembers digests that were taken by another process
+
+    :param digests: Digests returned by export_digests
+    """
+    with _digests_lock:
+        _digests.update(digests)
+
+
+class StanzaCache:
+    """Remembers the index stanza made for each file in an index directory, so that
+    only files that are new or have changed are read when the index is made again.
+    Files are identified by their path, size, modification time, and inode.
+    """
+
+    def __init__(self, index_dir: Path, kind: str, persistent: bool = True):
+        """
+        :param index_dir: The directory the index lists files in
+        :param kind: The kind of index, like "Packages"
+        :param persistent: If False, nothing is loaded from or saved to the disk. This
+            is for file trees that aren't on a local filesystem, where the same files
+            don't keep the same identity between runs.
+        """
+        self._cache_file: Optional[Path] = None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._used: Dict[str, Dict[str, Any]] = {}
+        self._changed = False
+
+        if not persistent:
+            return
+
+        index_hash = hashlib.sha256(str(index_dir.resolve()).encode()).hexdigest()
+        self._cache_file = _stanza_cache_dir() / f"{kind}-{index_hash[:32]}.json"
+        try:
+            contents = json.loads(self._cache_file.read_text())
+        except (FileNotFoundError, ValueError):
+            contents = {}
+        if contents.get("version") == _FORMAT_VERSION:
+            self._entries = contents["entries"]
+
+    def get(self, path: Path, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        """
+        :param path: The file to look up
+        :param stat: The file's current status
+        :return: The data saved for the file, or None if the file is new or has
+            changed since it was saved
+        """
+        entry = self._entries.get(str(path))
+        if entry is None or entry["identity"] != _identity(stat):
+            return None
+        self._used[str(path)] = entry
+        data: Dict[str, Any] = entry["data"]
+        return data
+
+    def put(self, path: Path, stat: os.stat_result, data: Dict[str, Any]) -> None:
+        """Saves data for the file, which stays valid until the file changes
+
+        :param path: The file the data is for
+        :param stat: The file's status when the data was made
+        :param data: The data to save, which must be JSON-serializable
+        """
+        self._used[str(path)] = {"identity": _identity(stat), "data": data}
+        self._changed = True
+
+    def forget(self, path: Path) -> None:
+        """Removes the data saved for a file that no longer exists
+
+        :param path: The file to forget
+        """
+        self._entries.pop(str(path), None)
+        self._used.pop(str(path), None)
+        self._changed = True
+
+    def save(self, prune: bool = True) -> None:
+        """Writes the cache to the disk
+
+        :param prune: If True, only entries that were used since the cache was loaded
+            are kept, so files that are gone are forgotten. Otherwise, every entry is
+            kept.
+        """
+        if self._cache_file is None:
+            return
+
+        if prune:
+            entries = self._used
+            if not self._changed and len(entries) == len(self._entries):
+                return
+        else:
+            entries = {**self._entries, **self._used}
+            if not self._changed:
+                return
+
+        self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+        contents = {"version": _FORMAT_VERSION, "entries": entries}
+        fd, temp_name = tempfile.mkstemp(prefix=".", dir=self._cache_file.parent)
+        with os.fdopen(fd, "w") as f:
+            json.dump(contents, f)
+        os.replace(temp_name, self._cache_file)
+
+
+def split_stanzas(contents: str) -> List[str]:
+    """
+    :param contents: The contents of an index file, like a Packages file
+    :return: The stanzas in the index, without the blank lines that separate them
+    """
+    return [s.strip("\n") + "\n" for s in contents.split("\n\n") if s.strip() != ""]
+
+
+def stanza_field(stanza: str, name: str) -> Optional[str]:
+    """Finds the value of a single-line field without parsing the whole stanza
+
+    :param stanza: The stanza to search
+    :param name: The name of the field
+    :return: The value of the field, or None if the stanza doesn't have it
+    """
+    prefix = f"{name}:"
+    for line in stanza.splitlines():
+        if line.startswith(prefix):
+            return line[len(prefix) :].strip()
+    return None
+
+
+def insert_sorted(stanzas: List[str], stanza: str, key: Callable[[str], Any]) -> None:
+    """Inserts a stanza into a list of sorted stanzas, after any stanzas that sort
+    equally. Only a logarithmic number of stanzas are compared, so that the key
+    doesn't have to be computed for every stanza.
+
+    :param stanzas: The sorted stanzas
+    :param stanza: The stanza to insert
+    :param key: Gets the value a stanza is sorted by
+    """
+    stanza_key = key(stanza)
+    low, high = 0, len(stanzas)
+    while low < high:
+        middle = (low + high) // 2
+        if stanza_key < key(stanzas[middle]):
+            high = middle
+        else:
+            low = middle + 1
+    stanzas.insert(low, stanza)
+
+
+def _identity(stat: os.stat_result) -> List[int]:
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def _stanza_cache_dir() -> Path:
+    return Path(save_cache_path("debutizer")) / "stanzas"
+
+
+_FORMAT_VERSION = 1
+
+DIGEST_ALGORITHMS = ["md5", "sha1", "sha256", "sha512"]
+"""The algorithms metadata files are hashed with for Release files"""
+
+_digests: Dict[str, Tuple[List[int], Dict[str, str]]] = {}
+_digests_lock = Lock()
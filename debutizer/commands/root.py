@@ -45,4 +45,5 @@ Commands:
   build     Makes source and binary packages
   check     Checks for system dependencies
   upload    Uploads packages
+  chroot    Manages build chroots
 """
@@ -0,0 +1,242 @@
+import heapq
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from ..errors import CommandError, UnexpectedError
+
+T = TypeVar("T", bound=Hashable)
+R = TypeVar("R")
+
+
+class BuildScheduler(Generic[T]):
+    """Runs build tasks in dependency order. A task is started as soon as all of its
+    dependencies have finished, and up to a configured number of tasks may run at once.
+
+    Build tasks are run in worker threads, while the callback that publishes a task's
+    results is always run on the thread that called run(). This means that publishing
+    never happens concurrently, and a task's dependents are not started until its
+    results have been published.
+    """
+
+    def __init__(
+        self,
+        dependencies: Dict[T, Set[T]],
+        jobs: int = 1,
+        priorities: Optional[Dict[T, float]] = None,
+    ):
+        """
+        :param dependencies: Maps each node to the nodes that must finish before it can
+            be started
+        :param jobs: The maximum number of tasks to run at once
+        :param priorities: When multiple nodes are ready at once, the node with the
+            highest priority is started first. Nodes with the same priority are started
+            in the iteration order of the dependencies mapping.
+        """
+        if jobs < 1:
+            raise CommandError(f"The number of jobs must be at least 1, got {jobs}")
+
+        self._nodes: List[T] = list(dependencies.keys())
+        self._indexes: Dict[T, int] = {node: i for i, node in enumerate(self._nodes)}
+        self._dependencies = dependencies
+        self._jobs = jobs
+        self._priorities = priorities if priorities is not None else {}
+
+        self._reverse_dependencies: Dict[T, List[T]] = {
+            node: [] for node in self._nodes
+        }
+        for node, node_dependencies in dependencies.items():
+            for dependency in node_dependencies:
+                if dependency not in self._reverse_dependencies:
+                    raise UnexpectedError(
+                        f"Node {node} depends on {dependency}, which is not being "
+                        f"scheduled"
+                    )
+                self._reverse_dependencies[dependency].append(node)
+
+    def run(
+        self,
+        build: Callable[[T], R],
+        on_finished: Callable[[T, R], None],
+        keep_going: bool = False,
+    ) -> "ScheduleResult[T]":
+        """Builds every node, blocking until all builds are finished.
+
+        By default, if a build fails, no new builds are started. Builds that are already
+        running are allowed to finish before the error is raised.
+
+        :param build: Builds the given node. Called from a worker thread.
+        :param on_finished: Publishes the result of a finished build. Called from the
+            current thread.
+        :param keep_going: If True, a failed build only prevents the nodes that depend
+            on it from being built. All other nodes are still built, and failures are
+            reported in the result instead of being raised.
+        :return: Which nodes succeeded, failed, or were skipped
+        """
+        remaining = {node: len(deps) for node, deps in self._dependencies.items()}
+        ready = [self._ready_entry(n) for n, count in remaining.items() if count == 0]
+        heapq.heapify(ready)
+
+        in_flight: Dict["Future[R]", T] = {}
+        result: ScheduleResult[T] = ScheduleResult()
+
+        def stopped() -> bool:
+            return not keep_going and len(result.failed) > 0
+
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            while (len(ready) > 0 and not stopped()) or len(in_flight) > 0:
+                while len(ready) > 0 and not stopped() and len(in_flight) < self._jobs:
+                    node = self._nodes[heapq.heappop(ready)[1]]
+                    in_flight[executor.submit(build, node)] = node
+
+                done, _ = wait(in_flight.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = in_flight.pop(future)
+                    try:
+                        on_finished(node, future.result())
+                    except Exception as ex:
+                        result.failed[node] = ex
+                        continue
+
+                    result.succeeded.append(node)
+                    for dependent in self._reverse_dependencies[node]:
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0:
+                            heapq.heappush(ready, self._ready_entry(dependent))
+
+        if not keep_going and len(result.failed) > 0:
+            raise next(iter(result.failed.values()))
+
+        # Nodes that depend on a failed node, directly or indirectly, were never started
+        for failed_node in result.failed:
+            queue = [failed_node]
+            while len(queue) > 0:
+                for dependent in self._reverse_dependencies[queue.pop()]:
+                    if dependent not in result.skipped:
+                        result.skipped[dependent] = failed_node
+                        queue.append(dependent)
+
+        finished_count = len(result.succeeded) + len(result.failed)
+        if finished_count + len(result.skipped) != len(self._nodes):
+            raise CommandError(
+                "Could not solve dependency graph. Is there a circular dependency?"
+            )
+
+        return result
+
+    def planned_order(self) -> List[T]:
+        """
+        :return: The order nodes would be started in if they were built one at a time
+        """
+        remaining = {node: len(deps) for node, deps in self._dependencies.items()}
+        ready = [self._ready_entry(n) for n, count in remaining.items() if count == 0]
+        heapq.heapify(ready)
+
+        ordered = []
+        while len(ready) > 0:
+            node = self._nodes[heapq.heappop(ready)[1]]
+            ordered.append(node)
+            for dependent in self._reverse_dependencies[node]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    heapq.heappush(ready, self._ready_entry(dependent))
+
+        return ordered
+
+    def _ready_entry(self, node: T) -> Tuple[float, int]:
+        """
+        :return: The entry for the node in the heap of ready nodes, which orders nodes
+            by priority, then by index
+        """
+        return -self._priorities.get(node, 0.0), self._indexes[node]
+
+
+class ScheduleResult(Generic[T]):
+    """The outcome of building every node in a schedule"""
+
+    def __init__(self) -> None:
+        self.succeeded: List[T] = []
+        """Nodes that were built successfully, in the order they finished"""
+        self.failed: Dict[T, Exception] = {}
+        """Nodes that failed to build, and the error they failed with"""
+        self.skipped: Dict[T, T] = {}
+        """Nodes that were not built because a node they depend on failed, and the
+        failed node
+        """
+
+
+def longest_remaining_paths(
+    dependencies: Dict[T, Set[T]], durations: Dict[T, float]
+) -> Dict[T, float]:
+    """Finds how long it will take to finish each node and everything that depends on
+    it, given unlimited parallelism. Starting the nodes with the longest remaining path
+    first keeps the critical path moving.
+
+    :param dependencies: Maps each node to the nodes that must finish before it can
+        be started
+    :param durations: How long each node takes
+    :return: Maps each node to the duration of the longest path from the start of the
+        node to the end of the build
+    """
+    dependents: Dict[T, List[T]] = {node: [] for node in dependencies}
+    for node, node_dependencies in dependencies.items():
+        for dependency in node_dependencies:
+            dependents[dependency].append(node)
+
+    # Visit nodes in reverse topological order, so that every dependent of a node is
+    # visited before the node itself
+    remaining = {node: len(dependents[node]) for node in dependencies}
+    stack = [node for node, count in remaining.items() if count == 0]
+    paths: Dict[T, float] = {}
+
+    while len(stack) > 0:
+        node = stack.pop()
+        longest_dependent = max((paths[d] for d in dependents[node]), default=0.0)
+        paths[node] = durations[node] + longest_dependent
+
+        for dependency in dependencies[node]:
+            remaining[dependency] -= 1
+            if remaining[dependency] == 0:
+                stack.append(dependency)
+
+    if len(paths) != len(dependencies):
+        raise CommandError(
+            "Could not solve dependency graph. Is there a circular dependency?"
+        )
+
+    return paths
+
+
+def critical_path(dependencies: Dict[T, Set[T]], paths: Dict[T, float]) -> List[T]:
+    """
+    :param dependencies: Maps each node to the nodes that must finish before it can
+        be started
+    :param paths: The longest remaining path of each node, from
+        longest_remaining_paths()
+    :return: The chain of nodes that determines the minimum total build time, in the
+        order they are built
+    """
+    if len(paths) == 0:
+        return []
+
+    dependents: Dict[T, List[T]] = {node: [] for node in dependencies}
+    for node, node_dependencies in dependencies.items():
+        for dependency in node_dependencies:
+            dependents[dependency].append(node)
+
+    node = max(dependencies, key=lambda n: paths[n])
+    path = [node]
+    while len(dependents[node]) > 0:
+        node = max(dependents[node], key=lambda n: paths[n])
+        path.append(node)
+
+    return path
@@ -4,6 +4,8 @@ import shutil
 from ..environment import Environment
 from ..print_utils import print_color, print_done, print_header, print_notify
 from ..registry import Registry
+from .artifacts_manifest import ArtifactsManifest
+from .build_cache import package_key
 from .command import Command
 from .env_argparse import EnvArgumentParser
 from .utils import (
@@ -25,17 +27,21 @@ class SourceCommand(Command):
         self.add_artifacts_dir_flag()
         self.add_config_file_flag()
         self.add_package_dir_flag()
+        self.add_incremental_flag()
+        self.add_no_fetch_cache_flag()
 
     def behavior(self, args: argparse.Namespace) -> None:
         config = self.parse_config_file(args)
         registry = Registry()
 
-        if args.artifacts_dir.is_dir():
+        if not args.incremental and args.artifacts_dir.is_dir():
             shutil.rmtree(args.artifacts_dir)
-        args.artifacts_dir.mkdir()
+        args.artifacts_dir.mkdir(exist_ok=True)
+        manifest = ArtifactsManifest(args.artifacts_dir)
+        fetch_cache = self.make_fetch_cache(args)
 
         for distro in config.distributions:
-            build_dir = make_build_dir()
+            build_dir = make_build_dir(distro)
 
             env = Environment(
                 codename=distro,
@@ -43,28 +49,50 @@ class SourceCommand(Command):
                 package_root=args.package_dir,
                 build_root=build_dir,
                 artifacts_root=args.artifacts_dir,
+                fetch_cache=fetch_cache,
             )
 
-            _source_packages(registry, env)
+            _source_packages(registry, env, manifest)
 
         print_color("")
         print_done("Source complete!")
 
 
-def _source_packages(registry: Registry, env: Environment) -> None:
+def _source_packages(
+    registry: Registry, env: Environment, manifest: ArtifactsManifest
+) -> None:
     print_header(f"Sourcing packages for distribution {env.codename}")
 
     package_dirs = find_package_dirs(env.package_root)
     package_pys = process_package_pys(env, package_dirs, registry)
 
+    manifest.prune(env, [p.source_package.name for p in package_pys])
+
     for package_py in package_pys:
         print_notify(f"Sourcing {package_py.source_package.name}")
 
+        key = package_key(
+            env=env,
+            package_py=package_py,
+            dependencies={},
+            chroot_digest="",
+            package_sources=[],
+        )
+        if manifest.is_current(env, package_py.source_package.name, key):
+            print_color(
+                f"Package {package_py.source_package.name} is unchanged and its "
+                f"artifacts are already present, so it will not be sourced"
+            )
+            continue
+
         results_dir = make_source_files(env.build_root, package_py.source_package)
 
-        copy_source_artifacts(
+        new_files = copy_source_artifacts(
             results_dir=results_dir,
             artifacts_dir=env.artifacts_root,
             distribution=env.codename,
             component=package_py.component,
         )
+        manifest.replace(env, package_py.source_package.name, key, new_files)
+
+    manifest.save()
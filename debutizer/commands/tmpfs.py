@@ -0,0 +1,149 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Iterator, Optional
+
+from ..print_utils import print_color, print_notify
+from ..subprocess_utils import run
+
+_MEBIBYTE = 1024 * 1024
+
+
+class TmpfsBuildPlaces:
+    """Gives builds a tmpfs to unpack the chroot and build the package in, so that
+    builds do little disk I/O. A tmpfs is only given while there is enough free memory
+    for it, otherwise the build falls back to a build place on disk.
+    """
+
+    def __init__(self, size: int, headroom: int = 1024 * _MEBIBYTE):
+        """
+        :param size: The size of each tmpfs in bytes
+        :param headroom: The amount of memory in bytes that must be left free for the
+            builds themselves after every tmpfs is full
+        """
+        self._size = size
+        self._headroom = headroom
+        self._lock = Lock()
+        self._reserved = 0
+        """The combined size of the tmpfs mounts currently in use. A tmpfs only uses
+        memory as files are written to it, so these aren't accounted for in the
+        memory the kernel reports as available.
+        """
+        self._in_memory = 0
+        self._on_disk = 0
+
+    @contextmanager
+    def acquire(self, package_name: str) -> Iterator[Optional[Path]]:
+        """Mounts a tmpfs for a build, if there is enough free memory for it. The
+        tmpfs is unmounted when the context is exited.
+
+        :param package_name: The name of the package being built
+        :return: The directory the tmpfs is mounted at, or None if the build should
+            use a build place on disk
+        """
+        with self._lock:
+            available = available_memory()
+            use_tmpfs = available is not None and fits_in_memory(
+                self._size, self._reserved, available, self._headroom
+            )
+            if use_tmpfs:
+                self._reserved += self._size
+                self._in_memory += 1
+            else:
+                self._on_disk += 1
+
+        if not use_tmpfs:
+            print_color(
+                f"Not enough free memory to build {package_name} on a tmpfs, falling "
+                f"back to a build place on disk"
+            )
+            yield None
+            return
+
+        try:
+            with tempfile.TemporaryDirectory(prefix="debutizer-tmpfs-") as mount_dir:
+                run(
+                    [
+                        "mount",
+                        "--types",
+                        "tmpfs",
+                        "--options",
+                        # Owned by the current user, so that the chroot backend
+                        # can make directories in it
+                        f"size={self._size // _MEBIBYTE}m,mode=0755,"
+                        f"uid={os.getuid()},gid={os.getgid()}",
+                        "debutizer-tmpfs",
+                        mount_dir,
+                    ],
+                    on_failure="Failed to mount a tmpfs for the build",
+                    root=True,
+                )
+                print_color(f"Building {package_name} on a tmpfs at {mount_dir}")
+                try:
+                    yield Path(mount_dir)
+                finally:
+                    run(
+                        ["umount", mount_dir],
+                        on_failure="Failed to unmount the build's tmpfs",
+                        root=True,
+                    )
+        finally:
+            with self._lock:
+                self._reserved -= self._size
+
+    def print_summary(self) -> None:
+        print_notify(
+            f"tmpfs: {self._in_memory} build(s) in memory, {self._on_disk} on disk"
+        )
+
+
+def fits_in_memory(size: int, reserved: int, available: int, headroom: int) -> bool:
+    """
+    :param size: The size of the new tmpfs in bytes
+    :param reserved: The combined size of the tmpfs mounts already in use
+    :param available: The memory the kernel reports as available
+    :param headroom: The memory that must be left free once every tmpfs is full
+    :return: True if a tmpfs of the given size can be mounted
+    """
+    return available - reserved - size >= headroom
+
+
+def available_memory() -> Optional[int]:
+    """
+    :return: The memory available for new allocations without swapping in bytes, or
+        None if it can't be determined
+    """
+    try:
+        meminfo = _MEMINFO.read_text()
+    except OSError:
+        return None
+
+    for line in meminfo.splitlines():
+        name, _, value = line.partition(":")
+        if name == "MemAvailable":
+            # Reported in kibibytes, despite the unit being written as "kB"
+            return int(value.split()[0]) * 1024
+
+    return None
+
+
+def unsafe_io_hook() -> str:
+    """Creates a pbuilder hook that stops dpkg from syncing every file it unpacks to
+    the disk. This is much like running dpkg under eatmydata, but doesn't need an extra
+    package in the chroot. The chroot is thrown away after the build, so nothing is
+    lost if the machine crashes.
+
+    :return: The contents of the hook script
+    """
+    script = "#!/usr/bin/env bash\n"
+    script += "# Generated by Debutizer to suppress fsync calls in dpkg\n"
+    script += "set -o errexit\n"
+    script += f"mkdir -p {_DPKG_CONFIG_FILE.parent}\n"
+    script += f"echo force-unsafe-io > {_DPKG_CONFIG_FILE}\n"
+    return script
+
+
+_MEMINFO = Path("/proc/meminfo")
+_DPKG_CONFIG_FILE = Path("/etc/dpkg/dpkg.cfg.d/debutizer-unsafe-io")
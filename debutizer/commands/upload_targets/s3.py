@@ -14,11 +14,7 @@ import requests
 
 from debutizer.commands.artifacts import find_artifacts
 from debutizer.commands.config_file import S3UploadTargetConfiguration
-from debutizer.commands.repo_metadata import (
-    add_packages_files,
-    add_release_files,
-    add_sources_files,
-)
+from debutizer.commands.repo_metadata import add_metadata_files
 from debutizer.commands.upload_targets import UploadTarget
 from debutizer.commands.utils import temp_file
 from debutizer.errors import CommandError, UnexpectedError
@@ -71,14 +67,16 @@ class S3UploadTarget(UploadTarget):
         ):
             mount_path = Path(mount_path_name)
             print_notify("Updating metadata files...")
-            metadata_files = add_packages_files(mount_path)
-            metadata_files += add_sources_files(mount_path)
-            metadata_files += add_release_files(
+            metadata_files = add_metadata_files(
                 mount_path,
                 sign=self._config.sign,
                 gpg_key_id=self._config.gpg_key_id,
                 gpg_signing_key=self._config.gpg_signing_key,
                 gpg_signing_password=self._config.gpg_signing_password,
+                # The bucket is mounted somewhere new every time, and s3fs doesn't
+                # give files stable inode numbers, so cached stanzas would never be
+                # used again
+                stanza_cache=False,
             )
 
             # Upload the files to the bucket. S3FS should take care of this, but we need
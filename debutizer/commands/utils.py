@@ -1,11 +1,15 @@
+import base64
+import hashlib
 import os
 import shutil
 import subprocess
 import tempfile
 from contextlib import ExitStack, contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Iterator, List, Optional, Set, Union
+from typing import Collection, Dict, Iterator, List, Optional, Set
 
+import requests
 from xdg.BaseDirectory import save_cache_path
 
 from ..environment import Environment
@@ -16,6 +20,8 @@ from ..registry import Registry
 from ..source_package import SourcePackage
 from ..subprocess_utils import run
 from ..version import Version
+from .apt_cache import AptCache
+from .apt_proxy import AptProxy, apt_proxy_hook
 from .artifacts import (
     BINARY_PACKAGE_GLOB,
     CHANGES_GLOB,
@@ -28,7 +34,23 @@ from .artifacts import (
     find_debian_source_files,
     find_source_archives,
 )
-from .config_file import PackageSourceConfiguration
+from .artifacts_manifest import PackageDefinition
+from .build_durations import format_duration
+from .chroot_backends import ChrootBackend
+from .chroot_metadata import (
+    chroot_freshness,
+    chroot_setup,
+    record_chroot_created,
+    record_chroot_setup,
+)
+from .compiler_cache import CompilerCache
+from .config_file import (
+    Configuration,
+    PackageSourceConfiguration,
+    UpstreamConfiguration,
+)
+from .package_graph import PackageGraph
+from .tmpfs import TmpfsBuildPlaces, unsafe_io_hook
 
 
 def find_package_dirs(package_dir: Path) -> List[Path]:
@@ -48,18 +70,31 @@ def process_package_pys(
     env: Environment,
     package_dirs: List[Path],
     registry: Registry,
+    only: Optional[Collection[str]] = None,
+    with_dependencies: bool = False,
+    definitions: Optional[Dict[str, PackageDefinition]] = None,
 ) -> List[PackagePy]:
     """Runs the package.py file in each package directory, extracting the configuration
     provided by that file
-    """
-    package_pys: List[PackagePy] = []
 
-    for package_dir in package_dirs:
-        print_color("")
-        print_notify(f"Reading {PackagePy.FILE_NAME} file for {package_dir.name}...")
-        package_py = PackagePy(env, package_dir / PackagePy.FILE_NAME)
-        package_pys.append(package_py)
-        registry.add(env, package_py.source_package)
+    :param env: The environment to process the packages for
+    :param package_dirs: Directories defining packages
+    :param registry: The registry to add the packages to
+    :param only: If provided, only these packages and the packages that depend on
+        them are processed
+    :param with_dependencies: If True, the packages that processed packages depend on
+        are processed too. Only used with the only parameter.
+    :param definitions: Definitions of the packages from a previous run, keyed by
+        source package name, used to find the packages to process without running
+        every package.py file. Only used with the only parameter.
+    :return: The processed packages, in build order
+    """
+    if only is None:
+        package_pys = [_read_package_py(env, d, registry) for d in package_dirs]
+    else:
+        package_pys = _read_affected_package_pys(
+            env, package_dirs, registry, only, with_dependencies, definitions or {}
+        )
 
     print_color("")
 
@@ -73,67 +108,198 @@ def process_package_pys(
     return package_pys
 
 
+def package_definition(package_py: PackagePy) -> PackageDefinition:
+    """
+    :param package_py: A processed package
+    :return: The package's place in the dependency graph, in a form that can be saved
+    """
+    source_package = package_py.source_package
+    return PackageDefinition(
+        name=source_package.name,
+        directory=package_py.path.parent.name,
+        version=source_package.version,
+        binaries=[b.package for b in source_package.control.binaries],
+        build_depends=_build_depends_names(source_package),
+    )
+
+
+def _read_package_py(
+    env: Environment, package_dir: Path, registry: Registry
+) -> PackagePy:
+    print_color("")
+    print_notify(f"Reading {PackagePy.FILE_NAME} file for {package_dir.name}...")
+    package_py = PackagePy(env, package_dir / PackagePy.FILE_NAME)
+    registry.add(env, package_py.source_package)
+    return package_py
+
+
+def _read_affected_package_pys(
+    env: Environment,
+    package_dirs: List[Path],
+    registry: Registry,
+    only: Collection[str],
+    with_dependencies: bool,
+    definitions: Dict[str, PackageDefinition],
+) -> List[PackagePy]:
+    """Reads the package.py files of the given packages and of the packages affected by
+    them, according to the dependency graph from a previous run. As package.py files
+    are read, the graph is updated and any newly affected packages are read as well.
+    """
+    dirs_by_name = {d.name: d for d in package_dirs}
+    definitions = {
+        name: definition
+        for name, definition in definitions.items()
+        if definition.directory in dirs_by_name
+    }
+    directories = {name: d.directory for name, d in definitions.items()}
+
+    selected = set()
+    for name in only:
+        if name in directories:
+            selected.add(name)
+        elif name in dirs_by_name:
+            selected.add(name)
+            directories[name] = name
+        else:
+            raise CommandError(f"No package named '{name}' exists")
+
+    # Nothing is known about packages that have never been processed, so they are
+    # treated as changed
+    known_dirs = set(directories.values())
+    for dir_name in dirs_by_name:
+        if dir_name not in known_dirs:
+            selected.add(dir_name)
+            directories[dir_name] = dir_name
+
+    package_pys: Dict[str, PackagePy] = {}
+    while True:
+        graph: PackageGraph[str] = PackageGraph()
+        for name in directories:
+            if name in definitions:
+                graph.add(
+                    name,
+                    name=name,
+                    binaries=definitions[name].binaries,
+                    build_depends=definitions[name].build_depends,
+                )
+            else:
+                graph.add(name, name=name, binaries=[], build_depends=[])
+
+        affected = graph.closure(selected, with_dependencies=with_dependencies)
+        read_dirs = {p.path.parent.name for p in package_pys.values()}
+        unread = [n for n in affected if directories[n] not in read_dirs]
+        if len(unread) == 0:
+            break
+
+        for name in sorted(unread):
+            package_py = _read_package_py(
+                env, dirs_by_name[directories[name]], registry
+            )
+            definition = package_definition(package_py)
+
+            # The package may have been renamed since it was last processed
+            if definition.name != name:
+                del directories[name]
+                definitions.pop(name, None)
+                if name in selected:
+                    selected.remove(name)
+                    selected.add(definition.name)
+
+            package_pys[definition.name] = package_py
+            definitions[definition.name] = definition
+            directories[definition.name] = definition.directory
+
+    # Packages that are not processed still provide their previously built packages
+    for name, definition in definitions.items():
+        if name not in package_pys:
+            registry.add_previous(env, definition.version, definition.binaries)
+
+    print_color("")
+    print_notify(
+        f"Processed {len(package_pys)} of {len(dirs_by_name)} package(s) affected by "
+        f"{', '.join(sorted(only))}"
+    )
+
+    return list(package_pys.values())
+
+
+def find_build_dependencies(
+    package_pys: List[PackagePy],
+) -> Dict[PackagePy, Set[PackagePy]]:
+    """Finds which of the given packages must be built before each package, based on
+    their build dependencies.
+
+    :param package_pys: The packages to inspect
+    :return: Maps each package to the packages that provide one of its build
+        dependencies
+    """
+    return _package_graph(package_pys).dependencies()
+
+
 def _order_package_pys(package_pys: List[PackagePy]) -> List[PackagePy]:
     """Order packages by the order in which they need to be built based on their
     dependencies.
     """
-    binary_package_names = []
-    for package_py in package_pys:
-        for binary_package in package_py.source_package.control.binaries:
-            binary_package_names.append(binary_package.package)
+    return _package_graph(package_pys).order()
+
 
-    start_nodes: List[PackagePy] = []
-    # Keep track of all unprocessed edges in the graph for each package
-    edges: Dict[PackagePy, Set[PackagePy]] = {}
+def _package_graph(package_pys: List[PackagePy]) -> PackageGraph[PackagePy]:
+    graph: PackageGraph[PackagePy] = PackageGraph()
 
     for package_py in package_pys:
-        if package_py.source_package.control.source is None:
-            raise CommandError(
-                f"Source package {package_py.source_package.name} is missing a source "
-                f"paragraph in the control file"
-            )
+        source_package = package_py.source_package
+        graph.add(
+            package_py,
+            name=source_package.name,
+            binaries=(b.package for b in source_package.control.binaries),
+            build_depends=_build_depends_names(source_package),
+        )
+
+    return graph
 
-        relations = (
-            package_py.source_package.control.source.all_build_depends().parsed()
+
+def _build_depends_names(source_package: SourcePackage) -> List[str]:
+    """
+    :return: The names of all packages the source package needs to be built
+    """
+    if source_package.control.source is None:
+        raise CommandError(
+            f"Source package {source_package.name} is missing a source paragraph in "
+            f"the control file"
         )
-        depends_names = []
-        for relation in relations:
-            for dependency in relation:
-                depends_names.append(dependency.name)
-
-        managed_depends = set()
-        for name in set(depends_names) & set(binary_package_names):
-            for other in package_pys:
-                other_binary_names = [
-                    b.package for b in other.source_package.control.binaries
-                ]
-                if name in other_binary_names:
-                    managed_depends.add(other)
-
-        edges[package_py] = managed_depends
-
-        # Add this as a start node if this package has no dependencies
-        if len(managed_depends) == 0:
-            start_nodes.append(package_py)
-
-    ordered: List[PackagePy] = []
-
-    while len(start_nodes) > 0:
-        node = start_nodes.pop()
-        ordered.append(node)
-
-        reverse_depends = (p for p in package_pys if node in edges[p])
-        for package in reverse_depends:
-            edges[package].remove(node)
-            if len(edges[package]) == 0:
-                start_nodes.append(package)
-
-    if len(ordered) != len(package_pys):
+
+    depends_names = []
+    for relation in source_package.control.source.all_build_depends().parsed():
+        for dependency in relation:
+            depends_names.append(dependency.name)
+    return depends_names
+
+
+def unconditional_build_depends(source_package: SourcePackage) -> Set[str]:
+    """
+    :return: The names of the packages the source package always needs to be built,
+        leaving out dependencies that have alternatives, architecture qualifiers, or
+        restrictions
+    """
+    if source_package.control.source is None:
         raise CommandError(
-            "Could not solve dependency graph. Is there a circular dependency?"
+            f"Source package {source_package.name} is missing a source paragraph in "
+            f"the control file"
         )
 
-    return ordered
+    depends_names = set()
+    for relation in source_package.control.source.all_build_depends().parsed():
+        if len(relation) != 1:
+            continue
+        dependency = relation[0]
+        if (
+            dependency.arch is not None
+            or dependency.archqual is not None
+            or dependency.restrictions is not None
+        ):
+            continue
+        depends_names.add(dependency.name)
+    return depends_names
 
 
 def make_source_files(
@@ -224,17 +390,44 @@ def make_source_files(
 def build_package(
     source_package: SourcePackage,
     build_dir: Path,
-    chroot_archive_path: Path,
+    chroot: ChrootBackend,
     network_access: bool = False,
     shell_on_failure: bool = False,
+    log_file: Optional[Path] = None,
+    package_sources: Optional[List[PackageSourceConfiguration]] = None,
+    local_package_source: Optional[PackageSourceConfiguration] = None,
+    apt_cache: Optional[AptCache] = None,
+    apt_proxy: Optional[AptProxy] = None,
+    compiler_cache: Optional[CompilerCache] = None,
+    parallel: Optional[int] = None,
+    tmpfs: Optional[TmpfsBuildPlaces] = None,
+    unsafe_io: bool = False,
 ) -> Path:
     """Builds binary packages for the given source package.
 
     :param source_package: The source package object to build binary packages for
     :param build_dir: The directory to do work in
-    :param chroot_archive_path: A path to the pbuilder chroot archive
+    :param chroot: The chroot to build in
     :param network_access: If True, the build will be allowed to access the internet
     :param shell_on_failure: If True, a shell will be started if the build fails
+    :param log_file: If provided, the build output will be saved to this file as well
+    :param package_sources: Additional package sources to make available in the
+        chroot during the build. Their package lists are only downloaded again if
+        they weren't already downloaded into the chroot by make_chroot.
+    :param local_package_source: If provided, the package source for packages built
+        earlier in this run. Its package list is downloaded for every build.
+    :param apt_cache: If provided, build dependencies are installed from this cache
+        where possible
+    :param apt_proxy: If provided, package indexes and packages from mirrors are
+        downloaded through this proxy
+    :param compiler_cache: If provided, C and C++ code is compiled through ccache
+        using this cache
+    :param parallel: If provided, the number of parallel jobs the package may be
+        built with
+    :param tmpfs: If provided, the package is built on a tmpfs from here when there
+        is enough free memory. The chroot's backend must support build places.
+    :param unsafe_io: If True, dpkg doesn't sync files to the disk when installing
+        build dependencies
     :return: The directory under the build directory where the new files are placed
     """
     working_dir = source_package.directory.parent
@@ -243,21 +436,72 @@ def build_package(
 
     dsc_file = working_dir / f"{source_package.name}_{source_package.version}.dsc"
 
-    command: List[Union[Path, str]] = ["pbuilder", "build"]
-
     if not _HOOK_SOURCE_DIR.is_dir():
         raise UnexpectedError(
             f"The pbuilder hook dir does not exist at {_HOOK_SOURCE_DIR}. This "
             f"suggests a broken installation of Debutizer."
         )
 
-    with tempfile.TemporaryDirectory() as hook_dir:
-        # Copy the package list updating hook
-        shutil.copy2(str(_HOOK_SOURCE_DIR / "D70results"), str(hook_dir))
+    with ExitStack() as stack:
+        hook_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        build_place = None
+        if tmpfs is not None:
+            build_place = stack.enter_context(tmpfs.acquire(source_package.name))
+        command = stack.enter_context(chroot.build_command(build_place))
 
         if shell_on_failure:
             shutil.copy2(str(_HOOK_SOURCE_DIR / "C10shell"), str(hook_dir))
 
+        if package_sources is None:
+            package_sources = []
+        all_package_sources = list(package_sources)
+        if local_package_source is not None:
+            all_package_sources.append(local_package_source)
+        if len(all_package_sources) > 0:
+            print_notify("Adding APT lists to the chroot:")
+            for package_source in all_package_sources:
+                print_color(f" * {package_source.entry}")
+
+        # D hooks run before build dependencies are installed, and this one runs
+        # before D70results updates the package list. The hook is used even without
+        # package sources, so that the lists in the chroot are always replaced.
+        sources_hook = Path(hook_dir) / "D10sources"
+        sources_hook.write_text(
+            package_sources_hook(package_sources, local_package_source)
+        )
+        sources_hook.chmod(0o755)
+
+        results_hook_file = Path(hook_dir) / "D70results"
+        results_hook_file.write_text(results_hook())
+        results_hook_file.chmod(0o755)
+
+        if apt_proxy is not None:
+            # Runs before any D hook that uses APT
+            apt_proxy_hook_file = Path(hook_dir) / "D01aptproxy"
+            apt_proxy_hook_file.write_text(apt_proxy_hook(apt_proxy.url))
+            apt_proxy_hook_file.chmod(0o755)
+
+        if unsafe_io:
+            unsafe_io_hook_file = Path(hook_dir) / "D05unsafeio"
+            unsafe_io_hook_file.write_text(unsafe_io_hook())
+            unsafe_io_hook_file.chmod(0o755)
+
+        if apt_cache is not None:
+            command += stack.enter_context(
+                apt_cache.mount(
+                    chroot.distribution, chroot.architecture, Path(hook_dir)
+                )
+            )
+        if compiler_cache is not None:
+            command += stack.enter_context(
+                compiler_cache.mount(
+                    chroot.distribution,
+                    chroot.architecture,
+                    Path(hook_dir),
+                    source_package.name,
+                )
+            )
+
         command += [
             "--use-network",
             "yes" if network_access else "no",
@@ -265,10 +509,15 @@ def build_package(
             str(hook_dir),
             "--buildresult",
             results_dir,
-            "--basetgz",
-            chroot_archive_path,
-            dsc_file,
         ]
+        if parallel is not None:
+            # Unlike -j, -J only sets the parallel option in DEB_BUILD_OPTIONS, so
+            # packages that don't support parallel builds are still built serially
+            command += ["--debbuildopts", f"-J{parallel}"]
+        if log_file is not None:
+            log_file.parent.mkdir(parents=True, exist_ok=True)
+            command += ["--logfile", log_file]
+        command.append(dsc_file)
 
         try:
             run(
@@ -290,79 +539,214 @@ def build_package(
     return results_dir
 
 
-def make_chroot(distribution: str) -> Path:
+def make_chroot(
+    chroot: ChrootBackend,
+    package_sources: Optional[List[PackageSourceConfiguration]] = None,
+) -> None:
     """Creates a chroot environment for the package to be built in, if one does not
-    already exist.
+    already exist. Each distribution/architecture pair gets its own chroot, so that
+    they can be built for concurrently.
 
-    :param distribution: The distribution codename to create a chroot for
-    :return: A path to the archive containing the chroot contents
-    """
-    archive_path = _chroot_tgz_path(distribution)
+    The chroot is only modified when it is created or when the setup Debutizer applies
+    to it changes. The setup includes downloading the package lists of the given
+    package sources, so that builds don't have to.
 
-    if not archive_path.is_file():
+    :param chroot: The chroot to create
+    :param package_sources: The package sources builds in the chroot will use, other
+        than the local repository
+    """
+    created = False
+    if not chroot.exists():
         # Create a chroot for builds to be performed in
-        print_notify(f"Creating a chroot for distribution '{distribution}'")
+        print_notify(f"Creating a chroot for distribution '{chroot.distribution}'")
         try:
-            run(
-                [
-                    "pbuilder",
-                    "create",
-                    "--basetgz",
-                    archive_path,
-                    "--distribution",
-                    distribution,
-                ],
-                on_failure="Failed to create pbuilder chroot environment",
-                root=True,
-            )
+            chroot.create()
         except Exception:
             # Remove the partially created chroot
-            archive_path.unlink()
+            chroot.remove()
             raise
+        created = True
     else:
-        print_color(f"Using existing chroot at {archive_path}")
+        freshness = chroot_freshness(chroot.base_path)
+        age = ""
+        if freshness is not None:
+            age = f", last refreshed {format_duration(freshness.age())} ago"
+        print_color(f"Using existing chroot at {chroot.base_path}{age}")
 
-    return archive_path
+    index_snapshot = _set_up_chroot(chroot, package_sources or [])
+    if created and index_snapshot is not None:
+        record_chroot_created(chroot.base_path, index_snapshot)
 
 
-def set_chroot_package_sources(
-    distribution: str, package_sources: List[PackageSourceConfiguration]
-) -> None:
-    """Sets additional package sources for the chroot corresponding to the given
-    distribution
+def chroot_package_sources(
+    config: Configuration, distribution: str
+) -> List[PackageSourceConfiguration]:
+    """
+    :param config: The configuration file
+    :param distribution: The distribution codename packages are built for
+    :return: The package sources builds use, other than the local repository
+    """
+    package_sources = []
+    if config.upstream is not None:
+        package_sources.append(
+            _make_upstream_source_entry(config.upstream, distribution)
+        )
+    package_sources += config.package_sources
+    return package_sources
+
+
+def _make_upstream_source_entry(
+    upstream: UpstreamConfiguration, distribution: str
+) -> PackageSourceConfiguration:
+    """Creates an APT source list entry based on the provided configuration"""
+    parameters = ""
+    if upstream.is_trusted:
+        parameters = "[trusted=yes]"
+
+    components_str = " ".join(upstream.components)
+
+    return PackageSourceConfiguration(
+        entry=f"deb {parameters} {upstream.url} {distribution} {components_str}",
+        gpg_key_url=upstream.gpg_key_url,
+    )
+
+
+def run_chroot_script(chroot: ChrootBackend, script: str) -> str:
+    """Runs a script in the chroot's base system, keeping any changes it makes. This
+    must not be done while the chroot is being used.
+
+    :param chroot: The chroot to run the script in
+    :param script: The contents of the script
+    :return: A hash of the package indexes in the chroot after the script has run
     """
-    print_notify(f"Adding APT lists to the '{distribution}' chroot:")
-    apt_list = Path("/etc/apt/sources.list.d/debutizer.list")
+    with tempfile.TemporaryDirectory() as output_dir:
+        snapshot_file = Path(output_dir) / "index-snapshot"
+        script += (
+            f"cat /var/lib/apt/lists/*Release | sha256sum "
+            f"| cut --delimiter ' ' --fields 1 > {snapshot_file}\n"
+        )
+        with temp_file(script) as script_file:
+            chroot.execute(script_file, bind_mounts=[Path(output_dir)])
+        return snapshot_file.read_text().strip()
 
-    script = "#!/bin/bash\n"
+
+def _set_up_chroot(
+    chroot: ChrootBackend, package_sources: List[PackageSourceConfiguration]
+) -> Optional[str]:
+    """Installs the tools builds need into the chroot's base system and downloads the
+    package lists of the package sources, if the current setup hasn't already been
+    applied. This modifies the chroot, so it must not be done while the chroot is
+    being used.
+
+    :return: A hash of the package indexes in the chroot, or None if the setup was
+        already applied
+    """
+    setup_script = _CHROOT_SETUP_SCRIPT
+    setup_script += package_sources_hook(package_sources)
+    setup_script += PREFETCH_LISTS_SCRIPT
+    setup_hash = hashlib.sha256(setup_script.encode()).hexdigest()
+    if chroot_setup(chroot.base_path) == setup_hash:
+        return None
+
+    print_notify(f"Setting up the chroot at {chroot.base_path}")
+    index_snapshot = run_chroot_script(chroot, setup_script)
+    # The setup is not part of the chroot's base system
+    record_chroot_setup(chroot.base_path, setup_hash)
+    return index_snapshot
+
+
+def package_sources_hook(
+    package_sources: List[PackageSourceConfiguration],
+    local_package_source: Optional[PackageSourceConfiguration] = None,
+) -> str:
+    """Creates a pbuilder hook that configures the given package sources in the chroot
+    at build time. The local repository gets its own source list, so that its package
+    list can be updated on its own.
+
+    :param package_sources: The package sources to configure
+    :param local_package_source: If provided, the package source of the local
+        repository
+    :return: The contents of the hook script
+    """
+    script = "#!/usr/bin/env bash\n"
+    script += "# Generated by Debutizer to configure additional package sources\n"
     script += "set -o errexit\n"
     script += "set -o pipefail\n"
-    script += "apt-get install -y gnupg curl ca-certificates\n"
-    script += "update-ca-certificates\n"
+    script += "set -o nounset\n"
 
-    script += f"rm -f {apt_list}\n"
+    script += f"cat > {_APT_LIST} << '{_HEREDOC_END}'\n"
     for package_source in package_sources:
-        script += f"echo '{package_source.entry}' >> {apt_list}\n"
-        if package_source.gpg_key_url is not None:
-            # Import the package source's GPG key
-            script += f"curl -SsL '{package_source.gpg_key_url}' | apt-key add -\n"
-
-        print_color(f" * {package_source.entry}")
-
-    with temp_file(script) as script_file:
-        run(
-            [
-                "pbuilder",
-                "execute",
-                "--basetgz",
-                _chroot_tgz_path(distribution),
-                "--save-after-exec",
-                "--",
-                script_file,
-            ],
-            on_failure="Failed to set APT repositories in the chroot",
-            root=True,
+        script += f"{package_source.entry}\n"
+    script += f"{_HEREDOC_END}\n"
+
+    if local_package_source is not None:
+        script += f"echo '{local_package_source.entry}' > {_LOCAL_APT_LIST}\n"
+    else:
+        script += f"rm -f {_LOCAL_APT_LIST}\n"
+
+    for i, package_source in enumerate(package_sources):
+        if package_source.gpg_key_url is None:
+            continue
+
+        key = _fetch_gpg_key(package_source.gpg_key_url)
+        # APT accepts ASCII-armored keys with the .asc extension and binary keys with
+        # the .gpg extension
+        extension = "asc" if key.startswith(b"-----BEGIN PGP") else "gpg"
+        key_file = _APT_KEY_DIR / f"debutizer-{i}.{extension}"
+        script += f"base64 --decode > {key_file} << '{_HEREDOC_END}'\n"
+        script += base64.encodebytes(key).decode()
+        script += f"{_HEREDOC_END}\n"
+
+    return script
+
+
+def results_hook() -> str:
+    """Creates a pbuilder hook that updates the package lists before build
+    dependencies are installed. This is necessary since the local repository gets new
+    packages as they are built.
+
+    The lists of every other package source are downloaded into the chroot's base
+    system ahead of time, so only the local repository's list is updated, unless the
+    source lists have changed since then or the lists are out of date.
+
+    :return: The contents of the hook script
+    """
+    script = "#!/usr/bin/env bash\n"
+    script += "# Generated by Debutizer to update the package lists\n"
+    script += "set -o errexit\n"
+    script += "set -o pipefail\n"
+    script += "set -o nounset\n"
+    script += 'echo "Updating the package list..."\n'
+    script += (
+        f"if [[ -n $(find {_PREFETCHED_LISTS} -mmin -{_PREFETCHED_LISTS_MAX_AGE} "
+        f"2> /dev/null) ]] \\\n"
+        f"    && sha256sum --check --status {_PREFETCHED_LISTS}; then\n"
+    )
+    script += f"    if [[ -f {_LOCAL_APT_LIST} ]]; then\n"
+    script += "        apt-get update \\\n"
+    script += f"            -o Dir::Etc::SourceList={_LOCAL_APT_LIST} \\\n"
+    script += "            -o Dir::Etc::SourceParts=- \\\n"
+    # Keep the lists of the other package sources
+    script += "            -o APT::Get::List-Cleanup=0\n"
+    script += "    fi\n"
+    script += "else\n"
+    script += "    apt-get update\n"
+    script += "fi\n"
+    return script
+
+
+@lru_cache(maxsize=None)
+def _fetch_gpg_key(url: str) -> bytes:
+    try:
+        response = requests.get(url)
+    except requests.RequestException as ex:
+        raise CommandError(f"While fetching the GPG key at {url}: {ex}") from ex
+    if not response.ok:
+        raise CommandError(
+            f"Unexpected status code {response.status_code} while fetching the GPG "
+            f"key at {url}"
         )
+    return response.content
 
 
 def copy_source_artifacts(
@@ -370,13 +754,14 @@ def copy_source_artifacts(
     artifacts_dir: Path,
     distribution: str,
     component: str,
-) -> None:
+) -> List[Path]:
     """Copies source files to their proper location in the artifacts directory.
 
     :param results_dir: The path where the source files are
     :param artifacts_dir: The artifacts directory
     :param distribution: The distribution these packages are for
     :param component: The repository component that this package is under
+    :return: The copied files in the artifacts directory
     """
     dsc_files = find_debian_source_files(results_dir)
     orig_tar_files = find_source_archives(results_dir)
@@ -424,8 +809,12 @@ def copy_source_artifacts(
 
     source_path = artifacts_dir / Path("dists") / distribution / component / "source"
     source_path.mkdir(parents=True, exist_ok=True)
+    copied = []
     for source_file in dsc_files + orig_tar_files + debian_tar_files + changes_files:
         shutil.copy2(source_file, source_path)
+        copied.append(source_path / source_file.name)
+
+    return copied
 
 
 def copy_binary_artifacts(
@@ -434,7 +823,7 @@ def copy_binary_artifacts(
     distribution: str,
     component: str,
     architecture: str,
-) -> None:
+) -> List[Path]:
     """Copies binary package files to their proper location in the artifacts directory.
 
     :param results_dir: The path where the binary package files are
@@ -442,6 +831,7 @@ def copy_binary_artifacts(
     :param distribution: The distribution these packages are for
     :param component: The repository component that this package is under
     :param architecture: The CPU architecture these binary artifacts are for
+    :return: The copied files in the artifacts directory
     """
     deb_files = find_binary_packages(results_dir)
 
@@ -460,8 +850,12 @@ def copy_binary_artifacts(
         / f"binary-{architecture}"
     )
     binary_path.mkdir(parents=True, exist_ok=True)
+    copied = []
     for deb_file in deb_files:
         shutil.copy2(deb_file, binary_path)
+        copied.append(binary_path / deb_file.name)
+
+    return copied
 
 
 @contextmanager
@@ -477,11 +871,18 @@ def temp_file(content: str) -> Iterator[Path]:
     path.unlink()
 
 
-def make_build_dir() -> Path:
-    build_dir = Path(save_cache_path("debutizer"))
+def make_build_dir(name: str) -> Path:
+    """Creates an empty build directory. Build directories with different names are
+    isolated from each other, so that they may be used concurrently.
+
+    :param name: A name identifying what the build directory is for, like the
+        distribution and architecture being built for
+    :return: The new build directory
+    """
+    build_dir = Path(save_cache_path("debutizer")) / "builds" / name
     if build_dir.is_dir():
         shutil.rmtree(build_dir)
-    build_dir.mkdir()
+    build_dir.mkdir(parents=True)
 
     return build_dir
 
@@ -558,12 +959,35 @@ def make_source_archive(
     )
 
 
-def _chroot_tgz_path(distribution: str) -> Path:
-    pbuilder_cache_str = os.environ.get(
-        "DEBUTIZER_PBUILDER_CACHE_DIR", "/var/cache/pbuilder"
-    )
-    pbuilder_cache_path = Path(pbuilder_cache_str)
-    return pbuilder_cache_path / f"debutizer-{distribution}.tgz"
-
-
 _HOOK_SOURCE_DIR = Path(__file__).parent / "pbuilder_hooks"
+
+_CHROOT_SETUP_SCRIPT = """#!/bin/bash
+set -o errexit
+set -o pipefail
+apt-get install -y ca-certificates
+update-ca-certificates
+"""
+"""Applied to the chroot's base system once. Changing this script causes it to be
+applied again.
+"""
+
+_APT_LIST = Path("/etc/apt/sources.list.d/debutizer.list")
+_LOCAL_APT_LIST = Path("/etc/apt/sources.list.d/debutizer-local.list")
+_APT_KEY_DIR = Path("/etc/apt/trusted.gpg.d")
+_PREFETCHED_LISTS = Path("/var/lib/debutizer/prefetched-lists.sha256")
+_PREFETCHED_LISTS_MAX_AGE = 24 * 60
+"""The age in minutes after which package lists downloaded into the chroot's base
+system are downloaded again by every build
+"""
+_HEREDOC_END = "DEBUTIZER_EOF"
+
+PREFETCH_LISTS_SCRIPT = f"""apt-get update
+mkdir -p {_PREFETCHED_LISTS.parent}
+find /etc/apt/sources.list* -type f \\
+    ! -name {_LOCAL_APT_LIST.name} -print0 \\
+    | sort --zero-terminated | xargs --null --no-run-if-empty sha256sum \\
+    > {_PREFETCHED_LISTS}
+"""
+"""Downloads the package lists in a chroot's base system, and records which source
+lists they were downloaded for
+"""
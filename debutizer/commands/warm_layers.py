@@ -0,0 +1,150 @@
+import hashlib
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, TypeVar
+
+from ..errors import CommandError
+from ..print_utils import print_color, print_notify, print_warning
+from .chroot_backends import ChrootBackend
+from .chroot_metadata import chroot_setup
+from .utils import temp_file
+
+T = TypeVar("T", bound=Hashable)
+
+_LAYER_PREFIX = "warm-"
+
+
+def plan_warm_layers(
+    build_depends: Dict[T, Set[str]], max_layers: int, min_packages: int = 2
+) -> List[FrozenSet[str]]:
+    """Chooses sets of build dependencies to pre-install in warm chroot layers.
+
+    A package can only use a layer if it needs every package in it, so that builds
+    never see packages they don't depend on. Each layer is grown greedily, adding the
+    dependency that most increases the number of package installations the layer
+    saves, which is the size of the layer times the number of packages that can use
+    it. Later layers only count savings over the layers chosen before them.
+
+    :param build_depends: The names of the packages each package needs to be built
+    :param max_layers: The maximum number of layers to choose
+    :param min_packages: The minimum number of packages that must be able to use a
+        layer
+    :return: The dependency sets of the chosen layers
+    """
+    layers: List[FrozenSet[str]] = []
+    # How many packages each package would already have installed by a chosen layer
+    covered = {node: 0 for node in build_depends}
+
+    def savings(layer: Set[str]) -> int:
+        users = [n for n, deps in build_depends.items() if layer <= deps]
+        if len(users) < min_packages:
+            return 0
+        return sum(max(len(layer) - covered[n], 0) for n in users)
+
+    for _ in range(max_layers):
+        layer: Set[str] = set()
+        layer_savings = 0
+
+        while True:
+            # Only dependencies of packages that can still use the layer can grow it
+            candidates: Set[str] = set()
+            for deps in build_depends.values():
+                if layer <= deps:
+                    candidates |= deps - layer
+
+            best = None
+            for candidate in sorted(candidates):
+                candidate_savings = savings(layer | {candidate})
+                if candidate_savings > layer_savings:
+                    best, layer_savings = candidate, candidate_savings
+            if best is None:
+                break
+            layer.add(best)
+
+        if layer_savings == 0:
+            break
+
+        layers.append(frozenset(layer))
+        for node, deps in build_depends.items():
+            if layer <= deps:
+                covered[node] = max(covered[node], len(layer))
+
+    return layers
+
+
+def best_warm_layer(
+    layers: Iterable[FrozenSet[str]], build_depends: Set[str]
+) -> Optional[FrozenSet[str]]:
+    """
+    :param layers: The dependency sets of the available layers
+    :param build_depends: The names of the packages a package needs to be built
+    :return: The layer with the most packages pre-installed that the package can use,
+        or None if it can't use any
+    """
+    usable = [layer for layer in layers if layer <= build_depends]
+    if len(usable) == 0:
+        return None
+    return max(usable, key=lambda layer: (len(layer), sorted(layer)))
+
+
+def make_warm_layers(
+    chroot: ChrootBackend, layers: List[FrozenSet[str]], setup_script: str
+) -> Dict[FrozenSet[str], ChrootBackend]:
+    """Creates the warm layers that don't exist yet, as copies of the base chroot with
+    the layer's packages installed, and removes layers that are no longer used.
+    Layers are keyed by their packages and by the base chroot they were made from, so
+    they are made again whenever the base chroot changes.
+
+    This modifies chroots, so it must not be done while they are being used.
+
+    :param chroot: The base chroot
+    :param layers: The dependency sets of the layers
+    :param setup_script: A script that prepares the chroot to install packages, like
+        by configuring package sources
+    :return: The chroot for each layer that could be created
+    """
+    base_key = f"{chroot.digest()}\n{chroot_setup(chroot.base_path)}\n{setup_script}"
+
+    layer_chroots: Dict[FrozenSet[str], ChrootBackend] = {}
+    for layer in layers:
+        layer_hash = hashlib.sha256(base_key.encode())
+        layer_hash.update("\n".join(sorted(layer)).encode())
+        layer_chroot = chroot.make_layer(_LAYER_PREFIX + layer_hash.hexdigest()[:16])
+
+        if not layer_chroot.exists():
+            print_notify(
+                f"Creating a warm chroot layer with {len(layer)} package(s) "
+                f"pre-installed:"
+            )
+            for name in sorted(layer):
+                print_color(f" * {name}")
+
+            try:
+                layer_chroot.create_from(chroot)
+                with temp_file(_install_script(layer, setup_script)) as script_file:
+                    layer_chroot.execute(script_file)
+            except CommandError as ex:
+                # Builds can still install these packages themselves
+                print_warning(f"Failed to create the warm chroot layer: {ex}")
+                layer_chroot.remove()
+                continue
+        else:
+            print_color(f"Using existing warm chroot layer at {layer_chroot.base_path}")
+
+        layer_chroots[layer] = layer_chroot
+
+    used_paths = {c.base_path for c in layer_chroots.values()}
+    for existing in chroot.existing_layers():
+        if existing.layer is None or not existing.layer.startswith(_LAYER_PREFIX):
+            continue
+        if existing.base_path not in used_paths:
+            print_notify(f"Removing unused warm chroot layer at {existing.base_path}")
+            existing.remove()
+
+    return layer_chroots
+
+
+def _install_script(layer: FrozenSet[str], setup_script: str) -> str:
+    script = setup_script
+    script += "apt-get update\n"
+    script += "DEBIAN_FRONTEND=noninteractive apt-get install --yes "
+    script += "--no-install-recommends " + " ".join(sorted(layer)) + "\n"
+    return script
@@ -0,0 +1,75 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def digest_file(path: Path) -> str:
+    """
+    :param path: The file to hash
+    :return: The SHA256 hex digest of the file's contents
+    """
+    hasher = hashlib.sha256()
+    update_with_file(hasher, path)
+    return hasher.hexdigest()
+
+
+def multi_digest_file(path: Path, algorithms: Sequence[str]) -> Dict[str, str]:
+    """Hashes a file with several algorithms while reading it only once
+
+    :param path: The file to hash
+    :param algorithms: The names of the hashlib algorithms to use
+    :return: The hex digest of the file's contents for each algorithm
+    """
+    hashers = [hashlib.new(a) for a in algorithms]
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            for hasher in hashers:
+                hasher.update(chunk)
+    return {a: h.hexdigest() for a, h in zip(algorithms, hashers)}
+
+
+def digest_tree(path: Path) -> str:
+    """Hashes a directory tree, including file names, contents, symlink targets, and
+    whether files are executable. Timestamps and ownership are ignored, so the digest
+    only changes if the content of the tree changes.
+
+    :param path: The directory to hash
+    :return: The SHA256 hex digest of the tree
+    """
+    hasher = hashlib.sha256()
+    update_with_tree(hasher, path)
+    return hasher.hexdigest()
+
+
+def update_with_file(hasher: Any, path: Path) -> None:
+    """Feeds the contents of the given file to the hasher"""
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+
+
+def update_with_tree(hasher: Any, path: Path) -> None:
+    """Feeds the contents of the given directory tree to the hasher"""
+    for root, dir_names, file_names in os.walk(path):
+        # Walk in a stable order so that the digest does not depend on the filesystem
+        dir_names.sort()
+        root_path = Path(root)
+
+        for name in sorted(file_names + [d for d in dir_names if _is_link(root, d)]):
+            file_path = root_path / name
+            relative = file_path.relative_to(path)
+
+            if file_path.is_symlink():
+                hasher.update(f"L {relative} {os.readlink(file_path)}\0".encode())
+            elif file_path.is_file():
+                size = file_path.stat().st_size
+                executable = os.access(file_path, os.X_OK)
+                hasher.update(f"F {relative} {size} {int(executable)}\0".encode())
+                update_with_file(hasher, file_path)
+
+
+def _is_link(root: str, name: str) -> bool:
+    return os.path.islink(os.path.join(root, name))
@@ -1,6 +1,8 @@
 from pathlib import Path
+from typing import Optional
 
 from debutizer.errors import UnexpectedError
+from debutizer.fetch_cache import FetchCache
 
 
 class Environment:
@@ -14,6 +16,7 @@ class Environment:
         build_root: Path,
         artifacts_root: Path,
         network_access: bool = False,
+        fetch_cache: Optional[FetchCache] = None,
     ):
         self._codename = codename
         self._architecture = architecture
@@ -21,6 +24,7 @@ class Environment:
         self._build_root = build_root
         self._artifacts_root = artifacts_root
         self._network_access = network_access
+        self._fetch_cache = fetch_cache
 
     @property
     def codename(self) -> str:
@@ -60,6 +64,13 @@ class Environment:
     def network_access(self, value: bool) -> None:
         self._network_access = value
 
+    @property
+    def fetch_cache(self) -> Optional[FetchCache]:
+        """If not None, upstreams keep fetched source here so that it can be reused by
+        other environments and later runs
+        """
+        return self._fetch_cache
+
     def compat_version(self) -> str:
         """
         :return: the debhelper compatibility version used by the current distribution
@@ -0,0 +1,208 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from xdg.BaseDirectory import save_cache_path
+
+from .print_utils import print_color, print_notify
+
+_DAY = 24 * 60 * 60
+_GIBIBYTE = 1024 * 1024 * 1024
+
+
+class FetchCache:
+    """Keeps source fetched by upstreams outside of the build directory, so that it can
+    be reused between distributions and between runs instead of being downloaded again.
+
+    Entries are keyed by the package name, the upstream version, and a string
+    identifying where the source comes from. Each entry has its own lock, so concurrent
+    builds, including builds in other processes, fetch a given entry only once.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_age: float = 30 * _DAY,
+        max_size: int = 20 * _GIBIBYTE,
+    ):
+        """
+        :param cache_dir: The directory to keep fetched source in. Defaults to a
+            directory in the XDG cache.
+        :param max_age: Entries that have not been used for this many seconds are
+            evicted
+        :param max_size: If the cache is larger than this many bytes, the least
+            recently used entries are evicted until it fits
+        """
+        if cache_dir is None:
+            cache_dir = Path(save_cache_path("debutizer")) / "fetched"
+        self._cache_dir = cache_dir
+        self._max_age = max_age
+        self._max_size = max_size
+
+    def fetch(
+        self,
+        name: str,
+        upstream_version: str,
+        source: str,
+        fetch_into: Callable[[Path], None],
+        destination: Path,
+    ) -> None:
+        """Copies fetched source into the destination, fetching it first if it is not
+        already in the cache.
+
+        :param name: The source package name
+        :param upstream_version: The upstream version of the source
+        :param source: Identifies where the source is fetched from, like a repository
+            URL and revision
+        :param fetch_into: Fetches the source into the given empty directory
+        :param destination: An existing directory to copy the fetched source into
+        """
+        source_hash = hashlib.sha256(source.encode()).hexdigest()[:16]
+        entry_dir = self._cache_dir / name / f"{upstream_version}-{source_hash}"
+        contents_dir = entry_dir / "contents"
+
+        with _lock_entry(entry_dir, blocking=True):
+            if contents_dir.is_dir():
+                print_color(
+                    f"Reusing previously fetched source for {name} {upstream_version}"
+                )
+            else:
+                # Fetch into a temporary directory first so that an interrupted fetch
+                # never leaves a partial entry behind
+                temp_dir = entry_dir / "contents.tmp"
+                if temp_dir.exists():
+                    shutil.rmtree(temp_dir)
+                temp_dir.mkdir()
+                fetch_into(temp_dir)
+
+                (entry_dir / _SIZE_FILE_NAME).write_text(str(_tree_size(temp_dir)))
+                temp_dir.rename(contents_dir)
+
+            for child in contents_dir.iterdir():
+                if child.is_dir() and not child.is_symlink():
+                    shutil.copytree(child, destination / child.name, symlinks=True)
+                else:
+                    shutil.copy2(child, destination, follow_symlinks=False)
+
+            (entry_dir / _LAST_USED_FILE_NAME).touch()
+
+    def evict(self) -> None:
+        """Removes entries that are too old or that don't fit in the cache. Entries that
+        are in use are skipped.
+        """
+        if not self._cache_dir.is_dir():
+            return
+
+        entries: List[Tuple[float, int, Path]] = []
+        for entry_dir in self._cache_dir.glob("*/*"):
+            # Entries without contents were never finished, and are evicted first
+            # unless they're still being fetched
+            last_used_file = entry_dir / _LAST_USED_FILE_NAME
+            size_file = entry_dir / _SIZE_FILE_NAME
+            last_used = (
+                last_used_file.stat().st_mtime if last_used_file.is_file() else 0
+            )
+            size = int(size_file.read_text()) if size_file.is_file() else 0
+            entries.append((last_used, size, entry_dir))
+
+        # Least recently used first
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        now = time.time()
+
+        for last_used, size, entry_dir in entries:
+            if now - last_used <= self._max_age and total_size <= self._max_size:
+                break
+
+            with _lock_entry(entry_dir, blocking=False) as locked:
+                if not locked:
+                    continue
+                print_notify(f"Evicting fetched source at {entry_dir}")
+                # The lock file is removed too. Anyone waiting on it notices that it
+                # was replaced once they get the lock.
+                shutil.rmtree(entry_dir)
+                total_size -= size
+
+            try:
+                # Remove the package's directory once it has no entries left
+                entry_dir.parent.rmdir()
+            except OSError:
+                pass
+
+
+@contextmanager
+def _lock_entry(entry_dir: Path, blocking: bool) -> Iterator[bool]:
+    """Holds an exclusive lock on the entry for the duration of the context.
+
+    :param entry_dir: The entry to lock. If blocking, it's created if it doesn't exist.
+    :param blocking: If False, the lock is not waited for if it's held by someone else,
+        and entries that have been evicted are not locked
+    :return: True if the lock was acquired
+    """
+    lock_path = entry_dir / _LOCK_FILE_NAME
+
+    while True:
+        if blocking:
+            entry_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            lock_file = lock_path.open("a")
+        except FileNotFoundError:
+            # The entry was evicted
+            if blocking:
+                continue
+            yield False
+            return
+
+        with lock_file:
+            flags = fcntl.LOCK_EX
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+
+            if not _is_current(lock_file.fileno(), lock_path):
+                # The entry was evicted while the lock was being waited for, so the lock
+                # is on a file that no longer exists
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                if blocking:
+                    continue
+                yield False
+                return
+
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            return
+
+
+def _is_current(fd: int, path: Path) -> bool:
+    """
+    :return: True if the open file is the file currently at the path
+    """
+    try:
+        return os.stat(path).st_ino == os.fstat(fd).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for root, _, file_names in os.walk(path):
+        for file_name in file_names:
+            total += os.lstat(os.path.join(root, file_name)).st_size
+    return total
+
+
+_LOCK_FILE_NAME = ".lock"
+_LAST_USED_FILE_NAME = ".last-used"
+_SIZE_FILE_NAME = ".size"
@@ -1,6 +1,6 @@
 from pathlib import Path
 from types import ModuleType
-from typing import ClassVar
+from typing import ClassVar, Optional
 
 from .environment import Environment
 from .errors import CommandError
@@ -20,6 +20,14 @@ class PackagePy:
     """A callback that will be run before a package is built"""
     build_dir: Path
     """The directory where scratch work will be done for this configuration"""
+    path: Path
+    """The path to the package.py file"""
+    parallel: Optional[int]
+    """If set, the number of parallel jobs the package is built with, regardless of
+    how many CPUs are available
+    """
+    max_parallel: Optional[int]
+    """If set, the maximum number of parallel jobs the package is built with"""
 
     def __init__(self, env: Environment, package_py: Path):
         if not package_py.is_file():
@@ -28,6 +36,7 @@ class PackagePy:
                 f"{PackagePy.FILE_NAME} file"
             )
         self.build_dir = env.build_root / package_py.parent.name
+        self.path = package_py
 
         package_module = ModuleType(package_py.name)
         # Put the module in a package so it can do relative imports
@@ -73,5 +82,17 @@ class PackagePy:
         if not isinstance(self.component, str):
             raise CommandError("The component variable must be a string")
 
+        self.parallel = _optional_job_count(package_module, "parallel")
+        self.max_parallel = _optional_job_count(package_module, "max_parallel")
+
     def __repr__(self) -> str:
         return f"PackagePy(source_package={self.source_package})"
+
+
+def _optional_job_count(package_module: ModuleType, name: str) -> Optional[int]:
+    value = getattr(package_module, name, None)
+    if value is None:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise CommandError(f"The {name} variable must be a positive integer")
+    return value
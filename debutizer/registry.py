@@ -1,5 +1,5 @@
 from collections import defaultdict
-from typing import Dict
+from typing import Dict, List
 
 from .environment import Environment
 from .errors import CommandError
@@ -17,6 +17,10 @@ class Registry:
     def __init__(self) -> None:
         self._packages: Dict[str, Dict[str, SourcePackage]] = defaultdict(dict)
         """A package registry, keyed by distro, then keyed by package name"""
+        self._previous: Dict[str, Dict[str, str]] = defaultdict(dict)
+        """Versions of binary packages from source packages that were processed in a
+        previous run, keyed by distro, then keyed by binary package name
+        """
 
     def add(self, env: Environment, package: SourcePackage) -> None:
         if package.name in self._packages[env.codename]:
@@ -27,6 +31,19 @@ class Registry:
 
         self._packages[env.codename][package.name] = package
 
+    def add_previous(
+        self, env: Environment, version: str, binary_names: List[str]
+    ) -> None:
+        """Registers the binary packages of a source package that was not processed in
+        this run, but whose previously built packages are still being used.
+
+        :param env: The environment the packages were built in
+        :param version: The version of the source package
+        :param binary_names: The names of the binary packages it provides
+        """
+        for binary_name in binary_names:
+            self._previous[env.codename][binary_name] = version
+
     def make_relation(self, env: Environment, package_name: str) -> Relation:
         source_package = None
         binary_package = None
@@ -37,14 +54,18 @@ class Registry:
                     source_package = source
                     binary_package = binary
 
-        if binary_package is None or source_package is None:
+        if binary_package is not None and source_package is not None:
+            version = source_package.version
+        elif package_name in self._previous[env.codename]:
+            version = self._previous[env.codename][package_name]
+        else:
             raise CommandError(
                 f"Binary package {package_name} has not been added to the registry"
             )
 
         dependency = Dependency(
-            name=binary_package.package,
-            version=source_package.version,
+            name=package_name,
+            version=version,
             relationship="=",
         )
         return Relation([dependency])
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Callable, Optional
 
 from ..environment import Environment
 from ..version import Version
@@ -23,9 +24,64 @@ class Upstream(ABC):
         """
         ...
 
+    def _fetch_with_cache(
+        self, source: Optional[str], fetch_into: Callable[[Path], None]
+    ) -> None:
+        """Fills this package's build directory with fetched source, reusing source
+        fetched by a previous build if the environment has a fetch cache.
+
+        :param source: Identifies where the source is fetched from. Source fetched with
+            the same package name, upstream version, and source is reused. If None,
+            the source can't be identified before it's fetched, so it's never reused.
+        :param fetch_into: Fetches the source into the given directory, laid out like
+            the package's build directory
+        """
+        build_dir = self._package_dir().parent
+        build_dir.mkdir()
+
+        if self.env.fetch_cache is None or source is None:
+            fetch_into(build_dir)
+        else:
+            self.env.fetch_cache.fetch(
+                name=self.name,
+                upstream_version=self.version.upstream_version,
+                source=f"{type(self).__name__}:{source}",
+                fetch_into=fetch_into,
+                destination=build_dir,
+            )
+
+    def _record_identity(self, identity: str, build_dir: Optional[Path] = None) -> None:
+        """Saves a string that uniquely identifies the fetched source, like a Git commit
+        hash. This allows later steps to tell if the source has changed without
+        inspecting it.
+
+        :param identity: The identity string
+        :param build_dir: The directory the source was fetched into. Defaults to this
+            package's build directory.
+        """
+        if build_dir is None:
+            build_dir = self._package_dir().parent
+        identity_file = build_dir / _IDENTITY_FILE_NAME
+        identity_file.write_text(f"{type(self).__name__}:{identity}")
+
     def _package_dir(self) -> Path:
         return (
             self.env.build_root
             / self.name
             / f"{self.name}-{self.version.upstream_version}"
         )
+
+
+def read_upstream_identity(package_dir: Path) -> Optional[str]:
+    """
+    :param package_dir: The directory returned by the upstream's fetch method
+    :return: The identity recorded by the upstream that fetched the directory, or None
+        if the upstream did not record one
+    """
+    identity_file = package_dir.parent / _IDENTITY_FILE_NAME
+    if not identity_file.is_file():
+        return None
+    return identity_file.read_text()
+
+
+_IDENTITY_FILE_NAME = ".debutizer-upstream-identity"
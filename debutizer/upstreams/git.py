@@ -1,6 +1,9 @@
+import re
 import shutil
+import subprocess
+from functools import partial
 from pathlib import Path
-from typing import List, Union
+from typing import List, Optional, Union
 
 from ..commands.utils import make_source_archive
 from ..environment import Environment
@@ -39,6 +42,10 @@ class GitUpstream(Upstream):
 
             Branch names are not recommended since branches do not pin a specific
             revision of the source.
+
+            Fetched source is cached by the commit the revision points to. Short-form
+            hashes can't be resolved without cloning the repository, so source
+            fetched with them is never cached.
         :param recurse_submodules: If True, the repository's submodules will be cloned
             as well
         """
@@ -49,10 +56,68 @@ class GitUpstream(Upstream):
         self.recurse_submodules = recurse_submodules
 
     def fetch(self) -> Path:
-        build_dir = self.env.build_root / self.name
-        build_dir.mkdir()
+        revision_formatted = self.revision.format(
+            upstream_version=self.version.upstream_version
+        )
+        commit = None
+        if self.env.fetch_cache is not None:
+            # Tags and branches can be moved, so the cache is keyed by the commit
+            # instead
+            commit = self._resolve_commit(revision_formatted)
+
+        source = None
+        if commit is not None:
+            source = (
+                f"{self.repository_url}#{commit} submodules={self.recurse_submodules}"
+            )
+            # The commit is checked out instead of the revision, in case the revision
+            # moves before the repository is cloned
+            revision_formatted = commit
+        self._fetch_with_cache(source, partial(self._fetch_into, revision_formatted))
         package_dir = self._package_dir()
 
+        # Copy the debian/ directory, if one is provided
+        debian_path = self.env.package_root / self.name / "debian"
+        if debian_path.is_dir():
+            shutil.copytree(debian_path, package_dir / "debian")
+
+        return package_dir
+
+    def _resolve_commit(self, revision: str) -> Optional[str]:
+        """Finds the commit a revision points to without cloning the repository
+
+        :param revision: A tag name, branch name, or commit hash
+        :return: The full commit hash, or None if the revision is a short-form hash or
+            can't be found
+        """
+        if _FULL_HASH.fullmatch(revision):
+            return revision.lower()
+
+        result = run(
+            # Peeled tags are only listed if asked for explicitly
+            ["git", "ls-remote", self.repository_url, revision, f"{revision}^{{}}"],
+            on_failure=f"Failed to look up revision {revision}",
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+        )
+        refs = {}
+        for line in result.stdout.splitlines():
+            commit, _, ref = line.partition("\t")
+            refs[ref] = commit
+
+        # Annotated tags point to a tag object, which is peeled to get the commit
+        for ref in [
+            f"refs/tags/{revision}^{{}}",
+            f"refs/tags/{revision}",
+            f"refs/heads/{revision}",
+        ]:
+            if ref in refs:
+                return refs[ref]
+        return None
+
+    def _fetch_into(self, revision: str, build_dir: Path) -> None:
+        package_dir = build_dir / self._package_dir().name
+
         clone_command: List[Union[str, Path]] = ["git", "clone"]
         if self.recurse_submodules:
             clone_command.append("--recurse-submodules")
@@ -64,13 +129,22 @@ class GitUpstream(Upstream):
             on_failure="Failed to clone the upstream source",
         )
         # Switch to the specified revision
-        revision_formatted = self.revision.format(
-            upstream_version=self.version.upstream_version
-        )
         run(
-            ["git", "checkout", revision_formatted],
+            ["git", "checkout", revision],
             cwd=package_dir,
-            on_failure=f"Failed to switch to revision {revision_formatted}",
+            on_failure=f"Failed to switch to revision {revision}",
+        )
+        # Tags and branches can be moved, so the commit hash is what identifies the
+        # source
+        result = run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=package_dir,
+            on_failure="Failed to get the current commit hash",
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+        )
+        self._record_identity(
+            f"{self.repository_url}#{result.stdout.strip()}", build_dir
         )
 
         # Remove the Git metadata so it doesn't get packaged
@@ -84,9 +158,5 @@ class GitUpstream(Upstream):
             version=self.version,
         )
 
-        # Copy the debian/ directory, if one is provided
-        debian_path = self.env.package_root / self.name / "debian"
-        if debian_path.is_dir():
-            shutil.copytree(debian_path, package_dir / "debian")
 
-        return package_dir
+_FULL_HASH = re.compile(r"[0-9a-fA-F]{40}")
@@ -3,6 +3,7 @@ from pathlib import Path
 from typing import List, Optional
 
 from ..commands.utils import make_source_archive
+from ..digest import digest_tree
 from ..environment import Environment
 from ..errors import CommandError
 from ..version import Version
@@ -46,6 +47,8 @@ class LocalUpstream(Upstream):
             elif excluded_path.is_file():
                 excluded_path.unlink()
 
+        self._record_identity(digest_tree(package_dir))
+
         # Create the source archive in the previous directory
         make_source_archive(
             package_dir=package_dir,
@@ -8,4 +8,5 @@ class NullUpstream(Upstream):
 
     def fetch(self) -> Path:
         self._package_dir().mkdir()
+        self._record_identity("")
         return self._package_dir()
@@ -17,8 +17,11 @@ class SourcePackageUpstream(Upstream):
         self.dsc_url = dsc_url
 
     def fetch(self) -> Path:
-        build_dir = self.env.build_root / self.name
-        build_dir.mkdir()
+        self._fetch_with_cache(self.dsc_url, self._fetch_into)
+        return self._package_dir()
+
+    def _fetch_into(self, build_dir: Path) -> None:
+        package_dir = build_dir / self._package_dir().name
 
         run(
             ["dget", "--quiet", self.dsc_url],
@@ -26,11 +29,11 @@ class SourcePackageUpstream(Upstream):
             cwd=build_dir,
         )
 
-        if not self._package_dir().is_dir():
-            files_in_dir = list(self._package_dir().parent.iterdir())
+        if not package_dir.is_dir():
+            files_in_dir = list(build_dir.iterdir())
             raise UnexpectedError(
                 f"The dget command did not extract the source tarball in the expected "
                 f"way. Only these files were created: {files_in_dir}."
             )
 
-        return self._package_dir()
+        self._record_identity(self.dsc_url, build_dir)
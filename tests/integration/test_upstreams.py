@@ -30,6 +30,15 @@ def _build_packages(package_dir: Path):
             artifacts_dir=Path(artifacts_dir),
             config_file=Path("unused"),
             shell_on_failure=False,
+            jobs=1,
+            matrix_jobs=1,
+            no_build_cache=True,
+            incremental=False,
+            no_fetch_cache=True,
+            only=None,
+            with_deps=False,
+            keep_going=False,
+            resume=False,
         )
         config = Configuration(
             distributions=["jammy"],
@@ -0,0 +1,64 @@
+import os
+import subprocess
+from pathlib import Path
+
+from debutizer.commands import apt_cache
+from debutizer.commands.apt_cache import AptCache
+
+
+def test_hooks_link_and_save_packages(tmp_path: Path, monkeypatch):
+    archives_dir = tmp_path / "archives"
+    archives_dir.mkdir()
+    monkeypatch.setattr(apt_cache, "_ARCHIVES_DIR", archives_dir)
+    monkeypatch.setattr(apt_cache, "_INSTALLED_BEFORE_FILE", tmp_path / "installed")
+
+    # Pretend to be dpkg-query, listing the packages in a file
+    installed_file = tmp_path / "dpkg-status"
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    dpkg_query = bin_dir / "dpkg-query"
+    dpkg_query.write_text(f"#!/usr/bin/env bash\ncat {installed_file}\n")
+    dpkg_query.chmod(0o755)
+    env = {**os.environ, "PATH": f"{bin_dir}:{os.environ['PATH']}"}
+
+    cache = AptCache(tmp_path / "cache")
+    packages_dir = tmp_path / "cache" / "jammy-amd64"
+    hook_dir = tmp_path / "hooks"
+    hook_dir.mkdir()
+
+    with cache.mount("jammy", "amd64", hook_dir) as flags:
+        assert flags == ["--bindmounts", packages_dir, "--aptcache", ""]
+        (packages_dir / "cached_1.0_all.deb").write_text("cached")
+
+        installed_file.write_text("base_1.0_amd64.deb\n")
+        subprocess.run(["bash", hook_dir / "D80aptcache"], check=True, env=env)
+        assert (archives_dir / "cached_1.0_all.deb").is_symlink()
+
+        # Simulate APT installing one cached package and downloading another, with
+        # an epoch in its version
+        (archives_dir / "new_1%3a2.0_amd64.deb").write_text("new")
+        installed_file.write_text(
+            "base_1.0_amd64.deb\ncached_1.0_all.deb\nnew_1%3a2.0_amd64.deb\n"
+        )
+        subprocess.run(["bash", hook_dir / "A10aptcache"], check=True, env=env)
+
+    assert (packages_dir / "new_1%3a2.0_amd64.deb").read_text() == "new"
+    assert cache._hits == 1
+    assert cache._misses == 1
+    assert list((packages_dir / ".stats").iterdir()) == []
+
+
+def test_eviction_is_least_recently_used(tmp_path: Path):
+    packages_dir = tmp_path / "jammy-amd64"
+    packages_dir.mkdir()
+    for i, name in enumerate(["old.deb", "recent.deb", "newest.deb"]):
+        package = packages_dir / name
+        package.write_text("1234")
+        os.utime(package, (i, i))
+
+    AptCache(tmp_path, max_size=8).evict()
+
+    assert sorted(p.name for p in packages_dir.iterdir()) == [
+        "newest.deb",
+        "recent.deb",
+    ]
@@ -0,0 +1,102 @@
+import os
+import time
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from threading import Thread
+
+import pytest
+import requests
+
+from debutizer.commands.apt_proxy import AptProxy
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def mirror(tmp_path: Path):
+    """Serves the files in a directory, like a mirror"""
+    mirror_dir = tmp_path / "mirror"
+    mirror_dir.mkdir()
+    server = HTTPServer(
+        ("127.0.0.1", 0), partial(_QuietHandler, directory=str(mirror_dir))
+    )
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield mirror_dir, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _get_through(proxy: AptProxy, url: str) -> requests.Response:
+    return requests.get(url, proxies={"http": proxy.url})
+
+
+def test_pool_files_are_cached_permanently(tmp_path: Path, mirror):
+    mirror_dir, mirror_url = mirror
+    (mirror_dir / "pool").mkdir()
+    (mirror_dir / "pool" / "example_1.0_all.deb").write_text("package")
+
+    proxy = AptProxy(tmp_path / "cache", index_ttl=0)
+    proxy.start()
+    try:
+        url = f"{mirror_url}/pool/example_1.0_all.deb"
+        assert _get_through(proxy, url).text == "package"
+
+        (mirror_dir / "pool" / "example_1.0_all.deb").unlink()
+        assert _get_through(proxy, url).text == "package"
+    finally:
+        proxy.close()
+
+    assert proxy._hits == 1
+    assert proxy._misses == 1
+
+
+def test_indexes_are_downloaded_again_after_ttl(tmp_path: Path, mirror):
+    mirror_dir, mirror_url = mirror
+    (mirror_dir / "dists").mkdir()
+    (mirror_dir / "dists" / "Release").write_text("old")
+
+    proxy = AptProxy(tmp_path / "cache", index_ttl=0)
+    proxy.start()
+    try:
+        url = f"{mirror_url}/dists/Release"
+        assert _get_through(proxy, url).text == "old"
+
+        # The mirror reports the new file as modified after the old one
+        (mirror_dir / "dists" / "Release").write_text("new")
+        later = time.time() + 60
+        os.utime(mirror_dir / "dists" / "Release", (later, later))
+        assert _get_through(proxy, url).text == "new"
+
+        response = _get_through(proxy, f"{mirror_url}/dists/missing")
+        assert response.status_code == 404
+    finally:
+        proxy.close()
+
+
+def test_eviction_is_least_recently_used(tmp_path: Path, mirror):
+    mirror_dir, mirror_url = mirror
+    (mirror_dir / "pool").mkdir()
+    for name in ["old.deb", "new.deb"]:
+        (mirror_dir / "pool" / name).write_text(name)
+
+    proxy = AptProxy(tmp_path / "cache", max_size=len("new.deb"))
+    proxy.start()
+    try:
+        _get_through(proxy, f"{mirror_url}/pool/old.deb")
+        _get_through(proxy, f"{mirror_url}/pool/new.deb")
+    finally:
+        proxy.close()
+
+    objects_dir = tmp_path / "cache" / "objects"
+    for object_path in objects_dir.iterdir():
+        if object_path.read_text() == "old.deb":
+            os.utime(object_path, (0, 0))
+    proxy.evict()
+
+    assert [p.read_text() for p in objects_dir.iterdir()] == ["new.deb"]
@@ -0,0 +1,110 @@
+from pathlib import Path
+
+from debutizer.commands.artifacts_manifest import ArtifactsManifest, PackageDefinition
+from debutizer.environment import Environment
+
+
+def test_replace_deletes_old_artifacts(tmp_path: Path):
+    env = _env(tmp_path, "amd64")
+    manifest = ArtifactsManifest(tmp_path)
+
+    old_files = _touch(
+        tmp_path, "mypackage_1.0.0-1_amd64.deb", "mypackage_1.0.0.orig.tar.gz"
+    )
+    manifest.replace(env, "mypackage", "key1", old_files)
+    assert manifest.is_current(env, "mypackage", "key1")
+    assert not manifest.is_current(env, "mypackage", "key2")
+
+    new_files = _touch(
+        tmp_path, "mypackage_1.0.0-2_amd64.deb", "mypackage_1.0.0.orig.tar.gz"
+    )
+    deleted = manifest.replace(env, "mypackage", "key2", new_files)
+
+    # The source archive is shared between both versions, so it is kept
+    assert deleted == [old_files[0]]
+    assert all(f.is_file() for f in new_files)
+    assert manifest.is_current(env, "mypackage", "key2")
+
+
+def test_shared_artifacts_are_kept(tmp_path: Path):
+    amd64_env = _env(tmp_path, "amd64")
+    arm64_env = _env(tmp_path, "arm64")
+    manifest = ArtifactsManifest(tmp_path)
+
+    dsc_files = _touch(tmp_path, "mypackage_1.0.0-1.dsc")
+    manifest.replace(amd64_env, "mypackage", "key", dsc_files)
+    manifest.replace(arm64_env, "mypackage", "key", dsc_files)
+
+    assert manifest.prune(amd64_env, keep=[]) == []
+    assert dsc_files[0].is_file()
+    assert manifest.prune(arm64_env, keep=[]) == dsc_files
+    assert not dsc_files[0].is_file()
+
+
+def test_manifest_is_persisted(tmp_path: Path):
+    env = _env(tmp_path, "amd64")
+
+    manifest = ArtifactsManifest(tmp_path)
+    manifest.replace(env, "mypackage", "key", _touch(tmp_path, "mypackage.deb"))
+    manifest.save()
+
+    assert ArtifactsManifest(tmp_path).is_current(env, "mypackage", "key")
+
+    (tmp_path / "mypackage.deb").unlink()
+    assert not ArtifactsManifest(tmp_path).is_current(env, "mypackage", "key")
+
+
+def test_definitions_are_persisted(tmp_path: Path):
+    env = _env(tmp_path, "amd64")
+    definition = PackageDefinition(
+        name="mypackage",
+        directory="mypackage-dir",
+        version="1.0.0-1",
+        binaries=["mypackage"],
+        build_depends=["debhelper"],
+    )
+
+    manifest = ArtifactsManifest(tmp_path)
+    manifest.record_definitions(env, [definition], existing=["mypackage-dir"])
+    manifest.save()
+
+    definitions = ArtifactsManifest(tmp_path).definitions(env)
+    assert list(definitions.keys()) == ["mypackage"]
+    assert definitions["mypackage"].to_dict() == definition.to_dict()
+    assert ArtifactsManifest(tmp_path).definitions(_env(tmp_path, "arm64")) == {}
+
+    # Definitions of packages whose directories are gone are forgotten
+    manifest.record_definitions(env, [], existing=["other-dir"])
+    assert manifest.definitions(env) == {}
+
+
+def test_interrupted_run_is_detected(tmp_path: Path):
+    manifest = ArtifactsManifest(tmp_path)
+    assert manifest.interrupted_run() is None
+
+    manifest.begin_run("inputs")
+    manifest.save()
+    assert ArtifactsManifest(tmp_path).interrupted_run() == "inputs"
+
+    manifest.finish_run()
+    manifest.save()
+    assert ArtifactsManifest(tmp_path).interrupted_run() is None
+
+
+def _env(artifacts_dir: Path, architecture: str) -> Environment:
+    return Environment(
+        codename="jammy",
+        architecture=architecture,
+        package_root=Path("whatever"),
+        build_root=Path("something"),
+        artifacts_root=artifacts_dir,
+    )
+
+
+def _touch(directory: Path, *names: str):
+    paths = []
+    for name in names:
+        path = directory / name
+        path.write_text(name)
+        paths.append(path)
+    return paths
@@ -0,0 +1,83 @@
+import os
+import time
+from pathlib import Path
+
+from debutizer.commands.build_cache import BuildCache
+from debutizer.digest import digest_tree
+
+
+def test_store_and_restore(tmp_path: Path):
+    results_dir = tmp_path / "results"
+    results_dir.mkdir()
+    (results_dir / "mypackage_1.0.0-1.dsc").write_text("dsc")
+    (results_dir / "mypackage_1.0.0-1_amd64.deb").write_text("deb")
+    (results_dir / "build.log").write_text("not an output")
+
+    cache = BuildCache(tmp_path / "cache")
+    assert cache.restore("abcdef") is None
+
+    cache.store("abcdef", [results_dir, results_dir])
+
+    cached_dir = cache.restore("abcdef")
+    assert cached_dir is not None
+    assert sorted(p.name for p in cached_dir.iterdir()) == [
+        "mypackage_1.0.0-1.dsc",
+        "mypackage_1.0.0-1_amd64.deb",
+    ]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path):
+    results_dir = tmp_path / "results"
+    results_dir.mkdir()
+    (results_dir / "mypackage_1.0.0-1_amd64.deb").write_bytes(b"0" * 1000)
+
+    cache = BuildCache(tmp_path / "cache", max_size=2500)
+    now = time.time()
+    for i, key in enumerate(["aa1111", "bb2222", "cc3333", "dd4444"]):
+        cache.store(key, [results_dir])
+        entry_dir = cache.restore(key)
+        assert entry_dir is not None
+        os.utime(entry_dir, (now - 100 + i, now - 100 + i))
+
+    cache.evict()
+
+    assert cache.restore("aa1111") is None
+    assert cache.restore("bb2222") is None
+    assert cache.restore("cc3333") is not None
+    assert cache.restore("dd4444") is not None
+
+
+def test_old_entries_are_evicted(tmp_path: Path):
+    results_dir = tmp_path / "results"
+    results_dir.mkdir()
+    (results_dir / "mypackage_1.0.0-1_amd64.deb").write_text("deb")
+
+    cache = BuildCache(tmp_path / "cache", max_age=60)
+    cache.store("aa1111", [results_dir])
+    cache.store("bb2222", [results_dir])
+    old_entry = cache.restore("aa1111")
+    assert old_entry is not None
+    os.utime(old_entry, (time.time() - 120, time.time() - 120))
+
+    cache.evict()
+
+    assert cache.restore("aa1111") is None
+    assert cache.restore("bb2222") is not None
+
+
+def test_tree_digest_follows_content(tmp_path: Path):
+    tree = tmp_path / "tree"
+    (tree / "debian").mkdir(parents=True)
+    (tree / "debian" / "control").write_text("Source: mypackage\n")
+
+    original = digest_tree(tree)
+    assert digest_tree(tree) == original
+
+    (tree / "debian" / "control").write_text("Source: otherpackage\n")
+    assert digest_tree(tree) != original
+
+    (tree / "debian" / "control").write_text("Source: mypackage\n")
+    assert digest_tree(tree) == original
+
+    (tree / "debian" / "rules").write_text("")
+    assert digest_tree(tree) != original
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from debutizer.commands.build_durations import BuildDurations, format_duration
+from debutizer.environment import Environment
+
+
+def test_durations_are_persisted(tmp_path: Path):
+    history_file = tmp_path / "durations.json"
+    focal = _env("focal")
+    jammy = _env("jammy")
+
+    durations = BuildDurations(history_file)
+    assert durations.estimate(focal, "mypackage") is None
+    durations.record(focal, "mypackage", 100)
+    durations.save()
+
+    durations = BuildDurations(history_file)
+    assert durations.estimate(focal, "mypackage") == 100
+    assert durations.estimate(jammy, "mypackage") is None
+
+    # New durations are averaged with previous ones
+    durations.record(focal, "mypackage", 200)
+    assert durations.estimate(focal, "mypackage") == 150
+
+
+def test_format_duration():
+    assert format_duration(42.4) == "42s"
+    assert format_duration(125) == "2m 5s"
+    assert format_duration(3 * 60 * 60 + 61) == "3h 1m"
+
+
+def _env(codename: str) -> Environment:
+    return Environment(
+        codename=codename,
+        architecture="amd64",
+        package_root=Path("whatever"),
+        build_root=Path("something"),
+        artifacts_root=Path("artifacts"),
+    )
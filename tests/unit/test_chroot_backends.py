@@ -0,0 +1,22 @@
+from debutizer.commands.chroot_backends import TgzChrootBackend, abstract
+
+
+def test_host_architecture_chroots_use_debootstrap(monkeypatch):
+    monkeypatch.setattr(abstract, "host_architecture", lambda: "amd64")
+
+    chroot = TgzChrootBackend("jammy", "amd64")
+
+    assert chroot.create_flags() == ["--architecture", "amd64"]
+
+
+def test_foreign_architecture_chroots_use_qemu(monkeypatch):
+    monkeypatch.setattr(abstract, "host_architecture", lambda: "amd64")
+
+    chroot = TgzChrootBackend("jammy", "arm64")
+
+    assert chroot.create_flags() == [
+        "--architecture",
+        "arm64",
+        "--debootstrap",
+        "qemu-debootstrap",
+    ]
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from debutizer.commands import chroot_metadata
+from debutizer.commands.chroot_metadata import (
+    chroot_digest,
+    chroot_freshness,
+    chroot_setup,
+    record_chroot_created,
+    record_chroot_refreshed,
+    record_chroot_setup,
+)
+
+
+def test_setup_and_creation_keep_digest(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(chroot_metadata, "_records_file", lambda: tmp_path / "r.json")
+    archive = tmp_path / "chroot.tgz"
+    archive.write_text("base system")
+
+    digest = chroot_digest(archive)
+    assert chroot_freshness(archive) is None
+
+    archive.write_text("base system with tools")
+    record_chroot_setup(archive, "setup")
+    record_chroot_created(archive, "snapshot")
+
+    assert chroot_digest(archive) == digest
+    assert chroot_setup(archive) == "setup"
+    freshness = chroot_freshness(archive)
+    assert freshness is not None
+    assert freshness.index_snapshot == "snapshot"
+    assert freshness.age() < 60
+
+
+def test_refresh_changes_digest(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(chroot_metadata, "_records_file", lambda: tmp_path / "r.json")
+    chroot = tmp_path / "chroot.cow"
+    status_file = chroot / "var" / "lib" / "dpkg" / "status"
+    status_file.parent.mkdir(parents=True)
+    status_file.write_text("Package: old")
+
+    digest = chroot_digest(chroot)
+    record_chroot_setup(chroot, "setup")
+
+    status_file.write_text("Package: new")
+    record_chroot_refreshed(chroot, "setup", "new snapshot")
+
+    assert chroot_digest(chroot) != digest
+    assert chroot_setup(chroot) == "setup"
+    freshness = chroot_freshness(chroot)
+    assert freshness is not None
+    assert freshness.index_snapshot == "new snapshot"
+
+    # A chroot that changes some other way loses its metadata
+    status_file.write_text("Package: recreated")
+    assert chroot_setup(chroot) is None
+    assert chroot_freshness(chroot) is None
@@ -0,0 +1,69 @@
+from threading import Event
+from typing import List, Tuple
+
+from debutizer.commands import chroot_refresh
+from debutizer.commands.chroot_refresh import BackgroundRefresher
+
+
+class _FakeChroot:
+    def __init__(self, name: str, removed: List[str]):
+        self.base_path = name
+        self._removed = removed
+
+    def remove(self) -> None:
+        self._removed.append(self.base_path)
+
+
+def _start(
+    monkeypatch, release: Event
+) -> Tuple[BackgroundRefresher, List[str], List[str]]:
+    """Starts refreshing a chroot, where the refresh finishes once the event is set
+
+    :return: The refresher, and the chroots that were removed and swapped in
+    """
+    removed: List[str] = []
+    finished: List[str] = []
+
+    def prepare_refresh(chroot: _FakeChroot) -> Tuple[_FakeChroot, str]:
+        release.wait(timeout=5)
+        return _FakeChroot(f"{chroot.base_path}-refresh", removed), "snapshot"
+
+    monkeypatch.setattr(chroot_refresh, "prepare_refresh", prepare_refresh)
+    monkeypatch.setattr(chroot_refresh, "chroot_freshness", lambda path: None)
+    monkeypatch.setattr(
+        chroot_refresh,
+        "finish_refresh",
+        lambda chroot, refreshed, snapshot: finished.append(refreshed.base_path),
+    )
+
+    refresher = BackgroundRefresher(max_age=0)
+    refresher.start(_FakeChroot("jammy", removed))
+    return refresher, removed, finished
+
+
+def test_finish_swaps_refreshed_chroots_in(monkeypatch):
+    release = Event()
+    release.set()
+    refresher, removed, finished = _start(monkeypatch, release)
+
+    refresher.finish()
+
+    assert finished == ["jammy-refresh"]
+    assert removed == []
+
+
+def test_abandon_does_not_wait_for_refreshes(monkeypatch):
+    release = Event()
+    refresher, removed, finished = _start(monkeypatch, release)
+    (refresh,) = refresher._refreshes
+
+    # Returns while the refresh is still running
+    refresher.abandon()
+    assert refresh.is_alive()
+
+    release.set()
+    refresh.join(timeout=5)
+    assert removed == ["jammy-refresh"]
+
+    refresher.finish()
+    assert finished == []
@@ -30,6 +30,23 @@ def test_cleanup_hooks_ignore_errors():
     command.run()
 
 
+def test_cleanup_hooks_run_after_a_failing_hook():
+    hook_run = Event()
+
+    class FailingCommand(NoArgsCommand):
+        def behavior(self, args: argparse.Namespace) -> None:
+            self.cleanup_hooks.append(self._do_failing_action)
+            self.cleanup_hooks.append(hook_run.set)
+
+        def _do_failing_action(self) -> None:
+            raise RuntimeError("Oh no!")
+
+    command = FailingCommand()
+    command.run()
+
+    assert hook_run.is_set()
+
+
 class NoArgsCommand(Command, ABC):
     """A version of Command that avoids defining an ArgumentParser, since that messes
     with pytest's own ArgumentParser.
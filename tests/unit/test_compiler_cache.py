@@ -0,0 +1,35 @@
+import subprocess
+from pathlib import Path
+
+from debutizer.commands import compiler_cache
+from debutizer.commands.compiler_cache import CompilerCache
+
+
+def test_build_stats_are_counted(tmp_path: Path, monkeypatch):
+    stats_log = tmp_path / "stats.log"
+    monkeypatch.setattr(compiler_cache, "_STATS_LOG", stats_log)
+
+    cache = CompilerCache(tmp_path / "cache", max_size=512 * 1024 * 1024)
+    hook_dir = tmp_path / "hooks"
+    hook_dir.mkdir()
+
+    with cache.mount("jammy", "amd64", hook_dir, "mypackage") as flags:
+        config = flags[1].read_text()
+        assert f"CCACHEDIR={tmp_path / 'cache' / 'jammy-amd64'}" in config
+        assert "CCACHE_MAXSIZE=512M" in config
+
+        stats_log.write_text(
+            "# main.c\ndirect_cache_hit\n"
+            "# util.c\npreprocessed_cache_hit\n"
+            "# new.c\ncache_miss\n"
+        )
+        subprocess.run(["bash", hook_dir / "B10ccache"], check=True)
+
+    assert cache._hits == 2
+    assert cache._misses == 1
+
+    # Nothing is counted if ccache didn't log statistics
+    stats_log.unlink()
+    with cache.mount("jammy", "amd64", hook_dir, "mypackage"):
+        subprocess.run(["bash", hook_dir / "B10ccache"], check=True)
+    assert cache._hits == 2
@@ -1,6 +1,7 @@
 import pytest
 
 from debutizer.commands.config_file import (
+    ChrootConfiguration,
     CredentialsYAMLError,
     DebutizerYAMLError,
     S3UploadTargetConfiguration,
@@ -29,3 +30,19 @@ def test_s3_configuration_validity():
     config.gpg_signing_key = None
     with pytest.raises(DebutizerYAMLError):
         config.check_validity()
+
+
+def test_chroot_configuration_validity():
+    assert ChrootConfiguration.from_dict({}).backend == "tgz"
+    assert (
+        ChrootConfiguration.from_dict({"backend": "overlayfs"}).backend == "overlayfs"
+    )
+
+    with pytest.raises(DebutizerYAMLError):
+        ChrootConfiguration.from_dict({"backend": "docker"})
+    with pytest.raises(DebutizerYAMLError):
+        ChrootConfiguration.from_dict({"max_age": -1})
+    with pytest.raises(DebutizerYAMLError):
+        ChrootConfiguration.from_dict({"io_light": True, "tmpfs_size": 0})
+    with pytest.raises(DebutizerYAMLError):
+        ChrootConfiguration.from_dict({"apt_proxy_size": 1024, "apt_proxy_ttl": -1})
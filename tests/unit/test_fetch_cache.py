@@ -0,0 +1,51 @@
+from pathlib import Path
+from typing import List
+
+from debutizer.fetch_cache import FetchCache
+
+
+def test_source_is_fetched_once(tmp_path: Path):
+    cache = FetchCache(tmp_path / "cache")
+    fetches: List[Path] = []
+
+    def fetch_into(build_dir: Path) -> None:
+        fetches.append(build_dir)
+        (build_dir / "mypackage-1.0.0").mkdir()
+        (build_dir / "mypackage-1.0.0" / "main.c").write_text("int main() {}")
+        (build_dir / "mypackage_1.0.0.orig.tar.gz").write_text("archive")
+
+    for distro in ["focal", "jammy"]:
+        destination = tmp_path / distro
+        destination.mkdir()
+        cache.fetch("mypackage", "1.0.0", "some-url", fetch_into, destination)
+
+        assert (destination / "mypackage-1.0.0" / "main.c").is_file()
+        assert (destination / "mypackage_1.0.0.orig.tar.gz").is_file()
+
+    assert len(fetches) == 1
+
+    # A different source is a different entry
+    other_destination = tmp_path / "other"
+    other_destination.mkdir()
+    cache.fetch("mypackage", "1.0.0", "other-url", fetch_into, other_destination)
+    assert len(fetches) == 2
+
+
+def test_eviction_to_size(tmp_path: Path):
+    cache = FetchCache(tmp_path / "cache", max_size=0)
+    fetches: List[Path] = []
+
+    def fetch_into(build_dir: Path) -> None:
+        fetches.append(build_dir)
+        (build_dir / "file").write_text("contents")
+
+    destination = tmp_path / "destination"
+    destination.mkdir()
+    cache.fetch("mypackage", "1.0.0", "some-url", fetch_into, destination)
+    cache.evict()
+    # Nothing is left behind, including the entry's lock file
+    assert list((tmp_path / "cache").iterdir()) == []
+
+    (destination / "file").unlink()
+    cache.fetch("mypackage", "1.0.0", "some-url", fetch_into, destination)
+    assert len(fetches) == 2
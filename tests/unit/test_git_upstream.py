@@ -0,0 +1,114 @@
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from debutizer.environment import Environment
+from debutizer.fetch_cache import FetchCache
+from debutizer.upstreams.git import GitUpstream
+from debutizer.version import Version
+
+
+def _git(repo: Path, *args: str) -> str:
+    result = subprocess.run(
+        ["git", "-C", str(repo), *args],
+        check=True,
+        stdout=subprocess.PIPE,
+        encoding="utf-8",
+    )
+    return result.stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "--initial-branch", "main")
+    _git(repo, "config", "user.name", "Test")
+    _git(repo, "config", "user.email", "test@example.com")
+    (repo / "file").write_text("1")
+    _git(repo, "add", "file")
+    _git(repo, "commit", "--message", "First")
+    _git(repo, "tag", "--annotate", "v1.0.0", "--message", "Release")
+    return repo
+
+
+def _upstream(
+    tmp_path: Path,
+    repo: Path,
+    revision: str,
+    fetch_cache: Optional[FetchCache] = None,
+) -> GitUpstream:
+    env = Environment(
+        codename="jammy",
+        architecture="amd64",
+        package_root=tmp_path,
+        build_root=tmp_path,
+        artifacts_root=tmp_path,
+        fetch_cache=fetch_cache,
+    )
+    return GitUpstream(
+        env=env,
+        name="example",
+        version=Version.from_string("1.0.0-1"),
+        repository_url=str(repo),
+        revision=revision,
+    )
+
+
+def test_revisions_resolve_to_commits(tmp_path: Path, repo: Path):
+    first = _git(repo, "rev-parse", "HEAD")
+
+    assert _upstream(tmp_path, repo, "v1.0.0")._resolve_commit("v1.0.0") == first
+    assert _upstream(tmp_path, repo, "main")._resolve_commit("main") == first
+    assert _upstream(tmp_path, repo, first)._resolve_commit(first) == first
+    # Short hashes can't be resolved without a clone
+    assert _upstream(tmp_path, repo, first[:7])._resolve_commit(first[:7]) is None
+
+
+def test_moved_branches_resolve_to_the_new_commit(tmp_path: Path, repo: Path):
+    upstream = _upstream(tmp_path, repo, "main")
+    first = upstream._resolve_commit("main")
+
+    (repo / "file").write_text("2")
+    _git(repo, "commit", "--all", "--message", "Second")
+
+    second = upstream._resolve_commit("main")
+    assert second != first
+    assert second == _git(repo, "rev-parse", "HEAD")
+
+
+def test_revisions_are_not_resolved_without_a_cache(
+    tmp_path: Path, repo: Path, monkeypatch
+):
+    upstream = _upstream(tmp_path, repo, "main")
+
+    def no_ls_remote(revision: str) -> Optional[str]:
+        raise AssertionError("Revisions should only be resolved for the cache")
+
+    monkeypatch.setattr(upstream, "_resolve_commit", no_ls_remote)
+
+    package_dir = upstream.fetch()
+
+    assert (package_dir / "file").read_text() == "1"
+
+
+def test_the_resolved_commit_is_fetched(tmp_path: Path, repo: Path, monkeypatch):
+    upstream = _upstream(
+        tmp_path, repo, "main", fetch_cache=FetchCache(tmp_path / "cache")
+    )
+    resolve_commit = upstream._resolve_commit
+
+    def resolve_then_move(revision: str) -> Optional[str]:
+        commit = resolve_commit(revision)
+        # The branch moves between resolving the commit and cloning the repository
+        (repo / "file").write_text("2")
+        _git(repo, "commit", "--all", "--message", "Second")
+        return commit
+
+    monkeypatch.setattr(upstream, "_resolve_commit", resolve_then_move)
+
+    package_dir = upstream.fetch()
+
+    assert (package_dir / "file").read_text() == "1"
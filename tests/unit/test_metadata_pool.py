@@ -0,0 +1,149 @@
+import hashlib
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Iterator, List
+
+import pytest
+from debian.deb822 import Release
+
+from debutizer.commands.repo_metadata import (
+    add_metadata_files,
+    pool,
+    update_metadata,
+    utils,
+)
+
+
+def _make_dsc(source_dir: Path, name: str, version: str) -> Path:
+    dsc_file = source_dir / f"{name}_{version}.dsc"
+    dsc_file.write_text(
+        f"Format: 3.0 (native)\n"
+        f"Source: {name}\n"
+        f"Version: {version}\n"
+        f"Files:\n"
+        f" {'a' * 32} 1000 {name}_{version}.tar.xz\n"
+    )
+    return dsc_file
+
+
+@pytest.fixture
+def artifacts_dir(tmp_path: Path, monkeypatch) -> Path:
+    # Only affects work done in this process. Worker processes are started fresh, so
+    # tests that use them disable the stanza cache instead.
+    monkeypatch.setattr(utils, "_stanza_cache_dir", lambda: tmp_path / "stanzas")
+    artifacts_dir = tmp_path / "artifacts"
+    for distribution in ["focal", "jammy"]:
+        for dir_ in ["binary-amd64", "binary-arm64", "source"]:
+            (artifacts_dir / "dists" / distribution / "main" / dir_).mkdir(parents=True)
+    return artifacts_dir
+
+
+@pytest.fixture
+def held_lock() -> Iterator[Lock]:
+    """A lock that another thread holds for the duration of the test, like the locks
+    held by build threads while metadata is generated
+    """
+    lock = Lock()
+    acquired = Event()
+    release = Event()
+
+    def hold() -> None:
+        with lock:
+            acquired.set()
+            release.wait(timeout=30)
+
+    thread = Thread(target=hold, daemon=True)
+    thread.start()
+    acquired.wait(timeout=5)
+    yield lock
+    release.set()
+    thread.join()
+
+
+def _add_metadata_files(artifacts_dir: Path) -> List[Path]:
+    return add_metadata_files(
+        artifacts_dir,
+        sign=False,
+        gpg_key_id=None,
+        gpg_signing_key=None,
+        gpg_signing_password=None,
+        stanza_cache=False,
+    )
+
+
+def _release(artifacts_dir: Path, distribution: str) -> Release:
+    with (artifacts_dir / "dists" / distribution / "Release").open("r") as f:
+        return Release(f)
+
+
+def test_every_distribution_gets_metadata(artifacts_dir: Path, monkeypatch):
+    monkeypatch.setattr(pool, "host_cpu_count", lambda: 4)
+    for distribution in ["focal", "jammy"]:
+        _make_dsc(artifacts_dir / "dists" / distribution / "main" / "source", "a", "1")
+
+    metadata_files = _add_metadata_files(artifacts_dir)
+
+    relative = [str(f.relative_to(artifacts_dir / "dists")) for f in metadata_files]
+    # Index files come before Release files
+    assert relative[-2:] == ["focal/Release", "jammy/Release"]
+    assert len(relative) == 2 * 3 * 2 + 2
+
+    for distribution in ["focal", "jammy"]:
+        release = _release(artifacts_dir, distribution)
+        assert set(release["Architectures"].split()) == {"amd64", "arm64"}
+        assert len(release["SHA256"]) == 6
+        for entry in release["SHA256"]:
+            path = artifacts_dir / "dists" / distribution / entry["name"]
+            assert entry["sha256"] == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_workers_do_not_inherit_held_locks(artifacts_dir: Path, monkeypatch):
+    # Makes sure a pool is used, even on a host with one CPU
+    monkeypatch.setattr(pool, "host_cpu_count", lambda: 4)
+
+    # A worker forked from this process would inherit the digest lock in its held
+    # state, and block forever the first time it saves a metadata file
+    utils._digests_lock.acquire()
+    try:
+        result: List[List[Path]] = []
+        thread = Thread(
+            target=lambda: result.append(_add_metadata_files(artifacts_dir)),
+            daemon=True,
+        )
+        thread.start()
+        thread.join(timeout=60)
+        assert not thread.is_alive(), "Metadata generation deadlocked"
+    finally:
+        utils._digests_lock.release()
+
+    assert len(result[0]) == 2 * 3 * 2 + 2
+
+
+def test_update_runs_inline_while_a_lock_is_held(
+    artifacts_dir: Path, held_lock: Lock, monkeypatch
+):
+    _add_metadata_files(artifacts_dir)
+    source_dir = artifacts_dir / "dists" / "jammy" / "main" / "source"
+    dsc_file = _make_dsc(source_dir, "a", "1")
+
+    def no_pool(method: str) -> None:
+        raise AssertionError("Incremental updates should not start processes")
+
+    monkeypatch.setattr(pool.multiprocessing, "get_context", no_pool)
+
+    metadata_files = update_metadata(artifacts_dir, [dsc_file])
+
+    assert held_lock.locked()
+    assert metadata_files == [
+        source_dir / "Sources",
+        source_dir / "Sources.gz",
+        artifacts_dir / "dists" / "jammy" / "Release",
+    ]
+    (entry,) = [
+        e
+        for e in _release(artifacts_dir, "jammy")["SHA256"]
+        if e["name"].endswith("Sources")
+    ]
+    sources = (source_dir / "Sources").read_bytes()
+    assert b"Package: a" in sources
+    assert entry["sha256"] == hashlib.sha256(sources).hexdigest()
@@ -0,0 +1,82 @@
+from typing import Dict, List, Tuple
+
+import pytest
+
+from debutizer.commands.package_graph import PackageGraph
+from debutizer.errors import CommandError
+
+
+def test_dependencies_come_first():
+    graph = _graph(
+        {
+            "app": (["app"], ["libfoo-dev", "libbar-dev", "python3"]),
+            "foo": (["libfoo", "libfoo-dev"], ["libbase-dev"]),
+            "bar": (["libbar", "libbar-dev"], ["libbase-dev"]),
+            "base": (["libbase", "libbase-dev"], []),
+        }
+    )
+
+    assert graph.dependencies()["app"] == {"foo", "bar"}
+    assert graph.dependents()["base"] == {"foo", "bar"}
+    assert graph.order() == ["base", "foo", "bar", "app"]
+
+
+def test_independent_packages_keep_their_order():
+    graph = _graph({"c": (["c"], []), "a": (["a"], []), "b": (["b"], [])})
+
+    assert graph.order() == ["c", "a", "b"]
+
+
+def test_closure():
+    graph = _graph(
+        {
+            "app": (["app"], ["libfoo-dev"]),
+            "tool": (["tool"], ["libbar-dev"]),
+            "foo": (["libfoo-dev"], ["libbase-dev"]),
+            "bar": (["libbar-dev"], []),
+            "base": (["libbase-dev"], []),
+        }
+    )
+
+    assert graph.closure(["foo"]) == {"foo", "app"}
+    assert graph.closure(["foo"], with_dependencies=True) == {"foo", "app", "base"}
+    assert graph.closure(["bar", "base"]) == {"bar", "tool", "base", "foo", "app"}
+
+
+def test_cycles_are_reported():
+    graph = _graph(
+        {
+            "a": (["a"], ["b"]),
+            "b": (["b"], ["c"]),
+            "c": (["c"], ["a"]),
+            "d": (["d"], ["d"]),
+            "user": (["user"], ["a"]),
+        }
+    )
+
+    cycles = graph.cycles()
+    assert len(cycles) == 2
+    assert sorted(cycles[0]) == ["a", "b", "c"] or sorted(cycles[1]) == ["a", "b", "c"]
+    assert ["d"] in cycles
+
+    with pytest.raises(CommandError) as ex:
+        graph.order()
+    assert "d -> d" in str(ex.value)
+    assert "user" not in str(ex.value)
+
+
+def test_long_chains_are_supported():
+    count = 5000
+    packages = {f"p{i}": ([f"p{i}"], [f"p{i + 1}"]) for i in range(count)}
+    packages[f"p{count - 1}"] = ([f"p{count - 1}"], ["p0"])
+    graph = _graph(packages)
+
+    assert len(graph.cycles()) == 1
+    assert len(graph.cycles()[0]) == count
+
+
+def _graph(packages: Dict[str, Tuple[List[str], List[str]]]) -> PackageGraph[str]:
+    graph: PackageGraph[str] = PackageGraph()
+    for name, (binaries, build_depends) in packages.items():
+        graph.add(name, name=name, binaries=binaries, build_depends=build_depends)
+    return graph
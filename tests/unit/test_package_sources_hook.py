@@ -0,0 +1,54 @@
+import subprocess
+from pathlib import Path
+
+from debutizer.commands import utils
+from debutizer.commands.config_file import PackageSourceConfiguration
+
+
+def test_hook_writes_sources_and_keys(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(utils, "_APT_LIST", tmp_path / "debutizer.list")
+    monkeypatch.setattr(utils, "_APT_KEY_DIR", tmp_path)
+    monkeypatch.setattr(
+        utils, "_fetch_gpg_key", lambda url: b"-----BEGIN PGP PUBLIC KEY BLOCK-----"
+    )
+
+    package_sources = [
+        PackageSourceConfiguration(entry="deb http://example.com jammy main"),
+        PackageSourceConfiguration(
+            entry="deb https://example.org jammy main",
+            gpg_key_url="https://example.org/key.asc",
+        ),
+    ]
+    hook = tmp_path / "D10sources"
+    hook.write_text(utils.package_sources_hook(package_sources))
+    subprocess.run(["bash", hook], check=True)
+
+    assert (tmp_path / "debutizer.list").read_text() == (
+        "deb http://example.com jammy main\ndeb https://example.org jammy main\n"
+    )
+    assert (tmp_path / "debutizer-1.asc").read_bytes() == (
+        b"-----BEGIN PGP PUBLIC KEY BLOCK-----"
+    )
+    assert not (tmp_path / "debutizer-0.asc").exists()
+
+
+def test_hook_writes_local_source_separately(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(utils, "_APT_LIST", tmp_path / "debutizer.list")
+    monkeypatch.setattr(utils, "_LOCAL_APT_LIST", tmp_path / "debutizer-local.list")
+
+    local_package_source = PackageSourceConfiguration(
+        entry="deb [trusted=yes] http://localhost:8080 jammy main"
+    )
+    hook = tmp_path / "D10sources"
+    hook.write_text(utils.package_sources_hook([], local_package_source))
+    subprocess.run(["bash", hook], check=True)
+
+    assert (tmp_path / "debutizer.list").read_text() == ""
+    assert (tmp_path / "debutizer-local.list").read_text() == (
+        "deb [trusted=yes] http://localhost:8080 jammy main\n"
+    )
+
+    hook.write_text(utils.package_sources_hook([]))
+    subprocess.run(["bash", hook], check=True)
+
+    assert not (tmp_path / "debutizer-local.list").exists()
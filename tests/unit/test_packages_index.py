@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import io
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from debutizer.commands.repo_metadata import add_packages_files, packages, utils
+from debutizer.commands.repo_metadata.packages import (
+    merge_packages_file,
+    packages_index,
+)
+
+
+def _ar_member(name: str, data: bytes) -> bytes:
+    header = (
+        f"{name + '/':<16}{0:<12}{0:<6}{0:<6}{100644:<8}{len(data):<10}`\n".encode()
+    )
+    padding = b"\n" if len(data) % 2 == 1 else b""
+    return header + data + padding
+
+
+def _make_deb(path: Path, control: str) -> None:
+    """Writes a binary package with the given control file and no contents"""
+    control_archive = io.BytesIO()
+    with tarfile.open(fileobj=control_archive, mode="w:gz") as tar:
+        control_bytes = control.encode()
+        info = tarfile.TarInfo("./control")
+        info.size = len(control_bytes)
+        tar.addfile(info, io.BytesIO(control_bytes))
+
+    path.write_bytes(
+        b"!<arch>\n"
+        + _ar_member("debian-binary", b"2.0\n")
+        + _ar_member("control.tar.gz", control_archive.getvalue())
+        + _ar_member("data.tar.xz", b"")
+    )
+
+
+@pytest.fixture
+def binary_dir(tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.setattr(utils, "_stanza_cache_dir", lambda: tmp_path / "stanzas")
+    binary_dir = tmp_path / "dists" / "jammy" / "main" / "binary-amd64"
+    binary_dir.mkdir(parents=True)
+    return binary_dir
+
+
+def test_packages_index_lists_packages(tmp_path: Path, binary_dir: Path):
+    for version in ["1.10", "1.9"]:
+        _make_deb(
+            binary_dir / f"example_{version}_amd64.deb",
+            f"Package: example\nVersion: {version}\nArchitecture: amd64\n"
+            f"Description: An example\n Longer description\n",
+        )
+
+    index = packages_index(tmp_path, binary_dir.relative_to(tmp_path))
+
+    stanzas = index.split("\n\n")
+    assert len(stanzas) == 3 and stanzas[2] == ""
+    assert "Version: 1.9\n" in stanzas[0]
+    assert "Version: 1.10\n" in stanzas[1]
+
+    deb = binary_dir / "example_1.9_amd64.deb"
+    assert stanzas[0] == (
+        f"Package: example\n"
+        f"Version: 1.9\n"
+        f"Architecture: amd64\n"
+        f"Filename: dists/jammy/main/binary-amd64/example_1.9_amd64.deb\n"
+        f"Size: {deb.stat().st_size}\n"
+        f"MD5sum: {hashlib.md5(deb.read_bytes()).hexdigest()}\n"
+        f"SHA1: {hashlib.sha1(deb.read_bytes()).hexdigest()}\n"
+        f"SHA256: {hashlib.sha256(deb.read_bytes()).hexdigest()}\n"
+        f"Description: An example\n"
+        f" Longer description"
+    )
+
+
+def test_unchanged_packages_are_not_read_again(
+    tmp_path: Path, binary_dir: Path, monkeypatch
+):
+    deb = binary_dir / "example_1.0_amd64.deb"
+    _make_deb(deb, "Package: example\nVersion: 1.0\nArchitecture: amd64\n")
+    dir_ = binary_dir.relative_to(tmp_path)
+    index = packages_index(tmp_path, dir_)
+
+    def fail(package_file: Path, filename: Path):
+        raise AssertionError(f"{package_file} was read again")
+
+    with monkeypatch.context() as m:
+        m.setattr(packages, "_packages_entry", fail)
+        assert packages_index(tmp_path, dir_) == index
+
+    # Replacing the package gives it a new identity
+    deb.unlink()
+    _make_deb(deb, "Package: example\nVersion: 1.0\nArchitecture: all\n")
+    assert "Architecture: all\n" in packages_index(tmp_path, dir_)
+
+
+def test_merging_matches_a_full_index(tmp_path: Path, binary_dir: Path):
+    dir_ = binary_dir.relative_to(tmp_path)
+    for name in ["a", "c", "d"]:
+        _make_deb(
+            binary_dir / f"{name}_1.0_amd64.deb",
+            f"Package: {name}\nVersion: 1.0\nArchitecture: amd64\n",
+        )
+    add_packages_files(tmp_path, [binary_dir])
+
+    # Add one package, replace another and remove a third
+    _make_deb(
+        binary_dir / "b_1.0_amd64.deb",
+        "Package: b\nVersion: 1.0\nArchitecture: amd64\n",
+    )
+    (binary_dir / "c_1.0_amd64.deb").unlink()
+    _make_deb(
+        binary_dir / "c_2.0_amd64.deb",
+        "Package: c\nVersion: 2.0\nArchitecture: amd64\n",
+    )
+    (binary_dir / "d_1.0_amd64.deb").unlink()
+    changed_files = [
+        binary_dir / name
+        for name in [
+            "b_1.0_amd64.deb",
+            "c_1.0_amd64.deb",
+            "c_2.0_amd64.deb",
+            "d_1.0_amd64.deb",
+        ]
+    ]
+    merge_packages_file(tmp_path, dir_, changed_files)
+
+    assert (binary_dir / "Packages").read_text() == packages_index(tmp_path, dir_)
+    assert gzip.decompress((binary_dir / "Packages.gz").read_bytes()).decode() == (
+        (binary_dir / "Packages").read_text()
+    )
@@ -0,0 +1,16 @@
+from debutizer.commands.parallelism import build_parallelism
+
+
+def test_cpus_are_divided_between_builds():
+    assert build_parallelism(4, cpu_count=32) == 8
+    assert build_parallelism(1, cpu_count=32) == 32
+    assert build_parallelism(3, cpu_count=32) == 10
+    # Every build gets at least one job, even if there are more builds than CPUs
+    assert build_parallelism(8, cpu_count=4) == 1
+
+
+def test_package_overrides():
+    assert build_parallelism(4, max_parallel=2, cpu_count=32) == 2
+    assert build_parallelism(4, max_parallel=16, cpu_count=32) == 8
+    assert build_parallelism(4, parallel=1, cpu_count=32) == 1
+    assert build_parallelism(4, parallel=20, cpu_count=32) == 20
@@ -5,12 +5,33 @@ import pytest
 from debutizer.environment import Environment
 from debutizer.errors import CommandError
 from debutizer.registry import Registry
+from debutizer.relation import Relation
 from debutizer.source_package import SourcePackage
 
 
 def test_registering_duplicate_packages():
     registry = Registry()
-    env = Environment(
+    env = _env()
+
+    registry.add(env, MockSourcePackage("mypackage1"))
+    with pytest.raises(CommandError):
+        registry.add(env, MockSourcePackage("mypackage1"))
+
+
+def test_previous_packages_can_be_depended_on():
+    registry = Registry()
+    env = _env()
+
+    with pytest.raises(CommandError):
+        registry.make_relation(env, "libfoo")
+
+    registry.add_previous(env, "1.0.0-1", ["libfoo", "libfoo-dev"])
+    relation = registry.make_relation(env, "libfoo-dev")
+    assert relation == Relation.from_string("libfoo-dev (= 1.0.0-1)")
+
+
+def _env() -> Environment:
+    return Environment(
         codename="jammy",
         architecture="amd64",
         package_root=Path("whatever"),
@@ -18,10 +39,6 @@ def test_registering_duplicate_packages():
         artifacts_root=Path("something_else"),
     )
 
-    registry.add(env, MockSourcePackage("mypackage1"))
-    with pytest.raises(CommandError):
-        registry.add(env, MockSourcePackage("mypackage1"))
-
 
 class MockSourcePackage(SourcePackage):
     def __init__(self, name: str):
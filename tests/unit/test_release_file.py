@@ -0,0 +1,85 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+from debian.deb822 import Release
+
+from debutizer.commands.repo_metadata import utils
+from debutizer.commands.repo_metadata.release import add_release_files
+from debutizer.commands.repo_metadata.utils import save_metadata_files
+
+
+@pytest.fixture
+def dist_dir(tmp_path: Path) -> Path:
+    dist_dir = tmp_path / "dists" / "jammy"
+    (dist_dir / "main" / "binary-amd64").mkdir(parents=True)
+    (dist_dir / "main" / "source").mkdir(parents=True)
+    return dist_dir
+
+
+def _add_release_file(artifacts_dir: Path) -> Release:
+    (release_file,) = add_release_files(
+        artifacts_dir,
+        sign=False,
+        gpg_key_id=None,
+        gpg_signing_key=None,
+        gpg_signing_password=None,
+    )
+    with release_file.open("r") as f:
+        return Release(f)
+
+
+def test_release_file_lists_indexes(tmp_path: Path, dist_dir: Path):
+    save_metadata_files(dist_dir / "main" / "binary-amd64" / "Packages", "Package: a\n")
+    (dist_dir / "main" / "source" / "Sources").write_text("Package: b\n")
+
+    release = _add_release_file(tmp_path)
+
+    assert release["Suite"] == "jammy"
+    assert release["Codename"] == "jammy"
+    assert release["Components"] == "main"
+    assert release["Architectures"] == "amd64"
+    assert "Date" in release
+
+    listed = [f["name"] for f in release["SHA256"]]
+    assert listed == [
+        "main/binary-amd64/Packages",
+        "main/binary-amd64/Packages.gz",
+        "main/source/Sources",
+    ]
+    for field, key, algorithm in [
+        ("MD5Sum", "md5sum", "md5"),
+        ("SHA1", "sha1", "sha1"),
+        ("SHA256", "sha256", "sha256"),
+        ("SHA512", "sha512", "sha512"),
+    ]:
+        for entry in release[field]:
+            contents = (dist_dir / entry["name"]).read_bytes()
+            assert entry[key] == hashlib.new(algorithm, contents).hexdigest()
+            assert int(entry["size"]) == len(contents)
+
+
+def test_release_file_reuses_generated_digests(
+    tmp_path: Path, dist_dir: Path, monkeypatch
+):
+    save_metadata_files(dist_dir / "main" / "binary-amd64" / "Packages", "Package: a\n")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Generated files should not be read again")
+
+    monkeypatch.setattr(utils, "multi_digest_file", fail)
+
+    release = _add_release_file(tmp_path)
+
+    assert len(release["SHA512"]) == 2
+
+
+def test_release_file_hashes_changed_files(tmp_path: Path, dist_dir: Path):
+    packages_file = dist_dir / "main" / "binary-amd64" / "Packages"
+    save_metadata_files(packages_file, "Package: a\n")
+    packages_file.write_text("Package: a\n\nPackage: b\n")
+
+    release = _add_release_file(tmp_path)
+
+    (entry,) = [e for e in release["SHA256"] if e["name"].endswith("Packages")]
+    assert entry["sha256"] == hashlib.sha256(packages_file.read_bytes()).hexdigest()
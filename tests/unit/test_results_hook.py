@@ -0,0 +1,48 @@
+import os
+import subprocess
+from pathlib import Path
+
+from debutizer.commands import utils
+
+
+def test_only_local_list_is_updated_when_lists_are_prefetched(
+    tmp_path: Path, monkeypatch
+):
+    local_list = tmp_path / "debutizer-local.list"
+    local_list.write_text("deb [trusted=yes] http://localhost:8080 jammy main\n")
+    source_list = tmp_path / "sources.list"
+    source_list.write_text("deb http://archive.ubuntu.com/ubuntu jammy main\n")
+    prefetched_lists = tmp_path / "prefetched-lists.sha256"
+    monkeypatch.setattr(utils, "_LOCAL_APT_LIST", local_list)
+    monkeypatch.setattr(utils, "_PREFETCHED_LISTS", prefetched_lists)
+
+    # Pretend to be apt-get, recording the arguments it was run with
+    apt_get_args = tmp_path / "apt-get-args"
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    apt_get = bin_dir / "apt-get"
+    apt_get.write_text(f'#!/usr/bin/env bash\necho "$@" > {apt_get_args}\n')
+    apt_get.chmod(0o755)
+    env = {**os.environ, "PATH": f"{bin_dir}:{os.environ['PATH']}"}
+
+    hook = tmp_path / "D70results"
+    hook.write_text(utils.results_hook())
+
+    subprocess.run(
+        f"sha256sum {source_list} > {prefetched_lists}", shell=True, check=True
+    )
+    subprocess.run(["bash", hook], check=True, env=env)
+    assert apt_get_args.read_text() == (
+        f"update -o Dir::Etc::SourceList={local_list} -o Dir::Etc::SourceParts=- "
+        f"-o APT::Get::List-Cleanup=0\n"
+    )
+
+    # The source lists have changed since the lists were downloaded
+    source_list.write_text("deb http://archive.ubuntu.com/ubuntu jammy universe\n")
+    subprocess.run(["bash", hook], check=True, env=env)
+    assert apt_get_args.read_text() == "update\n"
+
+    # The lists were never downloaded ahead of time
+    prefetched_lists.unlink()
+    subprocess.run(["bash", hook], check=True, env=env)
+    assert apt_get_args.read_text() == "update\n"
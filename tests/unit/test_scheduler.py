@@ -0,0 +1,137 @@
+from threading import Barrier, Lock
+from typing import Dict, List, Set
+
+import pytest
+
+from debutizer.commands.scheduler import (
+    BuildScheduler,
+    critical_path,
+    longest_remaining_paths,
+)
+
+
+def test_dependencies_finish_first():
+    dependencies = {
+        "app": {"libfoo", "libbar"},
+        "libfoo": {"libbase"},
+        "libbar": {"libbase"},
+        "libbase": set(),
+    }
+    built = _run(dependencies, jobs=1)
+
+    assert built[0] == "libbase"
+    assert built[-1] == "app"
+    assert set(built) == set(dependencies.keys())
+
+
+def test_mapping_order_breaks_ties():
+    dependencies = {"a": set(), "b": set(), "c": set()}
+
+    assert _run(dependencies, jobs=1) == ["a", "b", "c"]
+
+
+def test_independent_packages_run_concurrently():
+    # Both builds must be running at once for the barrier to be passed
+    barrier = Barrier(2, timeout=5)
+
+    def build(node: str) -> str:
+        barrier.wait()
+        return node
+
+    scheduler = BuildScheduler({"a": set(), "b": set()}, jobs=2)
+    scheduler.run(build, lambda node, result: None)
+
+
+def test_jobs_limit_is_respected():
+    lock = Lock()
+    running = 0
+    max_running = 0
+    # Builds are held until three of them are running at once, so they always overlap
+    barrier = Barrier(3, timeout=5)
+
+    def build(node: str) -> str:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        barrier.wait()
+        with lock:
+            running -= 1
+        return node
+
+    dependencies: Dict[str, Set[str]] = {str(i): set() for i in range(21)}
+    scheduler = BuildScheduler(dependencies, jobs=3)
+    scheduler.run(build, lambda node, result: None)
+
+    assert max_running == 3
+
+
+def test_failure_stops_dependents():
+    built: List[str] = []
+
+    def build(node: str) -> str:
+        if node == "libfoo":
+            raise RuntimeError("Oh no!")
+        return node
+
+    scheduler = BuildScheduler({"app": {"libfoo"}, "libfoo": set()}, jobs=2)
+    with pytest.raises(RuntimeError):
+        scheduler.run(build, lambda node, result: built.append(result))
+
+    assert built == []
+
+
+def test_keep_going_skips_only_dependents():
+    dependencies = {
+        "libfoo": set(),
+        "app": {"libfoo"},
+        "tool": {"app"},
+        "libbar": set(),
+        "other": {"libbar"},
+    }
+    built: List[str] = []
+
+    def build(node: str) -> str:
+        if node == "libfoo":
+            raise RuntimeError("Oh no!")
+        return node
+
+    scheduler = BuildScheduler(dependencies, jobs=2)
+    result = scheduler.run(
+        build, lambda node, result: built.append(result), keep_going=True
+    )
+
+    assert sorted(built) == ["libbar", "other"]
+    assert result.succeeded == built
+    assert list(result.failed.keys()) == ["libfoo"]
+    assert result.skipped == {"app": "libfoo", "tool": "libfoo"}
+
+
+def test_longest_remaining_path_goes_first():
+    dependencies = {
+        "quick": set(),
+        "libbase": set(),
+        "libfoo": {"libbase"},
+        "app": {"libfoo"},
+    }
+    durations = {"quick": 5.0, "libbase": 1.0, "libfoo": 10.0, "app": 2.0}
+
+    paths = longest_remaining_paths(dependencies, durations)
+    assert paths == {"quick": 5.0, "libbase": 13.0, "libfoo": 12.0, "app": 2.0}
+    assert critical_path(dependencies, paths) == ["libbase", "libfoo", "app"]
+
+    scheduler = BuildScheduler(dependencies, priorities=paths)
+    assert scheduler.planned_order() == ["libbase", "libfoo", "quick", "app"]
+
+    built: List[str] = []
+    scheduler.run(lambda node: node, lambda node, result: built.append(result))
+    assert built == scheduler.planned_order()
+
+
+def _run(dependencies: Dict[str, Set[str]], jobs: int) -> List[str]:
+    built: List[str] = []
+
+    scheduler = BuildScheduler(dependencies, jobs=jobs)
+    scheduler.run(lambda node: node, lambda node, result: built.append(result))
+
+    return built
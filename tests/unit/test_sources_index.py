@@ -0,0 +1,84 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from debutizer.commands.repo_metadata import sources, utils
+from debutizer.commands.repo_metadata.sources import merge_sources_file, sources_index
+
+
+def _make_dsc(source_dir: Path, name: str, version: str) -> Path:
+    """Writes a .dsc file for a source package whose tarball is never read"""
+    dsc_file = source_dir / f"{name}_{version}.dsc"
+    dsc_file.write_text(
+        f"Format: 3.0 (native)\n"
+        f"Source: {name}\n"
+        f"Version: {version}\n"
+        f"Checksums-Sha256:\n"
+        f" {'b' * 64} 1000 {name}_{version}.tar.xz\n"
+        f"Files:\n"
+        f" {'a' * 32} 1000 {name}_{version}.tar.xz\n"
+    )
+    return dsc_file
+
+
+@pytest.fixture
+def source_dir(tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.setattr(utils, "_stanza_cache_dir", lambda: tmp_path / "stanzas")
+    source_dir = tmp_path / "dists" / "jammy" / "main" / "source"
+    source_dir.mkdir(parents=True)
+    return source_dir
+
+
+def test_sources_index_reuses_dsc_checksums(tmp_path: Path, source_dir: Path):
+    dsc_file = _make_dsc(source_dir, "example", "1.0")
+
+    index = sources_index(tmp_path, source_dir.relative_to(tmp_path))
+
+    dsc_bytes = dsc_file.read_bytes()
+    size = len(dsc_bytes)
+    assert index == (
+        f"Format: 3.0 (native)\n"
+        f"Package: example\n"
+        f"Version: 1.0\n"
+        f"Directory: dists/jammy/main/source\n"
+        f"Checksums-Sha256:\n"
+        f" {hashlib.sha256(dsc_bytes).hexdigest()} {size} example_1.0.dsc\n"
+        f" {'b' * 64} 1000 example_1.0.tar.xz\n"
+        f"Files:\n"
+        f" {hashlib.md5(dsc_bytes).hexdigest()} {size} example_1.0.dsc\n"
+        f" {'a' * 32} 1000 example_1.0.tar.xz\n"
+        f"\n"
+    )
+
+
+def test_merging_matches_a_full_index(tmp_path: Path, source_dir: Path, monkeypatch):
+    dir_ = source_dir.relative_to(tmp_path)
+    for name in ["a", "c"]:
+        _make_dsc(source_dir, name, "1.0")
+    merge_sources_file(tmp_path, dir_, [])
+
+    def fail(dsc_file: Path, directory: Path):
+        raise AssertionError(f"{dsc_file} was read again")
+
+    changed_files = [_make_dsc(source_dir, "b", "1.0")]
+    changed_files.append(source_dir / "c_1.0.dsc")
+    changed_files[-1].unlink()
+    merge_sources_file(tmp_path, dir_, changed_files)
+
+    # Only the new .dsc file was read, so every stanza comes from the cache now
+    monkeypatch.setattr(sources, "_sources_entry", fail)
+    assert (source_dir / "Sources").read_text() == sources_index(tmp_path, dir_)
+    assert "Package: b\n" in (source_dir / "Sources").read_text()
+    assert "Package: c\n" not in (source_dir / "Sources").read_text()
+
+
+def test_non_persistent_cache_writes_nothing(tmp_path: Path, source_dir: Path):
+    _make_dsc(source_dir, "example", "1.0")
+
+    index = sources_index(
+        tmp_path, source_dir.relative_to(tmp_path), stanza_cache=False
+    )
+
+    assert "Package: example" in index
+    assert not (tmp_path / "stanzas").exists()
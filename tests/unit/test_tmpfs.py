@@ -0,0 +1,56 @@
+import subprocess
+from pathlib import Path
+
+from debutizer.commands import tmpfs
+from debutizer.commands.tmpfs import (
+    TmpfsBuildPlaces,
+    available_memory,
+    fits_in_memory,
+    unsafe_io_hook,
+)
+
+_MEBIBYTE = 1024 * 1024
+
+
+def test_fits_in_memory():
+    assert fits_in_memory(4 * _MEBIBYTE, 0, 6 * _MEBIBYTE, 2 * _MEBIBYTE)
+    assert not fits_in_memory(4 * _MEBIBYTE, 1, 6 * _MEBIBYTE, 2 * _MEBIBYTE)
+
+
+def test_available_memory(tmp_path: Path, monkeypatch):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text(
+        "MemTotal:       16314564 kB\n"
+        "MemFree:         1012348 kB\n"
+        "MemAvailable:    8123456 kB\n"
+    )
+    monkeypatch.setattr(tmpfs, "_MEMINFO", meminfo)
+    assert available_memory() == 8123456 * 1024
+
+    meminfo.write_text("MemTotal:       16314564 kB\n")
+    assert available_memory() is None
+
+    monkeypatch.setattr(tmpfs, "_MEMINFO", tmp_path / "missing")
+    assert available_memory() is None
+
+
+def test_falls_back_to_disk_when_memory_is_tight(monkeypatch):
+    monkeypatch.setattr(tmpfs, "available_memory", lambda: 512 * _MEBIBYTE)
+    build_places = TmpfsBuildPlaces(size=1024 * _MEBIBYTE)
+
+    with build_places.acquire("example") as build_place:
+        assert build_place is None
+
+    assert build_places._reserved == 0
+    assert build_places._on_disk == 1
+
+
+def test_unsafe_io_hook(tmp_path: Path, monkeypatch):
+    config_file = tmp_path / "dpkg.cfg.d" / "debutizer-unsafe-io"
+    monkeypatch.setattr(tmpfs, "_DPKG_CONFIG_FILE", config_file)
+
+    hook = tmp_path / "D05unsafeio"
+    hook.write_text(unsafe_io_hook())
+    subprocess.run(["bash", hook], check=True)
+
+    assert config_file.read_text() == "force-unsafe-io\n"
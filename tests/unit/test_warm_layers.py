@@ -0,0 +1,34 @@
+from debutizer.commands.warm_layers import best_warm_layer, plan_warm_layers
+
+
+def test_common_dependencies_are_layered():
+    build_depends = {
+        "a": {"debhelper", "cmake", "libfoo-dev"},
+        "b": {"debhelper", "cmake", "libbar-dev"},
+        "c": {"debhelper", "cmake"},
+        "d": {"debhelper", "dh-python", "python3-all"},
+        "e": {"debhelper", "dh-python", "python3-all", "python3-setuptools"},
+    }
+
+    layers = plan_warm_layers(build_depends, max_layers=3)
+
+    assert layers == [
+        frozenset({"debhelper", "cmake"}),
+        frozenset({"debhelper", "dh-python", "python3-all"}),
+    ]
+
+
+def test_unshared_dependencies_are_not_layered():
+    build_depends = {"a": {"libfoo-dev"}, "b": {"libbar-dev"}}
+    assert plan_warm_layers(build_depends, max_layers=1) == []
+
+
+def test_best_layer_is_largest_subset():
+    small = frozenset({"debhelper"})
+    large = frozenset({"debhelper", "cmake"})
+    unusable = frozenset({"debhelper", "cmake", "libfoo-dev", "libbar-dev"})
+
+    layers = [small, large, unusable]
+    assert best_warm_layer(layers, {"debhelper", "cmake", "libfoo-dev"}) == large
+    assert best_warm_layer(layers, {"debhelper", "dh-python"}) == small
+    assert best_warm_layer(layers, {"dh-python"}) is None